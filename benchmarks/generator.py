@@ -0,0 +1,161 @@
+import random
+
+symbols = ('0', '1', '_')
+
+
+class ProgramGenerator:
+    """Generator of synthetic programs without errors for benchmarks.
+
+    statements is the number of top-level statements, depth is the maximum nesting of if statements,
+    expression_length is the number of operands in expressions, machine_size is the number of instructions
+    in turing machine literals and comment_density is the probability of a comment on a line.
+    Programs are the same for the same parameters and seed.
+    """
+
+    def __init__(self, statements: int = 1000, depth: int = 3, expression_length: int = 8, machine_size: int = 16,
+                 comment_density: float = 0.1, seed: int = 0):
+        self.statements = statements
+        self.depth = depth
+        self.expression_length = expression_length
+        self.machine_size = machine_size
+        self.comment_density = comment_density
+        self.random = random.Random(seed)
+        self.lines = []
+        # declared variables of each type, variables of each type get their own prefix
+        self.variables = {'x': [], 'b': [], 't': [], 'm': []}
+
+    def generate(self) -> str:
+        self.lines = []
+        for prefix in self.variables:
+            self.variables[prefix] = []
+        # at least one variable of each type for expressions
+        self.declaration(0, 'x')
+        self.declaration(0, 'b')
+        self.declaration(0, 't')
+        self.declaration(0, 'm')
+        for _ in range(self.statements):
+            self.statement(0)
+        return '\n'.join(self.lines) + '\n'
+
+    def add_line(self, indent, line):
+        # comment lines are not allowed in blocks (comment at the line start ends blocks, indented one is an indent),
+        # so comments in blocks are put after statements
+        if self.random.random() < self.comment_density:
+            choice = self.random.random()
+            if choice < 0.5 and indent == 0:
+                self.lines.append('# comment {}'.format(len(self.lines)))
+            elif choice < 0.75:
+                line += ' /# block\ncomment #/'
+            else:
+                line += ' # comment {}'.format(len(self.lines))
+        self.lines.append('\t' * indent + line)
+
+    def statement(self, indent):
+        kind = self.random.random()
+        if kind < 0.15 and indent < self.depth:
+            self.if_statement(indent)
+        elif kind < 0.3:
+            self.add_line(indent, '<< {}'.format(self.expression(self.random.choice('xbt'))))
+        elif kind < 0.4:
+            self.add_line(indent, '{} += {}'.format(self.random.choice(self.variables['x']), self.expression('x')))
+        elif kind < 0.45 and self.machine_size > 0:
+            self.machine_block(indent)
+        else:
+            self.declaration(indent, self.random.choice('xxbtm'))
+
+    def declaration(self, indent, prefix):
+        # new variables are declared only at top level to be visible in all following statements
+        if indent == 0 or not self.variables[prefix]:
+            name = '{}{}'.format(prefix, len(self.variables[prefix]))
+        else:
+            name = self.random.choice(self.variables[prefix])
+        if prefix == 'm':
+            self.add_line(indent, '{} = {}'.format(name, self.machine_literal()))
+        else:
+            self.add_line(indent, '{} = {}'.format(name, self.expression(prefix)))
+        if name not in self.variables[prefix]:
+            self.variables[prefix].append(name)
+
+    def if_statement(self, indent):
+        self.add_line(indent, 'if {}:'.format(self.expression('b')))
+        self.block(indent + 1)
+        if self.random.random() < 0.3:
+            self.add_line(indent, 'elif {}:'.format(self.expression('b')))
+            self.block(indent + 1)
+        if self.random.random() < 0.5:
+            self.add_line(indent, 'else:')
+            self.block(indent + 1)
+
+    def block(self, indent):
+        for _ in range(self.random.randint(1, 4)):
+            self.statement(indent)
+
+    def expression(self, prefix, length=None):
+        if length is None:
+            length = self.random.randint(1, self.expression_length)
+        if prefix == 'x':
+            return self.integer_expression(length)
+        if prefix == 'b':
+            return self.boolean_expression(length)
+        return self.tape_expression(length)
+
+    def integer_expression(self, length):
+        if length <= 1:
+            if self.random.random() < 0.5:
+                return self.random.choice(self.variables['x'] or ['1'])
+            choice = self.random.random()
+            if choice < 0.1 and self.variables['t']:
+                return '{}^'.format(self.random.choice(self.variables['t']))
+            if choice < 0.2 and self.variables['t']:
+                return '{}[]'.format(self.random.choice(self.variables['t']))
+            return str(self.random.randint(0, 999))
+        left_length = self.random.randint(1, length - 1)
+        expression = '{} {} {}'.format(self.integer_expression(left_length), self.random.choice('+-*/%'),
+                                       self.integer_expression(length - left_length))
+        return '({})'.format(expression) if self.random.random() < 0.3 else expression
+
+    def boolean_expression(self, length):
+        if length <= 1:
+            choice = self.random.random()
+            if choice < 0.3 and self.variables['b']:
+                return self.random.choice(self.variables['b'])
+            if choice < 0.4:
+                return 'true'
+            return '{} {} {}'.format(self.integer_expression(1), self.random.choice(('==', '!=', '<', '>', '<=', '>=')),
+                                     self.integer_expression(1))
+        left_length = self.random.randint(1, length - 1)
+        expression = '{} {} {}'.format(self.boolean_expression(left_length), self.random.choice(('and', 'or')),
+                                       self.boolean_expression(length - left_length))
+        if self.random.random() < 0.2:
+            return 'not ({})'.format(expression)
+        return '({})'.format(expression) if self.random.random() < 0.3 else expression
+
+    def tape_expression(self, length):
+        if length <= 1 or not self.variables['t']:
+            cells = [self.random.choice(symbols) for _ in range(self.random.randint(1, 8))]
+            head = self.random.randrange(len(cells))
+            return '"{}^{}"'.format(''.join(cells[:head]), ''.join(cells[head:]))
+        tape = self.random.choice(self.variables['t'])
+        if self.random.random() < 0.5 and self.variables['m']:
+            return '{}({})'.format(self.random.choice(self.variables['m']), tape)
+        return '{} + {}'.format(tape, self.tape_expression(length - 1))
+
+    def machine_instructions(self):
+        instructions = []
+        for idx in range(self.machine_size):
+            state = 'q{}'.format(idx // len(symbols))
+            next_state = 'q{}'.format(self.random.randrange(self.machine_size // len(symbols) + 1))
+            instructions.append("{} '{}' = {} '{}' {}".format(state, symbols[idx % len(symbols)], next_state,
+                                                                self.random.choice(symbols), self.random.choice('<>-')))
+        return instructions
+
+    def machine_literal(self):
+        # long literals are split into lines by line continuations
+        instructions = self.machine_instructions()
+        lines = ['; '.join(instructions[idx:idx + 4]) for idx in range(0, len(instructions), 4)]
+        return "{{q0 '_': {}}}".format('; \\\n'.join(lines)) if lines else "{q0 '_'}"
+
+    def machine_block(self, indent):
+        self.add_line(indent, '{}:'.format(self.random.choice(self.variables['m'])))
+        for instruction in self.machine_instructions():
+            self.lines.append('\t' * (indent + 1) + instruction)
@@ -0,0 +1,199 @@
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+from benchmarks.generator import ProgramGenerator
+from source.error import Diagnostics
+from source.incremental import TokenReplay
+from source.lexer import Lexer
+from source.parser import Parser
+from source.semantic_analyzer import SemanticAnalyzer
+
+# name -> parameters of the generator, numbers of statements are multiplied by the scale
+programs = {
+    'statements': dict(statements=20000, depth=2, expression_length=4, machine_size=8, comment_density=0.1),
+    'expressions': dict(statements=2000, depth=1, expression_length=64, machine_size=8, comment_density=0.0),
+    'nesting': dict(statements=2000, depth=12, expression_length=4, machine_size=8, comment_density=0.1),
+    'machines': dict(statements=200, depth=1, expression_length=4, machine_size=2000, comment_density=0.0),
+    'comments': dict(statements=10000, depth=2, expression_length=4, machine_size=8, comment_density=0.9),
+}
+
+
+def lex_tokens(program_text):
+    # all tokens except the end of file for the parser
+    lexer = Lexer(program_text)
+    tokens = []
+    token = lexer.next_token()
+    while token:
+        tokens.append(token)
+        token = lexer.next_token()
+    return tokens
+
+
+def count_nodes(tree):
+    count = 0
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (list, set)):
+            stack.extend(node)
+        elif hasattr(node, '__dict__'):
+            count += 1
+            stack.extend(value for value in vars(node).values() if value is not None)
+    return count
+
+
+# Phases prepare their input and return the function doing the measured work,
+# so only the work of the phase is timed and traced.
+
+def prepare_lexer(program_text, tokens):
+    def run():
+        lexer = Lexer(program_text)
+        while lexer.next_token():
+            pass
+    return run
+
+
+def prepare_tokenize(program_text, tokens):
+    return Lexer(program_text).tokenize
+
+
+def prepare_parser(program_text, tokens):
+    return Parser(lexer=TokenReplay(tokens, Diagnostics(program_text))).parse
+
+
+def prepare_semantic_analyzer(program_text, tokens):
+    # analysis changes the ast, so it is parsed for every run
+    analyzer = SemanticAnalyzer(diagnostics=Diagnostics(program_text))
+    analyzer.ast = Parser(lexer=TokenReplay(tokens, analyzer.diagnostics)).parse()
+    return analyzer.analyze
+
+
+# name -> (prepare, unit of the rate)
+phases = {
+    'lexer': (prepare_lexer, 'tokens'),
+    'tokenize': (prepare_tokenize, 'tokens'),
+    'parser': (prepare_parser, 'nodes'),
+    'semantic': (prepare_semantic_analyzer, 'nodes'),
+}
+
+
+def measure_time(prepare, program_text, tokens, repeat):
+    # the best of runs is the least disturbed by other processes
+    best = float('inf')
+    for _ in range(repeat):
+        run = prepare(program_text, tokens)
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure_memory(prepare, program_text, tokens):
+    run = prepare(program_text, tokens)
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmarks(names, scale=1.0, repeat=5, seed=0, memory=True):
+    results = {}
+    for name in names:
+        parameters = dict(programs[name])
+        parameters['statements'] = max(1, int(parameters['statements'] * scale))
+        program_text = ProgramGenerator(seed=seed, **parameters).generate()
+        tokens = lex_tokens(program_text)
+        counts = {
+            'tokens': len(tokens),
+            'nodes': count_nodes(Parser(lexer=TokenReplay(tokens, Diagnostics(program_text))).parse()),
+        }
+        result = {'size': len(program_text), 'tokens': counts['tokens'], 'nodes': counts['nodes'], 'phases': {}}
+        for phase, (prepare, unit) in phases.items():
+            elapsed = measure_time(prepare, program_text, tokens, repeat)
+            result['phases'][phase] = {
+                'time': elapsed,
+                'rate': counts[unit] / elapsed if elapsed else 0.0,
+                'unit': unit,
+                'peak_memory': measure_memory(prepare, program_text, tokens) if memory else None,
+            }
+        results[name] = result
+    return results
+
+
+def compare(results, baseline, tolerance):
+    # returns regressions: (program, phase, ratio of times)
+    regressions = []
+    for name, result in results.items():
+        for phase, measurement in result['phases'].items():
+            base = baseline.get(name, {}).get('phases', {}).get(phase)
+            if base is None:
+                continue
+            measurement['baseline_time'] = base['time']
+            ratio = measurement['time'] / base['time'] if base['time'] else 1.0
+            measurement['ratio'] = ratio
+            if ratio > 1 + tolerance:
+                regressions.append((name, phase, ratio))
+    return regressions
+
+
+def print_results(results):
+    print('{:<12} {:<9} {:>10} {:>18} {:>12} {:>9}'.format(
+        'program', 'phase', 'time, ms', 'rate, per s', 'memory, KiB', 'baseline'))
+    for name, result in results.items():
+        for phase, measurement in result['phases'].items():
+            peak_memory = measurement['peak_memory']
+            ratio = measurement.get('ratio')
+            print('{:<12} {:<9} {:>10.1f} {:>11.0f} {:<6} {:>12} {:>9}'.format(
+                name, phase, measurement['time'] * 1000, measurement['rate'], measurement['unit'],
+                '-' if peak_memory is None else peak_memory // 1024,
+                '-' if ratio is None else '{:.2f}x'.format(ratio),
+            ))
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Benchmarks of the lexer, parser and semantic analyzer')
+    parser.add_argument('programs', nargs='*',
+                        help='generated programs to compile: {} (default: all)'.format(', '.join(programs)))
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplier of the number of statements')
+    parser.add_argument('--repeat', type=int, default=5, help='number of runs of each phase, the best one is taken')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the program generator')
+    parser.add_argument('--no-memory', action='store_true', help='do not measure peak memory')
+    parser.add_argument('--save', metavar='FILE', help='save results as the baseline to the json file')
+    parser.add_argument('--baseline', metavar='FILE', help='compare results with the baseline from the json file')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='allowed slowdown relative to the baseline (default: 0.1, 10%%)')
+    args = parser.parse_args()
+    for name in args.programs:
+        if name not in programs:
+            parser.error('unknown program {}'.format(name))
+    return args
+
+
+def main():
+    args = parse_arguments()
+    results = run_benchmarks(args.programs or list(programs), args.scale, args.repeat, args.seed, not args.no_memory)
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if (baseline['scale'], baseline['seed']) != (args.scale, args.seed):
+            print('Baseline is measured with other programs (scale {}, seed {})'.format(
+                baseline['scale'], baseline['seed']))
+        regressions = compare(results, baseline['results'], args.tolerance)
+    print_results(results)
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump({'scale': args.scale, 'seed': args.seed, 'results': results}, file, indent=2)
+    if regressions:
+        for name, phase, ratio in regressions:
+            print('Regression: {} {} is {:.2f} times slower than the baseline'.format(name, phase, ratio))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+from array import array
+from typing import List
+
+from source.machine import DenseMachine, MachineError, StepLimitError, TapeLimitError, TuringMachine
+from source.tape import Tape
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def encode_tapes(dense: DenseMachine, tapes: List[Tape]):
+    # tables translating codes of tapes to codes of the machine are shared by tapes with the same alphabet
+    tables = {}
+    encoded = []
+    for tape in tapes:
+        codes = tape.cells[tape.start:tape.end]
+        if not codes or not isinstance(codes, bytearray) or dense.width > 256:
+            encoded.append(dense.encode(tape))
+            continue
+        alphabet = tuple(tape.alphabet)
+        table = tables.get(alphabet)
+        if table is None:
+            table = tables[alphabet] = bytes(dense.symbol_codes.get(symbol, dense.unknown_symbol)
+                                             for symbol in alphabet).ljust(256, b'\0')
+        encoded.append(codes.translate(table))
+    return encoded
+
+
+def run_batch(machine: TuringMachine, tapes: List[Tape], max_steps: int = None,
+              max_tape_length: int = None) -> List[Tape]:
+    """Run the machine on all tapes and return the new tapes, the given tapes are not changed.
+
+    Tapes are simulated in lockstep: on every step the states, heads and symbols of all running tapes
+    are arrays and the instructions are gathered from the transition tables by NumPy.
+    Halted tapes are dropped from the running ones. Without NumPy tapes are run one by one.
+
+    The limits are applied to every tape with the errors of DenseMachine.run(), a tape stopped by an error
+    is dropped with the tapes after it, and the error of the first stopped tape is raised when the tapes
+    before it have halted, as when the tapes are run one by one.
+    """
+    if numpy is None or len(tapes) < 2:
+        return [machine.run(tape, max_steps, max_tape_length) for tape in tapes]
+    dense = machine.dense
+    dtype = numpy.uint8 if dense.width <= 256 else numpy.int32
+    next_rows = numpy.frombuffer(dense.next_rows, dtype=numpy.intc).astype(numpy.intp)
+    write_symbols = numpy.frombuffer(dense.write_symbols, dtype=numpy.intc).astype(dtype)
+    moves = numpy.frombuffer(dense.moves, dtype=numpy.intc).astype(numpy.intp)
+    # sweeps are run step by step, instructions of sweeps over blank symbols are checked for endless moves
+    # when a tape starts them as in the macro-steps of DenseMachine.run()
+    sweep_ids = numpy.frombuffer(dense.sweep_rows, dtype=numpy.intc).astype(numpy.intp)
+    blank_sweeps = numpy.zeros(len(sweep_ids), dtype=bool)
+    for sweep, (row, move, stop_codes, over_blanks) in enumerate(dense.sweeps):
+        if over_blanks:
+            blank_sweeps[sweep_ids == -2 - sweep] = True
+
+    # all tapes are rows of one grid of machine codes filled by blank symbols (code 0) around the tapes,
+    # tape i is grid[i, margin:margin + lengths[i]] at the start
+    encoded = encode_tapes(dense, tapes)
+    lengths = numpy.fromiter(map(len, encoded), dtype=numpy.intp, count=len(tapes))
+    margin = 16
+    grid = numpy.zeros((len(tapes), margin + int(lengths.max()) + margin), dtype=dtype)
+    if dtype is numpy.uint8 and all(isinstance(cells, bytearray) for cells in encoded):
+        # cells of all tapes are scattered to the grid at once
+        codes = numpy.frombuffer(b''.join(encoded), dtype=numpy.uint8)
+        tape_indices = numpy.repeat(numpy.arange(len(tapes)), lengths)
+        starts = numpy.cumsum(lengths) - lengths
+        grid[tape_indices, numpy.arange(len(codes)) - starts[tape_indices] + margin] = codes
+    else:
+        for idx, cells in enumerate(encoded):
+            grid[idx, margin:margin + len(cells)] = numpy.frombuffer(
+                cells, dtype=numpy.uint8 if isinstance(cells, bytearray) else numpy.intc)
+    heads = numpy.fromiter((tape.head - tape.start for tape in tapes), dtype=numpy.intp, count=len(tapes))
+    heads = numpy.clip(heads, 0, lengths - 1) + margin
+    # bounds of visited cells and the cells of the given tape of each tape
+    lows = numpy.full(len(tapes), margin, dtype=numpy.intp)
+    highs = margin + lengths - 1
+
+    # running tapes: their rows in the grid, rows of their states in the tables, heads and sweeps of their last steps
+    running = numpy.arange(len(tapes))
+    rows = numpy.full(len(tapes), dense.initial_state * dense.width, dtype=numpy.intp)
+    running_heads = heads.copy()
+    last_sweeps = numpy.full(len(tapes), -1, dtype=numpy.intp)
+    steps = 0
+    # row of the tape in the grid -> error stopping the tape
+    errors = {}
+    while len(running):
+        indices = rows + grid[running, running_heads]
+        rows = next_rows[indices]
+        halted = rows < 0
+        stopped = halted | (running >= min(errors)) if errors else halted
+        if stopped.any():
+            heads[running[halted]] = running_heads[halted]
+            running_mask = ~stopped
+            running = running[running_mask]
+            rows = rows[running_mask]
+            running_heads = running_heads[running_mask]
+            indices = indices[running_mask]
+            last_sweeps = last_sweeps[running_mask]
+            if not len(running):
+                break
+        if dense.sweeps:
+            sweeps = sweep_ids[indices]
+            for position in numpy.flatnonzero(blank_sweeps[indices] & (sweeps != last_sweeps)).tolist():
+                row, move, stop_codes, over_blanks = dense.sweeps[-2 - sweeps[position]]
+                idx = running[position]
+                head = running_heads[position]
+                # cells out of the bounds are blank
+                ahead = grid[idx, head + 1:highs[idx] + 1] if move > 0 else grid[idx, lows[idx]:head]
+                if not numpy.isin(ahead, numpy.frombuffer(stop_codes, dtype=numpy.uint8)).any():
+                    errors[idx] = MachineError('Machine moves {} over blank symbols endlessly'.format(
+                        'right' if move > 0 else 'left'))
+            last_sweeps = sweeps
+        if steps == max_steps:
+            errors.setdefault(running[0], StepLimitError('Machine exceeds the step limit {} in state {}'.format(
+                max_steps, dense.states[rows[0] // dense.width])))
+            break
+        grid[running, running_heads] = write_symbols[indices]
+        running_heads += moves[indices]
+        steps += 1
+        running_lows = lows[running]
+        running_highs = highs[running]
+        lows[running] = numpy.minimum(running_lows, running_heads)
+        highs[running] = numpy.maximum(running_highs, running_heads)
+        if max_tape_length is not None:
+            extended = (running_heads < running_lows) | (running_heads > running_highs)
+            exceeding = numpy.flatnonzero(extended & (highs[running] - lows[running] >= max_tape_length))
+            if len(exceeding):
+                position = exceeding[0]
+                errors.setdefault(running[position], TapeLimitError(
+                    'Machine exceeds the tape length limit {} in state {}'.format(
+                        max_tape_length, dense.states[rows[position] // dense.width])))
+
+        # the grid grows by doubling when a head goes out of it
+        low = running_heads.min()
+        high = running_heads.max()
+        if low < 0 or high >= grid.shape[1]:
+            left = grid.shape[1] if low < 0 else 0
+            right = grid.shape[1] if high >= grid.shape[1] else 0
+            grid = numpy.pad(grid, ((0, 0), (left, right)))
+            running_heads += left
+            heads += left
+            lows += left
+            highs += left
+            margin += left
+    if errors:
+        raise errors[min(errors)]
+
+    # result tapes are the visited cells and the cells of the given tapes
+    lows = lows.tolist()
+    highs = highs.tolist()
+    heads = heads.tolist()
+    results = []
+    if dtype is numpy.uint8:
+        data = grid.tobytes()
+        width = grid.shape[1]
+        for idx, tape in enumerate(tapes):
+            low = lows[idx]
+            cells = bytearray(data[idx * width + low:idx * width + highs[idx] + 1])
+            results.append(dense.decode(cells, heads[idx] - low, margin - low, tape))
+    else:
+        for idx, tape in enumerate(tapes):
+            low = lows[idx]
+            cells = array('i', grid[idx, low:highs[idx] + 1].astype(numpy.intc).tobytes())
+            results.append(dense.decode(cells, heads[idx] - low, margin - low, tape))
+    return results
@@ -0,0 +1,647 @@
+import marshal
+import struct
+import sys
+from array import array
+
+from source import ast
+from source.ast import Type
+from source.interpreter import Interpreter, ProgramError, add_tapes, assignment_operators, format_value, subtract_tapes
+from source.lexer import Token
+from source.machine import MachineError, TuringMachine, shift_names
+from source.tape import Tape
+
+# Instructions are 4 integers: opcode and operands a, b, c. Operands are registers unless noted,
+# a is the destination of operations with a result.
+(HALT,
+ # a = b
+ MOVE,
+ # a = copy of the tape or machine b
+ COPY,
+ # error when the variable a is not assigned, b is the register of its name
+ CHECK,
+ # jump to the instruction a
+ JUMP,
+ # jump to the instruction b when a is true / false
+ JUMP_IF_TRUE, JUMP_IF_FALSE,
+ # jump to the instruction c when the comparison of a and b is true
+ JUMP_IF_EQUAL, JUMP_IF_NOT_EQUAL, JUMP_IF_LESS, JUMP_IF_GREATER, JUMP_IF_LESS_OR_EQUAL, JUMP_IF_GREATER_OR_EQUAL,
+ # a = b operator c
+ ADD, SUBTRACT, MULTIPLY, DIVIDE, MODULO, EQUAL, NOT_EQUAL, LESS, GREATER, LESS_OR_EQUAL, GREATER_OR_EQUAL,
+ ADD_TAPES, SUBTRACT_TAPES, COMPOSE,
+ # a = operator b
+ NEGATE, NOT,
+ # a = b^, a = b[]
+ HEAD, LENGTH,
+ # a = b[c], the index is relative to the head
+ INDEX,
+ # a^ = b
+ STORE_HEAD,
+ # a[b] = c
+ STORE_INDEX,
+ # a = b(c)
+ CALL,
+ # b is the register of instructions added to the machine a
+ ADD_INSTRUCTIONS,
+ # a = input of the type input_types[b]
+ INPUT,
+ # output a
+ OUTPUT,
+ # error with the message in the register a
+ FAIL) = range(39)
+
+opcode_names = ('HALT MOVE COPY CHECK JUMP JUMP_IF_TRUE JUMP_IF_FALSE JUMP_IF_EQUAL JUMP_IF_NOT_EQUAL JUMP_IF_LESS '
+                'JUMP_IF_GREATER JUMP_IF_LESS_OR_EQUAL JUMP_IF_GREATER_OR_EQUAL ADD SUBTRACT MULTIPLY DIVIDE MODULO '
+                'EQUAL NOT_EQUAL LESS GREATER LESS_OR_EQUAL GREATER_OR_EQUAL ADD_TAPES SUBTRACT_TAPES COMPOSE NEGATE '
+                'NOT HEAD LENGTH INDEX STORE_HEAD STORE_INDEX CALL ADD_INSTRUCTIONS INPUT OUTPUT FAIL').split()
+
+input_types = (Type.BOOLEAN, Type.INTEGER, Type.SYMBOL, Type.TAPE)
+
+# (operator, type of operands) -> opcode, AND, OR, indexing and calls are compiled separately
+binary_opcodes = {
+    (Token.PLUS, Type.INTEGER): ADD,
+    (Token.MINUS, Type.INTEGER): SUBTRACT,
+    (Token.MULTIPLY, Type.INTEGER): MULTIPLY,
+    (Token.DIVIDE, Type.INTEGER): DIVIDE,
+    (Token.MODULO, Type.INTEGER): MODULO,
+    (Token.PLUS, Type.TAPE): ADD_TAPES,
+    (Token.MINUS, Type.TAPE): SUBTRACT_TAPES,
+    (Token.PLUS, Type.TURING_MACHINE): COMPOSE,
+    (Token.LESS, Type.INTEGER): LESS,
+    (Token.GREATER, Type.INTEGER): GREATER,
+    (Token.LESS_OR_EQUAL, Type.INTEGER): LESS_OR_EQUAL,
+    (Token.GREATER_OR_EQUAL, Type.INTEGER): GREATER_OR_EQUAL,
+}
+for equality_type in (Type.INTEGER, Type.SYMBOL, Type.TAPE):
+    binary_opcodes[Token.EQUAL, equality_type] = EQUAL
+    binary_opcodes[Token.NOT_EQUAL, equality_type] = NOT_EQUAL
+
+# comparison -> jump when the comparison is true
+comparison_jumps = {
+    EQUAL: JUMP_IF_EQUAL,
+    NOT_EQUAL: JUMP_IF_NOT_EQUAL,
+    LESS: JUMP_IF_LESS,
+    GREATER: JUMP_IF_GREATER,
+    LESS_OR_EQUAL: JUMP_IF_LESS_OR_EQUAL,
+    GREATER_OR_EQUAL: JUMP_IF_GREATER_OR_EQUAL,
+}
+# comparison -> comparison which is true when it is false
+negated_comparisons = {
+    EQUAL: NOT_EQUAL,
+    NOT_EQUAL: EQUAL,
+    LESS: GREATER_OR_EQUAL,
+    GREATER: LESS_OR_EQUAL,
+    LESS_OR_EQUAL: GREATER,
+    GREATER_OR_EQUAL: LESS,
+}
+
+# kinds of encoded constants of code files
+CONSTANT_VALUE, CONSTANT_TAPE, CONSTANT_MACHINE, CONSTANT_INSTRUCTIONS = range(4)
+
+
+def encode_transitions(machine: TuringMachine):
+    # the same tuples as the instructions of ADD_INSTRUCTIONS
+    return tuple((state, symbol, next_state, write_symbol, shift_names[move])
+                 + machine.positions.get((state, symbol), (None, None))
+                 for (state, symbol), (next_state, write_symbol, move) in machine.transitions.items())
+
+
+def add_encoded_instructions(machine: TuringMachine, instructions):
+    # instructions are tuples (state, symbol, next state, symbol to write, shift, line, column)
+    for state, symbol, next_state, write_symbol, shift, line, column in instructions:
+        machine.add_instruction(state, symbol, next_state, write_symbol, shift,
+                                (line, column) if line is not None else None)
+
+
+def encode_constant(value):
+    if isinstance(value, Tape):
+        return CONSTANT_TAPE, tuple(value.symbols()), value.head_index
+    if isinstance(value, TuringMachine):
+        return CONSTANT_MACHINE, value.initial_state, value.blank_symbol, encode_transitions(value)
+    if isinstance(value, tuple):
+        return CONSTANT_INSTRUCTIONS, value
+    return CONSTANT_VALUE, value
+
+
+def decode_constant(encoded):
+    kind = encoded[0]
+    if kind == CONSTANT_TAPE:
+        return Tape(encoded[1], encoded[2])
+    if kind == CONSTANT_MACHINE:
+        machine = TuringMachine(encoded[1], encoded[2])
+        add_encoded_instructions(machine, encoded[3])
+        return machine
+    return encoded[1]
+
+
+class CodeObject:
+    """Compiled program: instructions, positions of instructions in the program and constants.
+
+    Registers are numbered from 0, constant k is in the register -1 - k, so the register file of a run
+    is the list of registers followed by the reversed constants and no operand is relocated.
+    The code file is a header, the instructions and the positions as arrays of little-endian 32-bit integers
+    and the marshalled encoded constants, it is loaded by one read without parsing of the instructions.
+    """
+    magic = b'TMBC'
+    version = 1
+    suffix = '.tmb'
+    # magic, version, number of registers, number of instructions, size of the constants in bytes
+    header = struct.Struct('<4sHxxIII')
+
+    def __init__(self, registers: int, code: array, positions: array, constants: list):
+        self.registers = registers
+        # 4 integers per instruction
+        self.code = code
+        # (line, column) per instruction, 0 for instructions without position
+        self.positions = positions
+        self.constants = constants
+
+    def __len__(self):
+        return len(self.code) // 4
+
+    def __str__(self):
+        # disassembly, one instruction per line
+        lines = []
+        for index in range(len(self)):
+            opcode, a, b, c = self.code[4 * index:4 * index + 4]
+            lines.append('{:>6} {:>5}:{:<4} {:<26} {} {} {}'.format(
+                index, self.positions[2 * index], self.positions[2 * index + 1], opcode_names[opcode], a, b, c))
+        for index, constant in enumerate(self.constants):
+            lines.append('{:>6} constant {!r}'.format(-1 - index, constant))
+        return '\n'.join(lines) + '\n'
+
+    def to_bytes(self) -> bytes:
+        code = array('i', self.code)
+        positions = array('i', self.positions)
+        if sys.byteorder == 'big':
+            code.byteswap()
+            positions.byteswap()
+        constants = marshal.dumps(tuple(encode_constant(constant) for constant in self.constants))
+        return b''.join((self.header.pack(self.magic, self.version, self.registers, len(self), len(constants)),
+                         code.tobytes(), positions.tobytes(), constants))
+
+    @classmethod
+    def from_bytes(cls, data) -> 'CodeObject':
+        data = memoryview(data)
+        magic, version, registers, instructions, constants_size = cls.header.unpack_from(data)
+        if magic != cls.magic or version != cls.version:
+            raise ValueError('Not a code file of version {}'.format(cls.version))
+        offset = cls.header.size
+        code = array('i')
+        code.frombytes(data[offset:offset + 16 * instructions])
+        offset += 16 * instructions
+        positions = array('i')
+        positions.frombytes(data[offset:offset + 8 * instructions])
+        offset += 8 * instructions
+        if sys.byteorder == 'big':
+            code.byteswap()
+            positions.byteswap()
+        constants = [decode_constant(constant) for constant in marshal.loads(data[offset:offset + constants_size])]
+        return cls(registers, code, positions, constants)
+
+    def save(self, path: str):
+        with open(path, 'wb') as file:
+            file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> 'CodeObject':
+        with open(path, 'rb') as file:
+            return cls.from_bytes(file.read())
+
+
+class CodeGenerator:
+    """Generator of the register code of analyzed programs.
+
+    Every variable has its register, values of expressions are computed in temporary registers which are
+    reused by the next statement, and literals of booleans, integers and symbols are constant registers
+    used directly as operands. Conditions of if and while statements are compiled to jumps, comparisons
+    to the jumps comparing their operands. Reads of variables which can be not assigned on some path
+    are checked, as variables assigned in branches which are not executed.
+    """
+
+    def __init__(self):
+        # instructions as lists [opcode, a, b, c] until the jumps are patched
+        self.instructions = []
+        self.positions = []
+        self.position = (0, 0)
+        self.constants = []
+        # (type, value) of the constant -> register of the constant
+        self.constant_registers = {}
+        self.registers = 0
+        # name of the variable -> register of the variable
+        self.variables = {}
+        self.free_temporaries = []
+        self.used_temporaries = []
+        # variables assigned on every path to the current instruction
+        self.assigned = set()
+
+    def generate(self, program: ast.InstructionSequence) -> CodeObject:
+        self.compile(program)
+        self.emit(HALT)
+        code = array('i')
+        for instruction in self.instructions:
+            code.extend(instruction)
+        positions = array('i')
+        for position in self.positions:
+            positions.extend(position)
+        return CodeObject(self.registers, code, positions, self.constants)
+
+    def emit(self, opcode, a=0, b=0, c=0) -> int:
+        # returns the index of the instruction
+        self.instructions.append([opcode, a, b, c])
+        self.positions.append(self.position)
+        return len(self.instructions) - 1
+
+    def patch(self, jumps, target: int = None):
+        # sets the targets of the jumps to the target or to the next instruction
+        if target is None:
+            target = len(self.instructions)
+        for index, operand in jumps:
+            self.instructions[index][operand] = target
+
+    def locate(self, token: Token):
+        if token is not None:
+            self.position = (token.line, token.column)
+
+    def constant(self, value) -> int:
+        if isinstance(value, (bool, int, str)):
+            key = (type(value), value)
+            register = self.constant_registers.get(key)
+            if register is None:
+                self.constants.append(value)
+                register = self.constant_registers[key] = -len(self.constants)
+            return register
+        self.constants.append(value)
+        return -len(self.constants)
+
+    def temporary(self) -> int:
+        register = self.free_temporaries.pop() if self.free_temporaries else self.new_register()
+        self.used_temporaries.append(register)
+        return register
+
+    def new_register(self) -> int:
+        self.registers += 1
+        return self.registers - 1
+
+    def is_temporary(self, register: int) -> bool:
+        return register in self.used_temporaries
+
+    def variable(self, node: ast.Identifier, check=True) -> int:
+        register = self.variables.get(node.name)
+        if register is None:
+            register = self.variables[node.name] = self.new_register()
+        if check and node.name not in self.assigned:
+            self.locate(node.token)
+            self.emit(CHECK, register, self.constant(node.name))
+            self.assigned.add(node.name)
+        return register
+
+    def compile(self, node):
+        self.statement_compilers[type(node)](self, node)
+
+    # statements
+
+    def compile_instruction_sequence(self, node: ast.InstructionSequence):
+        for instruction in node.instructions:
+            self.compile(instruction)
+            # temporaries of the statement are free for the next one
+            self.free_temporaries.extend(self.used_temporaries)
+            self.used_temporaries = []
+
+    def compile_if_statement(self, node: ast.IfStatement):
+        # elif branches are if statements in the else bodies
+        else_jumps = self.jump(node.condition, False)
+        assigned = set(self.assigned)
+        self.compile(node.if_body)
+        if_assigned = self.assigned
+        self.assigned = assigned
+        if node.else_body is None:
+            self.patch(else_jumps)
+        else:
+            end_jump = self.emit(JUMP)
+            self.patch(else_jumps)
+            self.compile(node.else_body)
+            self.patch([(end_jump, 1)])
+        self.assigned = if_assigned & self.assigned
+
+    def compile_while_statement(self, node: ast.WhileStatement):
+        # the condition is after the body, so every iteration makes one jump
+        condition_jump = self.emit(JUMP)
+        body = len(self.instructions)
+        assigned = set(self.assigned)
+        self.compile(node.body)
+        self.assigned = assigned
+        self.patch([(condition_jump, 1)])
+        self.patch(self.jump(node.condition, True), body)
+
+    def compile_output_statement(self, node: ast.OutputStatement):
+        value = self.value(node.value)
+        self.locate(node.token)
+        self.emit(OUTPUT, value)
+
+    def compile_assignment_statement(self, node: ast.AssignmentStatement):
+        self.locate(node.token)
+        left = node.left
+        if node.operator == Token.COLON:
+            machine = self.variable(left)
+            instructions = tuple((instruction.left_state.name, instruction.left_symbol.value,
+                                  instruction.right_state.name, instruction.right_symbol.value, instruction.shift,
+                                  instruction.left_state.token.line, instruction.left_state.token.column)
+                                 for instruction in node.right.instructions)
+            self.locate(node.token)
+            self.emit(ADD_INSTRUCTIONS, machine, self.constant(instructions))
+            return
+
+        if isinstance(left, ast.Identifier):
+            if node.operator != Token.ASSIGNMENT:
+                # x += value is compiled as x = x + value
+                register = self.variable(left)
+                self.binary(assignment_operators[node.operator], left.type, register,
+                            register, self.value(node.right), node.token)
+            elif isinstance(node.right, ast.Identifier) and node.right.type in (Type.TAPE, Type.TURING_MACHINE):
+                value = self.value(node.right)
+                self.emit(COPY, self.variable(left, check=False), value)
+            else:
+                self.compile_into(node.right, self.variable(left, check=False))
+            self.assigned.add(left.name)
+            return
+
+        value = self.value(node.right)
+        tape = self.variable(left.left)
+        if left.unary_operator == Token.HEAD:
+            # tape^ = integer
+            if node.operator != Token.ASSIGNMENT:
+                head = self.temporary()
+                self.emit(HEAD, head, tape)
+                self.binary(assignment_operators[node.operator], Type.INTEGER, head, head, value, node.token)
+                value = head
+            self.locate(node.token)
+            self.emit(STORE_HEAD, tape, value)
+            return
+
+        # tape[integer] = symbol, the index is relative to the head
+        if node.operator != Token.ASSIGNMENT:
+            self.locate(node.token)
+            self.emit(FAIL, self.constant('Unsupported operator for symbols'))
+            return
+        index = self.value(left.right)
+        self.locate(left.token)
+        self.emit(STORE_INDEX, tape, index, value)
+
+    # expressions
+
+    def value(self, node) -> int:
+        # register of the value of the expression
+        if isinstance(node, ast.Identifier):
+            return self.variable(node)
+        if isinstance(node, ast.Literal) and node.type in (Type.BOOLEAN, Type.INTEGER, Type.SYMBOL):
+            return self.constant(node.value)
+        register = self.temporary()
+        self.compile_into(node, register)
+        return register
+
+    def compile_into(self, node, register: int):
+        # the register is written only after the operands are computed
+        if isinstance(node, ast.Identifier):
+            self.emit(MOVE, register, self.variable(node))
+        elif isinstance(node, ast.Literal):
+            if node.type == Type.TAPE:
+                self.emit(COPY, register, self.constant(node.value))
+            elif node.type == Type.TURING_MACHINE:
+                self.emit(COPY, register, self.constant(TuringMachine.from_literal(node)))
+            else:
+                self.emit(MOVE, register, self.constant(node.value))
+        elif isinstance(node, ast.InputStatement):
+            self.locate(node.token)
+            self.emit(INPUT, register, input_types.index(node.type))
+        else:
+            self.compile_expression(node, register)
+
+    def compile_expression(self, node: ast.Expression, register: int):
+        unary_operator = node.unary_operator
+        if unary_operator is not None:
+            operand = self.value(node.left)
+            self.locate(node.token)
+            if unary_operator == Token.NOT:
+                self.emit(NOT, register, operand)
+            elif unary_operator == Token.MINUS:
+                self.emit(NEGATE, register, operand)
+            elif unary_operator == Token.HEAD:
+                self.emit(HEAD, register, operand)
+            else:
+                # tape[]
+                self.emit(LENGTH, register, operand)
+            return
+
+        node_operator = node.operator
+        if node_operator in (Token.AND, Token.OR):
+            # the right operand can read the variable of the register, so the value is computed in a temporary
+            result = register if self.is_temporary(register) else self.temporary()
+            self.compile_into(node.left, result)
+            jump = self.emit(JUMP_IF_FALSE if node_operator == Token.AND else JUMP_IF_TRUE, result)
+            # checks of the right operand are skipped with it
+            assigned = set(self.assigned)
+            self.compile_into(node.right, result)
+            self.assigned = assigned
+            self.patch([(jump, 2)])
+            if result != register:
+                self.emit(MOVE, register, result)
+            return
+        left = self.value(node.left)
+        right = self.value(node.right)
+        self.locate(node.token)
+        if node_operator == Token.LEFT_SQUARE_BRACKET:
+            # tape[integer]
+            self.emit(INDEX, register, left, right)
+        elif node_operator == Token.LEFT_BRACKET:
+            # machine(tape)
+            self.emit(CALL, register, left, right)
+        else:
+            self.binary(node_operator, node.left.type, register, left, right, node.token)
+
+    def binary(self, node_operator, type_, register: int, left: int, right: int, token: Token):
+        self.locate(token)
+        opcode = binary_opcodes.get((node_operator, type_))
+        if opcode is None:
+            self.emit(FAIL, self.constant('Unsupported operator {} for type {}'.format(node_operator, type_)))
+        else:
+            self.emit(opcode, register, left, right)
+
+    def jump(self, node, when: bool):
+        """Jumps taken when the condition is true or false (when), returns the jumps to patch as (index, operand)."""
+        if isinstance(node, ast.Expression):
+            if node.unary_operator == Token.NOT:
+                return self.jump(node.left, not when)
+            if node.operator in (Token.AND, Token.OR):
+                # checks of the right operand are skipped with it
+                assigned = set(self.assigned)
+                if (node.operator == Token.AND) != when:
+                    # a and b is false when a is false or b is false, a or b is true when a is true or b is true
+                    jumps = self.jump(node.left, when)
+                    jumps += self.jump(node.right, when)
+                else:
+                    # a and b is true when a is true and b is true, a or b is false when a is false and b is false
+                    skip = self.jump(node.left, not when)
+                    jumps = self.jump(node.right, when)
+                    self.patch(skip)
+                self.assigned = assigned
+                return jumps
+            comparison = binary_opcodes.get((node.operator, node.left.type))
+            if comparison in comparison_jumps:
+                left = self.value(node.left)
+                right = self.value(node.right)
+                self.locate(node.token)
+                if not when:
+                    comparison = negated_comparisons[comparison]
+                return [(self.emit(comparison_jumps[comparison], left, right), 3)]
+        condition = self.value(node)
+        return [(self.emit(JUMP_IF_TRUE if when else JUMP_IF_FALSE, condition), 2)]
+
+    statement_compilers = {
+        ast.InstructionSequence: compile_instruction_sequence,
+        ast.IfStatement: compile_if_statement,
+        ast.WhileStatement: compile_while_statement,
+        ast.OutputStatement: compile_output_statement,
+        ast.AssignmentStatement: compile_assignment_statement,
+    }
+
+
+class VirtualMachine(Interpreter):
+    """Runner of code objects, machine runs, input and values are the same as in the Interpreter.
+
+    Instructions are dispatched by the chain of comparisons of the opcode, the most frequent opcodes first.
+    """
+
+    def run(self, program) -> bool:
+        # runs the code object or the code of the analyzed program, returns False on a runtime error
+        code = program if isinstance(program, CodeObject) else CodeGenerator().generate(program)
+        try:
+            self.execute_code(code)
+        except ProgramError as ex:
+            self.diagnostics.error('Runtime', str(ex), ex.token.line, ex.token.column)
+            return False
+        return True
+
+    @staticmethod
+    def token(code: CodeObject, index: int) -> Token:
+        # token with the position of the instruction for the errors
+        return Token(None, None, code.positions[2 * index], code.positions[2 * index + 1])
+
+    def error(self, message, code: CodeObject, index: int) -> ProgramError:
+        return ProgramError(message, self.token(code, index))
+
+    def execute_code(self, code: CodeObject):
+        registers = [None] * code.registers + code.constants[::-1]
+        instructions = list(zip(*[iter(code.code)] * 4))
+        write = self.output_file.write
+        run_machine = self.run_machine
+        pc = 0
+        try:
+            while True:
+                opcode, a, b, c = instructions[pc]
+                pc += 1
+                if opcode <= JUMP_IF_GREATER_OR_EQUAL:
+                    if opcode == JUMP_IF_LESS:
+                        if registers[a] < registers[b]:
+                            pc = c
+                    elif opcode == JUMP_IF_GREATER_OR_EQUAL:
+                        if registers[a] >= registers[b]:
+                            pc = c
+                    elif opcode == JUMP_IF_GREATER:
+                        if registers[a] > registers[b]:
+                            pc = c
+                    elif opcode == JUMP_IF_LESS_OR_EQUAL:
+                        if registers[a] <= registers[b]:
+                            pc = c
+                    elif opcode == JUMP_IF_EQUAL:
+                        if registers[a] == registers[b]:
+                            pc = c
+                    elif opcode == JUMP_IF_NOT_EQUAL:
+                        if registers[a] != registers[b]:
+                            pc = c
+                    elif opcode == JUMP:
+                        pc = a
+                    elif opcode == MOVE:
+                        registers[a] = registers[b]
+                    elif opcode == JUMP_IF_FALSE:
+                        if not registers[a]:
+                            pc = b
+                    elif opcode == JUMP_IF_TRUE:
+                        if registers[a]:
+                            pc = b
+                    elif opcode == COPY:
+                        registers[a] = registers[b].copy()
+                    elif opcode == CHECK:
+                        if registers[a] is None:
+                            raise self.error('Variable {} is not assigned'.format(registers[b]), code, pc - 1)
+                    else:
+                        return
+                elif opcode == ADD:
+                    registers[a] = registers[b] + registers[c]
+                elif opcode == SUBTRACT:
+                    registers[a] = registers[b] - registers[c]
+                elif opcode == MODULO:
+                    registers[a] = registers[b] % registers[c]
+                elif opcode == MULTIPLY:
+                    registers[a] = registers[b] * registers[c]
+                elif opcode == DIVIDE:
+                    registers[a] = registers[b] // registers[c]
+                elif opcode == INDEX:
+                    # the index is relative to the head
+                    tape = registers[b]
+                    index = tape.head_index + registers[c]
+                    if not 0 <= index < len(tape):
+                        raise self.error('Tape index {} is out of the tape'.format(registers[c]), code, pc - 1)
+                    registers[a] = tape[index]
+                elif opcode == STORE_INDEX:
+                    tape = registers[a]
+                    index = tape.head_index + registers[b]
+                    if not 0 <= index < len(tape):
+                        raise self.error('Tape index {} is out of the tape'.format(registers[b]), code, pc - 1)
+                    tape[index] = registers[c]
+                elif opcode == HEAD:
+                    registers[a] = registers[b].head_index
+                elif opcode == STORE_HEAD:
+                    tape = registers[a]
+                    head_index = registers[b]
+                    if not 0 <= head_index < len(tape):
+                        raise self.error('Head index {} is out of the tape of length {}'.format(
+                            head_index, len(tape)), code, pc - 1)
+                    tape.head = tape.start + head_index
+                elif opcode == EQUAL:
+                    registers[a] = registers[b] == registers[c]
+                elif opcode == NOT_EQUAL:
+                    registers[a] = registers[b] != registers[c]
+                elif opcode == LESS:
+                    registers[a] = registers[b] < registers[c]
+                elif opcode == GREATER:
+                    registers[a] = registers[b] > registers[c]
+                elif opcode == LESS_OR_EQUAL:
+                    registers[a] = registers[b] <= registers[c]
+                elif opcode == GREATER_OR_EQUAL:
+                    registers[a] = registers[b] >= registers[c]
+                elif opcode == NOT:
+                    registers[a] = not registers[b]
+                elif opcode == NEGATE:
+                    registers[a] = -registers[b]
+                elif opcode == LENGTH:
+                    registers[a] = len(registers[b])
+                elif opcode == CALL:
+                    registers[a] = run_machine(registers[b], registers[c])
+                elif opcode == OUTPUT:
+                    write(format_value(registers[a]) + '\n')
+                elif opcode == ADD_TAPES:
+                    registers[a] = add_tapes(registers[b], registers[c])
+                elif opcode == SUBTRACT_TAPES:
+                    registers[a] = subtract_tapes(registers[b], registers[c])
+                elif opcode == COMPOSE:
+                    registers[a] = registers[b] + registers[c]
+                elif opcode == INPUT:
+                    registers[a] = self.read_input(input_types[b], self.token(code, pc - 1))
+                elif opcode == ADD_INSTRUCTIONS:
+                    add_encoded_instructions(registers[a], registers[b])
+                else:
+                    raise self.error(registers[a], code, pc - 1)
+        except ZeroDivisionError:
+            raise self.error('Division by zero', code, pc - 1)
+        except MachineError as ex:
+            raise self.error(str(ex), code, pc - 1)
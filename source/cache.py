@@ -0,0 +1,94 @@
+import hashlib
+import os
+import pickle
+import zlib
+
+COMPILER_VERSION = '0.3.0'
+
+default_cache_directory = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')),
+    'turing-machine-translator',
+)
+
+
+class CompilationCache:
+    """On-disk cache of analyzed programs.
+
+    Entries are keyed by the hash of the program text and the compiler version and hold the analyzed ast
+    pickled and compressed. When the directory grows over max_size bytes, the least recently used entries
+    are removed (modification time of an entry is updated on every hit).
+    """
+    suffix = '.ast'
+
+    def __init__(self, directory: str = default_cache_directory, max_size: int = 64 * 1024 * 1024):
+        self.directory = directory
+        self.max_size = max_size
+
+    @staticmethod
+    def key(program_file: str) -> str:
+        digest = hashlib.sha256(COMPILER_VERSION.encode())
+        with open(program_file, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 16), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def load(self, key):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+            os.utime(path)
+        except OSError:
+            return None
+        try:
+            return pickle.loads(zlib.decompress(data))
+        except Exception:
+            # broken entry is recompiled and overwritten
+            return None
+
+    def store(self, key, ast):
+        os.makedirs(self.directory, exist_ok=True)
+        data = zlib.compress(pickle.dumps(ast, pickle.HIGHEST_PROTOCOL))
+        path = self.path(key)
+        temp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(temp_path, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, path)
+        self.evict()
+
+    def entries(self):
+        try:
+            with os.scandir(self.directory) as it:
+                return [entry for entry in it if entry.name.endswith(self.suffix) and entry.is_file()]
+        except FileNotFoundError:
+            return []
+
+    def evict(self):
+        entries = []
+        total_size = 0
+        for entry in self.entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_size += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+    def clear(self):
+        for entry in self.entries():
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
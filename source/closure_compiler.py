@@ -0,0 +1,318 @@
+from source import ast
+from source.ast import Type
+from source.interpreter import (Interpreter, ProgramError, add_tapes, assignment_operators, format_value,
+                                subtract_tapes)
+from source.lexer import Token
+from source.machine import MachineError, TuringMachine
+
+
+def divide(left, right, token: Token):
+    def evaluate():
+        try:
+            return left() // right()
+        except ZeroDivisionError:
+            raise ProgramError('Division by zero', token)
+    return evaluate
+
+
+def modulo(left, right, token: Token):
+    def evaluate():
+        try:
+            return left() % right()
+        except ZeroDivisionError:
+            raise ProgramError('Division by zero', token)
+    return evaluate
+
+
+# (operator, type of operands) -> closure of the operation on closures of the operands
+binary_closures = {
+    (Token.PLUS, Type.INTEGER): lambda left, right, token: lambda: left() + right(),
+    (Token.MINUS, Type.INTEGER): lambda left, right, token: lambda: left() - right(),
+    (Token.MULTIPLY, Type.INTEGER): lambda left, right, token: lambda: left() * right(),
+    (Token.DIVIDE, Type.INTEGER): divide,
+    (Token.MODULO, Type.INTEGER): modulo,
+    (Token.PLUS, Type.TAPE): lambda left, right, token: lambda: add_tapes(left(), right()),
+    (Token.MINUS, Type.TAPE): lambda left, right, token: lambda: subtract_tapes(left(), right()),
+    (Token.PLUS, Type.TURING_MACHINE): lambda left, right, token: lambda: left() + right(),
+    (Token.LESS, Type.INTEGER): lambda left, right, token: lambda: left() < right(),
+    (Token.GREATER, Type.INTEGER): lambda left, right, token: lambda: left() > right(),
+    (Token.LESS_OR_EQUAL, Type.INTEGER): lambda left, right, token: lambda: left() <= right(),
+    (Token.GREATER_OR_EQUAL, Type.INTEGER): lambda left, right, token: lambda: left() >= right(),
+}
+for equality_type in (Type.INTEGER, Type.SYMBOL, Type.TAPE):
+    binary_closures[Token.EQUAL, equality_type] = lambda left, right, token: lambda: left() == right()
+    binary_closures[Token.NOT_EQUAL, equality_type] = lambda left, right, token: lambda: left() != right()
+
+# (operator, type of operands) -> closure of the operation on the closure of the left operand and the value
+# of the literal right operand, division by a literal zero is left to the closures of binary_closures
+constant_closures = {
+    (Token.PLUS, Type.INTEGER): lambda left, value: lambda: left() + value,
+    (Token.MINUS, Type.INTEGER): lambda left, value: lambda: left() - value,
+    (Token.MULTIPLY, Type.INTEGER): lambda left, value: lambda: left() * value,
+    (Token.DIVIDE, Type.INTEGER): lambda left, value: lambda: left() // value,
+    (Token.MODULO, Type.INTEGER): lambda left, value: lambda: left() % value,
+    (Token.LESS, Type.INTEGER): lambda left, value: lambda: left() < value,
+    (Token.GREATER, Type.INTEGER): lambda left, value: lambda: left() > value,
+    (Token.LESS_OR_EQUAL, Type.INTEGER): lambda left, value: lambda: left() <= value,
+    (Token.GREATER_OR_EQUAL, Type.INTEGER): lambda left, value: lambda: left() >= value,
+}
+for equality_type in (Type.INTEGER, Type.SYMBOL):
+    constant_closures[Token.EQUAL, equality_type] = lambda left, value: lambda: left() == value
+    constant_closures[Token.NOT_EQUAL, equality_type] = lambda left, value: lambda: left() != value
+
+
+def format_boolean(value: bool) -> str:
+    return 'true' if value else 'false'
+
+
+def is_constant(node) -> bool:
+    # literals of immutable values, tapes and machines are copied on every evaluation
+    return isinstance(node, ast.Literal) and node.type in (Type.BOOLEAN, Type.INTEGER, Type.SYMBOL)
+
+
+class ClosureCompiler(Interpreter):
+    """Backend compiling every node of the analyzed ast once into a Python closure, the program runs by calling them.
+
+    The closures are picked by the node types and the static types of the semantic analysis, so the operations
+    are done without dispatch and type checks at run time, and operations with a literal right operand
+    take its value directly. Values, errors and machine runs are the same as in the Interpreter.
+    """
+
+    def run(self, program: ast.InstructionSequence) -> bool:
+        # returns False when the program is stopped by a runtime error
+        code = self.compile(program)
+        try:
+            code()
+        except ProgramError as ex:
+            self.diagnostics.error('Runtime', str(ex), ex.token.line, ex.token.column)
+            return False
+        return True
+
+    def compile(self, node):
+        return self.statement_compilers[type(node)](self, node)
+
+    def compile_expression(self, node):
+        return self.expression_compilers[type(node)](self, node)
+
+    # statements
+
+    def compile_instruction_sequence(self, node: ast.InstructionSequence):
+        instructions = tuple(self.compile(instruction) for instruction in node.instructions)
+        if len(instructions) == 1:
+            return instructions[0]
+
+        def execute():
+            for instruction in instructions:
+                instruction()
+        return execute
+
+    def compile_if_statement(self, node: ast.IfStatement):
+        # elif branches are if statements in the else bodies
+        condition = self.compile_expression(node.condition)
+        if_body = self.compile(node.if_body)
+        if node.else_body is None:
+            def execute():
+                if condition():
+                    if_body()
+            return execute
+
+        else_body = self.compile(node.else_body)
+
+        def execute():
+            if condition():
+                if_body()
+            else:
+                else_body()
+        return execute
+
+    def compile_while_statement(self, node: ast.WhileStatement):
+        condition = self.compile_expression(node.condition)
+        body = self.compile(node.body)
+
+        def execute():
+            while condition():
+                body()
+        return execute
+
+    def compile_output_statement(self, node: ast.OutputStatement):
+        value = self.compile_expression(node.value)
+        formatter = format_boolean if node.value.type == Type.BOOLEAN else format_value
+        write = self.output_file.write
+
+        def execute():
+            write(formatter(value()) + '\n')
+        return execute
+
+    def compile_assignment_statement(self, node: ast.AssignmentStatement):
+        variables = self.variables
+        token = node.token
+        if node.operator == Token.COLON:
+            load = self.compile_identifier(node.left)
+            instructions = node.right
+
+            def execute():
+                try:
+                    load().add_instructions(instructions)
+                except MachineError as ex:
+                    raise ProgramError(str(ex), token)
+            return execute
+
+        left = node.left
+        if isinstance(left, ast.Identifier):
+            name = left.name
+            if node.operator != Token.ASSIGNMENT:
+                # x += value is compiled as x = x + value
+                value = self.compile_binary(assignment_operators[node.operator], left.type, left, node.right, token)
+            elif isinstance(node.right, ast.Identifier) and node.right.type in (Type.TAPE, Type.TURING_MACHINE):
+                load = self.compile_identifier(node.right)
+
+                def value():
+                    return load().copy()
+            else:
+                value = self.compile_expression(node.right)
+
+            def execute():
+                variables[name] = value()
+            return execute
+
+        load = self.compile_identifier(left.left)
+        value = self.compile_expression(node.right)
+        if left.unary_operator == Token.HEAD:
+            # tape^ = integer
+            if node.operator != Token.ASSIGNMENT:
+                value = binary_closures[assignment_operators[node.operator], Type.INTEGER](
+                    lambda: load().head_index, value, token)
+
+            def execute():
+                head_index = value()
+                tape = load()
+                if not 0 <= head_index < len(tape):
+                    raise ProgramError('Head index {} is out of the tape of length {}'.format(head_index, len(tape)),
+                                       token)
+                tape.head = tape.start + head_index
+            return execute
+
+        # tape[integer] = symbol, the index is relative to the head
+        if node.operator != Token.ASSIGNMENT:
+            def execute():
+                raise ProgramError('Unsupported operator for symbols', token)
+            return execute
+
+        offset = self.compile_expression(left.right)
+        index_token = left.token
+
+        def execute():
+            symbol = value()
+            tape = load()
+            relative_index = offset()
+            index = tape.head_index + relative_index
+            if not 0 <= index < len(tape):
+                raise ProgramError('Tape index {} is out of the tape'.format(relative_index), index_token)
+            tape[index] = symbol
+        return execute
+
+    # expressions
+
+    def compile_identifier(self, node: ast.Identifier):
+        variables = self.variables
+        name = node.name
+        token = node.token
+
+        def evaluate():
+            try:
+                return variables[name]
+            except KeyError:
+                # variables declared in branches which are not executed
+                raise ProgramError('Variable {} is not assigned'.format(name), token)
+        return evaluate
+
+    def compile_literal(self, node: ast.Literal):
+        if node.type == Type.TAPE:
+            return node.value.copy
+        if node.type == Type.TURING_MACHINE:
+            return TuringMachine.from_literal(node).copy
+        value = node.value
+        return lambda: value
+
+    def compile_input(self, node: ast.InputStatement):
+        return lambda: self.evaluate_input(node)
+
+    def compile_expression_node(self, node: ast.Expression):
+        unary_operator = node.unary_operator
+        if unary_operator is not None:
+            operand = self.compile_expression(node.left)
+            if unary_operator == Token.NOT:
+                return lambda: not operand()
+            if unary_operator == Token.MINUS:
+                return lambda: -operand()
+            if unary_operator == Token.HEAD:
+                return lambda: operand().head_index
+            # tape[]
+            return lambda: len(operand())
+
+        node_operator = node.operator
+        if node_operator == Token.AND:
+            left = self.compile_expression(node.left)
+            right = self.compile_expression(node.right)
+            return lambda: left() and right()
+        if node_operator == Token.OR:
+            left = self.compile_expression(node.left)
+            right = self.compile_expression(node.right)
+            return lambda: left() or right()
+        if node_operator == Token.LEFT_SQUARE_BRACKET:
+            return self.compile_index(node)
+        if node_operator == Token.LEFT_BRACKET:
+            return self.compile_call(node)
+        return self.compile_binary(node_operator, node.left.type, node.left, node.right, node.token)
+
+    def compile_binary(self, node_operator, type_, left_node, right_node, token: Token):
+        left = self.compile_expression(left_node)
+        if is_constant(right_node) and (node_operator, type_) in constant_closures:
+            value = right_node.value
+            if value or node_operator not in (Token.DIVIDE, Token.MODULO):
+                return constant_closures[node_operator, type_](left, value)
+        right = self.compile_expression(right_node)
+        closure = binary_closures.get((node_operator, type_))
+        if closure is None:
+            def evaluate():
+                raise ProgramError('Unsupported operator {} for type {}'.format(node_operator, type_), token)
+            return evaluate
+        return closure(left, right, token)
+
+    def compile_index(self, node: ast.Expression):
+        # tape[integer], the index is relative to the head
+        tape = self.compile_expression(node.left)
+        offset = self.compile_expression(node.right)
+        token = node.token
+
+        def evaluate():
+            value = tape()
+            relative_index = offset()
+            index = value.head_index + relative_index
+            if not 0 <= index < len(value):
+                raise ProgramError('Tape index {} is out of the tape'.format(relative_index), token)
+            return value[index]
+        return evaluate
+
+    def compile_call(self, node: ast.Expression):
+        # machine(tape)
+        machine = self.compile_expression(node.left)
+        tape = self.compile_expression(node.right)
+        call = self.call
+        token = node.token
+        return lambda: call(machine(), tape(), token)
+
+    statement_compilers = {
+        ast.InstructionSequence: compile_instruction_sequence,
+        ast.IfStatement: compile_if_statement,
+        ast.WhileStatement: compile_while_statement,
+        ast.OutputStatement: compile_output_statement,
+        ast.AssignmentStatement: compile_assignment_statement,
+    }
+
+    expression_compilers = {
+        ast.Expression: compile_expression_node,
+        ast.Identifier: compile_identifier,
+        ast.Literal: compile_literal,
+        ast.InputStatement: compile_input,
+    }
@@ -0,0 +1,79 @@
+import glob
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+from source.cache import CompilationCache
+from source.error import Diagnostics
+from source.lexer import StreamingLexer
+from source.semantic_analyzer import SemanticAnalyzer
+
+
+def compile_file(program_file: str, cache: CompilationCache = None, diagnostics: Diagnostics = None):
+    # raises FileNotFoundError, errors of the program are collected to diagnostics
+    if diagnostics is None:
+        diagnostics = Diagnostics(program_file=program_file)
+    key = cache.key(program_file) if cache is not None else None
+    ast = cache.load(key) if cache is not None else None
+    if ast is None:
+        with StreamingLexer(program_file, diagnostics=diagnostics) as lexer:
+            ast = SemanticAnalyzer(lexer=lexer).analyze()
+        # programs with errors are not cached, so errors are reported on every compilation
+        if cache is not None and ast is not None and not diagnostics.has_errors():
+            cache.store(key, ast)
+    return ast
+
+
+class CompilationResult:
+    def __init__(self, program_file: str):
+        self.program_file = program_file
+        self.success = False
+        # rendered diagnostics of the file
+        self.output = ''
+
+
+def compile_file_in_worker(program_file: str, cache_directory: str = None) -> CompilationResult:
+    result = CompilationResult(program_file)
+    cache = CompilationCache(cache_directory) if cache_directory is not None else None
+    diagnostics = Diagnostics(program_file=program_file)
+    try:
+        compile_file(program_file, cache, diagnostics)
+        result.success = not diagnostics.has_errors()
+        result.output = diagnostics.render()
+    except FileNotFoundError:
+        result.output = "No such file: '{}'\n".format(program_file)
+    except Exception:
+        result.output = diagnostics.render() + 'Internal compiler error:\n' + traceback.format_exc()
+    return result
+
+
+def expand_patterns(patterns: List[str]) -> List[str]:
+    # patterns without matches are kept to be reported as missing files
+    program_files = []
+    seen = set()
+    for pattern in patterns:
+        is_pattern = any(char in pattern for char in '*?[')
+        matches = sorted(glob.glob(pattern, recursive=True)) if is_pattern else [pattern]
+        for program_file in matches or [pattern]:
+            if os.path.isdir(program_file):
+                continue
+            if program_file not in seen:
+                seen.add(program_file)
+                program_files.append(program_file)
+    return program_files
+
+
+def compile_batch(program_files: List[str], jobs: int = None, cache_directory: str = None) -> List[CompilationResult]:
+    """Compile files on a process pool, diagnostics of each file are printed as one block in the order of files"""
+    results = []
+    with ProcessPoolExecutor(jobs or os.cpu_count()) as executor:
+        for result in executor.map(compile_file_in_worker, program_files,
+                                   [cache_directory] * len(program_files)):
+            print('{}: {}'.format(result.program_file, 'ok' if result.success else 'failed'))
+            if result.output:
+                print(result.output, end='', flush=True)
+            results.append(result)
+    failed = sum(not result.success for result in results)
+    print('Compiled {} files: {} ok, {} failed'.format(len(results), len(results) - failed, failed))
+    return results
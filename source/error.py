@@ -1,39 +1,91 @@
-program_text = []
+import locale
+import re
+from array import array
 
-lexer_errors = False
-parser_errors = False
-semantic_errors = False
 
+class Diagnostic:
+    def __init__(self, type_, message, line, column):
+        self.type = type_
+        self.message = message
+        self.line = line
+        self.column = column
 
-def get_lexer_errors():
-    return lexer_errors
+    def __str__(self):
+        return '{} Error on {}:{}: {}'.format(self.type, self.line, self.column, self.message)
 
 
-def get_parser_errors():
-    return parser_errors
+class Diagnostics:
+    """Errors of one compilation.
 
+    Only the program text or the name of the program file is kept, lines shown in the error messages
+    are fetched on demand through the index of line offsets built on the first rendering.
+    """
 
-def get_semantic_errors():
-    return semantic_errors
+    def __init__(self, program_text: str = '', program_file: str = None):
+        self.program_text = program_text
+        self.program_file = program_file
+        self.line_offsets = None
+        self.errors = []
+        self.error_counts = {}
 
+    def error(self, error_type, error_message, line, column):
+        self.add(Diagnostic(error_type, error_message, line, column))
 
-def init_program_text(prog_text):
-    global program_text
-    program_text = prog_text.split('\n')
+    def add(self, error: Diagnostic):
+        self.errors.append(error)
+        self.error_counts[error.type] = self.error_counts.get(error.type, 0) + 1
 
+    def has_errors(self, error_type=None):
+        if error_type is None:
+            return bool(self.errors)
+        return error_type in self.error_counts
 
-def generate_error(error_type, error_message, line, column):
-    global lexer_errors, parser_errors, semantic_errors
-    if error_type == 'Lexer':
-        lexer_errors = True
-    elif error_type == 'Parser':
-        parser_errors = True
-    elif error_type == 'Semantic':
-        semantic_errors = True
+    @property
+    def lexer_errors(self):
+        return self.has_errors('Lexer')
 
-    print('{error_type} Error on {line}:{column}: {error_message}:'.format(
-        error_type=error_type, error_message=error_message, line=line, column=column))
-    raw_line = program_text[line - 1]
-    print(' ' + raw_line.replace('\t', ' '))
-    caret_line = ' ' * column + '^'
-    print(caret_line)
+    @property
+    def parser_errors(self):
+        return self.has_errors('Parser')
+
+    @property
+    def semantic_errors(self):
+        return self.has_errors('Semantic')
+
+    def build_line_offsets(self):
+        offsets = array('q', [0])
+        if self.program_file is None:
+            offsets.extend(mo.end() for mo in re.finditer('\n', self.program_text))
+        else:
+            # binary file iteration splits on b'\n' without decoding the whole file
+            with open(self.program_file, 'rb') as file:
+                offset = 0
+                for raw_line in file:
+                    offset += len(raw_line)
+                    offsets.append(offset)
+        return offsets
+
+    def get_program_line(self, line):
+        if self.line_offsets is None:
+            self.line_offsets = self.build_line_offsets()
+        if line > len(self.line_offsets):
+            return ''
+        start = self.line_offsets[line - 1]
+        if self.program_file is None:
+            end = self.program_text.find('\n', start)
+            return self.program_text[start:] if end == -1 else self.program_text[start:end]
+        with open(self.program_file, 'rb') as file:
+            file.seek(start)
+            raw_line = file.readline()
+        if raw_line.endswith(b'\n'):
+            raw_line = raw_line[:-1]
+        if raw_line.endswith(b'\r'):
+            raw_line = raw_line[:-1]
+        return raw_line.decode(locale.getpreferredencoding(False), errors='replace')
+
+    def render_error(self, error: Diagnostic):
+        raw_line = self.get_program_line(error.line)
+        return '{}:\n {}\n{}^\n'.format(error, raw_line.replace('\t', ' '), ' ' * error.column)
+
+    def render(self):
+        return ''.join(self.render_error(error) for error in self.errors)
@@ -0,0 +1,235 @@
+from typing import Tuple
+
+from source import ast
+from source.ast import Type
+from source.interpreter import binary_operations
+from source.lexer import Token
+
+# types of literals which are folded, machines are not run at compile time
+constant_types = (Type.BOOLEAN, Type.INTEGER, Type.SYMBOL, Type.TAPE)
+
+# unary operator -> function of the value of the operand
+unary_operations = {
+    Token.NOT: lambda value: not value,
+    Token.MINUS: lambda value: -value,
+    # tape^
+    Token.HEAD: lambda value: value.head_index,
+    # tape[]
+    Token.LEFT_SQUARE_BRACKET: len,
+}
+
+
+class FoldingReport:
+    def __init__(self):
+        self.folded_expressions = 0
+        self.removed_branches = 0
+        self.removed_loops = 0
+        # nodes of the ast removed by folding and elimination
+        self.eliminated_nodes = 0
+
+    def __str__(self):
+        return 'folded {} expressions, removed {} branches and {} loops, eliminated {} nodes'.format(
+            self.folded_expressions, self.removed_branches, self.removed_loops, self.eliminated_nodes)
+
+
+def children(node) -> list:
+    # child nodes of statements and expressions, instructions of machines are a part of their node
+    if isinstance(node, ast.InstructionSequence):
+        return node.instructions
+    if isinstance(node, ast.IfStatement):
+        return [node.condition, node.if_body] + ([node.else_body] if node.else_body is not None else [])
+    if isinstance(node, ast.WhileStatement):
+        return [node.condition, node.body]
+    if isinstance(node, ast.OutputStatement):
+        return [node.value]
+    if isinstance(node, ast.AssignmentStatement):
+        return [node.left, node.right]
+    if isinstance(node, ast.Expression):
+        return [node.left] + ([node.right] if node.right is not None else [])
+    return []
+
+
+def count_nodes(node) -> int:
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(children(node))
+    return count
+
+
+def is_constant(node) -> bool:
+    return isinstance(node, ast.Literal) and node.type in constant_types
+
+
+def is_literal(node, value) -> bool:
+    return isinstance(node, ast.Literal) and node.type == Type.BOOLEAN and node.value is value
+
+
+def in_range(value) -> bool:
+    # results of integer expressions have the range of integer literals
+    return not isinstance(value, int) or isinstance(value, bool) or -2 ** 15 <= value <= 2 ** 15 - 1
+
+
+class ConstantFolder:
+    """Pass over the analyzed ast replacing constant expressions by literals and removing dead branches.
+
+    Expressions of literals are evaluated with the operations of the Interpreter. Integer results out of
+    the range of integer literals, division by zero and indexes out of tapes are left to run time, so they
+    give the same results and errors as without folding. Conditions which are literals after folding
+    select the branch of if statements and remove while loops which are never run.
+    """
+
+    def __init__(self):
+        self.report = FoldingReport()
+
+    def fold_statement(self, node) -> list:
+        # statements replacing the statement, the folded statement itself, its body or nothing
+        return self.statement_folders[type(node)](self, node)
+
+    def fold_expression(self, node):
+        # expression replacing the expression
+        folder = self.expression_folders.get(type(node))
+        return folder(self, node) if folder is not None else node
+
+    def eliminate(self, node, replacement=None):
+        self.report.eliminated_nodes += count_nodes(node) - (count_nodes(replacement) if replacement is not None else 0)
+
+    def fold_sequence(self, node: ast.InstructionSequence) -> ast.InstructionSequence:
+        instructions = []
+        for instruction in node.instructions:
+            instructions.extend(self.fold_statement(instruction))
+        node.instructions = instructions
+        return node
+
+    # statements
+
+    def fold_instruction_sequence(self, node: ast.InstructionSequence) -> list:
+        return [self.fold_sequence(node)]
+
+    def fold_if_statement(self, node: ast.IfStatement) -> list:
+        # elif branches are if statements in the else bodies
+        node.condition = self.fold_expression(node.condition)
+        if isinstance(node.condition, ast.Literal):
+            self.report.removed_branches += 1
+            body = node.if_body if node.condition.value else node.else_body
+            self.eliminate(node, body)
+            if isinstance(body, ast.InstructionSequence):
+                # instructions of the body are moved to the enclosing sequence
+                self.report.eliminated_nodes += 1
+                return self.fold_sequence(body).instructions
+            return self.fold_statement(body) if body is not None else []
+        self.fold_sequence(node.if_body)
+        if node.else_body is not None:
+            else_body = self.fold_statement(node.else_body)
+            if len(else_body) == 1:
+                node.else_body = else_body[0]
+            elif else_body:
+                # instructions of the taken branch of the elif
+                node.else_body = ast.InstructionSequence()
+                node.else_body.instructions = else_body
+                self.report.eliminated_nodes -= 1
+            else:
+                node.else_body = None
+        return [node]
+
+    def fold_while_statement(self, node: ast.WhileStatement) -> list:
+        node.condition = self.fold_expression(node.condition)
+        if is_literal(node.condition, False):
+            self.report.removed_loops += 1
+            self.eliminate(node)
+            return []
+        self.fold_sequence(node.body)
+        return [node]
+
+    def fold_output_statement(self, node: ast.OutputStatement) -> list:
+        node.value = self.fold_expression(node.value)
+        return [node]
+
+    def fold_assignment_statement(self, node: ast.AssignmentStatement) -> list:
+        if node.operator == Token.COLON:
+            return [node]
+        node.right = self.fold_expression(node.right)
+        if isinstance(node.left, ast.Expression) and node.left.right is not None:
+            # tape[integer] = symbol
+            node.left.right = self.fold_expression(node.left.right)
+        return [node]
+
+    # expressions
+
+    def constant(self, node: ast.Expression, value):
+        # literal replacing the expression or the expression when the value is out of the range
+        if not in_range(value):
+            return node
+        literal = ast.Literal()
+        literal.token = node.token
+        literal.type = node.type
+        literal.value = value
+        self.report.folded_expressions += 1
+        self.eliminate(node, literal)
+        return literal
+
+    def fold_expression_node(self, node: ast.Expression):
+        node.left = self.fold_expression(node.left)
+        left = node.left
+        if node.unary_operator is not None:
+            if (node.unary_operator in (Token.NOT, Token.MINUS) and isinstance(left, ast.Expression)
+                    and left.unary_operator == node.unary_operator):
+                # not not x, - -x
+                self.eliminate(node, left.left)
+                return left.left
+            if is_constant(left):
+                return self.constant(node, unary_operations[node.unary_operator](left.value))
+            return node
+
+        node.right = self.fold_expression(node.right)
+        right = node.right
+        if node.operator in (Token.AND, Token.OR):
+            # false and x is false, true or x is true, the right operand is not evaluated after them,
+            # true and x, x and true, false or x, x or false are x
+            absorbing = node.operator == Token.OR
+            if is_literal(left, absorbing):
+                self.eliminate(node, left)
+                return left
+            if is_literal(left, not absorbing):
+                self.eliminate(node, right)
+                return right
+            if is_literal(right, not absorbing):
+                self.eliminate(node, left)
+                return left
+            return node
+        if not is_constant(left) or not is_constant(right):
+            return node
+        if node.operator == Token.LEFT_SQUARE_BRACKET:
+            # tape[integer], the index is relative to the head
+            index = left.value.head_index + right.value
+            if not 0 <= index < len(left.value):
+                return node
+            return self.constant(node, left.value[index])
+        operation = binary_operations.get((node.operator, left.type))
+        if operation is None:
+            return node
+        try:
+            return self.constant(node, operation(left.value, right.value))
+        except ZeroDivisionError:
+            return node
+
+    statement_folders = {
+        ast.InstructionSequence: fold_instruction_sequence,
+        ast.IfStatement: fold_if_statement,
+        ast.WhileStatement: fold_while_statement,
+        ast.OutputStatement: fold_output_statement,
+        ast.AssignmentStatement: fold_assignment_statement,
+    }
+
+    expression_folders = {
+        ast.Expression: fold_expression_node,
+    }
+
+
+def fold(program: ast.InstructionSequence) -> Tuple[ast.InstructionSequence, FoldingReport]:
+    """Fold constant expressions and remove dead branches of the analyzed program in place."""
+    folder = ConstantFolder()
+    folder.fold_sequence(program)
+    return program, folder.report
@@ -0,0 +1,230 @@
+from bisect import bisect_right
+from typing import List
+
+from source import ast
+from source.ast import Type
+from source.error import Diagnostics
+from source.lexer import Lexer, Token
+from source.parser import Parser
+from source.semantic_analyzer import SemanticAnalyzer
+
+
+class TokenRecorder:
+    """Token source for the parser remembering all tokens it has returned"""
+
+    def __init__(self, lexer):
+        self.lexer = lexer
+        self.diagnostics = lexer.diagnostics
+        self.tokens = []
+
+    def next_token(self):
+        token = self.lexer.next_token()
+        self.tokens.append(token)
+        return token
+
+
+class TokenReplay:
+    """Token source for the parser returning already lexed tokens"""
+
+    def __init__(self, tokens: List[Token], diagnostics: Diagnostics):
+        self.tokens = tokens
+        self.diagnostics = diagnostics
+        self.index = 0
+        last = tokens[-1]
+        self.end_of_file = Token(Token.END_OF_FILE, '', last.line, last.column)
+
+    def next_token(self):
+        if self.index == len(self.tokens):
+            return self.end_of_file
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+
+class Statement:
+    """Top-level statement of the program with its tokens and variables"""
+
+    def __init__(self, node, tokens: List[Token]):
+        self.node = node
+        self.tokens = tokens
+        self.first_line = tokens[0].line
+        # names of variables used or assigned in the statement
+        self.variables = collect_variables(node)
+        # variables declared by the statement (first assignments): name -> type
+        self.declared = {}
+        # semantic errors of the statement
+        self.errors = []
+
+
+def collect_variables(node):
+    # names of all identifiers except turing machine states
+    names = set()
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast.Identifier):
+            if node.type != Type.TURING_MACHINE_STATE:
+                names.add(node.name)
+        elif isinstance(node, list):
+            stack.extend(node)
+        elif hasattr(node, '__dict__') and not isinstance(node, Token):
+            stack.extend(value for value in vars(node).values() if value is not None)
+    return names
+
+
+def changed_declarations(old: dict, new: dict) -> set:
+    # names declared by only one of the dicts or with different types, the type is None after errors
+    return {name for name in old.keys() | new.keys() if name not in old or name not in new or old[name] != new[name]}
+
+
+class IncrementalAnalyzer:
+    """Analyzer keeping tokens and ast of the program between edits.
+
+    On update only the top-level statements touched by the edit are lexed and parsed again,
+    and only the statements using variables whose declarations changed are analyzed again.
+    Programs with lexer or parser errors are analyzed from scratch on the next update.
+    Diagnostics of the last update contain errors of all statements, not only of the analyzed ones.
+    """
+
+    def __init__(self, program_text: str = ''):
+        self.lines = []
+        self.statements: List[Statement] = []
+        self.ast = None
+        self.valid = False
+        self.diagnostics = Diagnostics()
+        self.update(program_text)
+
+    def update(self, program_text: str):
+        lines = program_text.split('\n')
+        if not self.valid or not self.statements or not self.update_damaged(program_text, lines):
+            self.analyze_all(program_text)
+        self.lines = lines
+        if self.valid:
+            self.diagnostics = Diagnostics(program_text)
+            for statement in self.statements:
+                for error in statement.errors:
+                    self.diagnostics.add(error)
+        return self.ast
+
+    def parse_statements(self, lexer):
+        # parse top-level statements one by one remembering the tokens of each one
+        recorder = TokenRecorder(lexer)
+        statements = []
+        try:
+            parser = Parser(lexer=recorder)
+            while parser.token:
+                first = len(recorder.tokens) - 1
+                node = parser.instruction()
+                statements.append(Statement(node, recorder.tokens[first:-1]))
+        except AssertionError as ex:
+            if ex.args[0] != 'End of program text':
+                raise
+            return None
+        if lexer.diagnostics.lexer_errors or lexer.diagnostics.parser_errors:
+            return None
+        return statements
+
+    def analyze_all(self, program_text):
+        diagnostics = Diagnostics(program_text)
+        self.statements = self.parse_statements(Lexer(program_text, diagnostics=diagnostics)) or []
+        self.valid = not diagnostics.lexer_errors and not diagnostics.parser_errors
+        if not self.valid:
+            self.ast = None
+            self.diagnostics = diagnostics
+            return
+        self.ast = ast.InstructionSequence()
+        self.ast.instructions = [statement.node for statement in self.statements]
+        analyzer = SemanticAnalyzer(diagnostics=diagnostics)
+        for statement in self.statements:
+            self.analyze_statement(analyzer, statement)
+
+    @staticmethod
+    def analyze_statement(analyzer, statement):
+        declared_before = set(analyzer.variable_table)
+        errors_before = len(analyzer.diagnostics.errors)
+        analyzer.analyze_statement(statement.node)
+        statement.declared = {name: type_ for name, type_ in analyzer.variable_table.items()
+                              if name not in declared_before}
+        statement.errors = analyzer.diagnostics.errors[errors_before:]
+
+    def update_damaged(self, program_text, lines):
+        old_lines = self.lines
+        if lines == old_lines:
+            return True
+
+        # changed lines are lines between common beginning and common ending of old and new text
+        common_length = min(len(lines), len(old_lines))
+        prefix = 0
+        while prefix < common_length and lines[prefix] == old_lines[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < common_length - prefix and lines[-1 - suffix] == old_lines[-1 - suffix]:
+            suffix += 1
+        shift = len(lines) - len(old_lines)
+
+        # damaged statements: from the one containing the last line before the edit
+        # (elif, else and indented lines attach to it) to the one containing the last changed line
+        first_lines = [statement.first_line for statement in self.statements]
+        first = max(bisect_right(first_lines, max(prefix, 1)) - 1, 0)
+        last = max(bisect_right(first_lines, len(old_lines) - suffix) - 1, first)
+        start_line = 1 if first == 0 else first_lines[first]
+        if last + 1 < len(self.statements):
+            end_line = first_lines[last + 1] - 1 + shift
+        else:
+            end_line = len(lines)
+
+        # the next statement should still begin at a line start which is not a continuation of damaged lines
+        if end_line < len(lines) and lines[end_line - 1].endswith('\\'):
+            return False
+        damaged_text = '\n'.join(lines[start_line - 1:end_line])
+        block_comment_start = damaged_text.rfind('/#')
+        if block_comment_start != -1 and damaged_text.find('#/', block_comment_start + 2) == -1:
+            return False
+
+        start = sum(len(line) + 1 for line in lines[:start_line - 1])
+        end = min(start + len(damaged_text) + 1, len(program_text))
+        diagnostics = Diagnostics(program_text)
+        new_statements = self.parse_statements(Lexer(program_text, start, end, start_line, diagnostics))
+        if new_statements is None:
+            # errors are reported for the whole program
+            return False
+
+        # following statements are moved by the number of inserted lines
+        following = self.statements[last + 1:]
+        if shift:
+            for statement in following:
+                statement.first_line += shift
+                for token in statement.tokens:
+                    token.line += shift
+                for error in statement.errors:
+                    error.line += shift
+
+        # analyze new statements and statements using variables whose declarations have been changed
+        analyzer = SemanticAnalyzer(diagnostics=diagnostics)
+        for statement in self.statements[:first]:
+            analyzer.variable_table.update(statement.declared)
+        old_declared = {}
+        for statement in self.statements[first:last + 1]:
+            old_declared.update(statement.declared)
+        new_declared = {}
+        for statement in new_statements:
+            self.analyze_statement(analyzer, statement)
+            new_declared.update(statement.declared)
+        changed = changed_declarations(old_declared, new_declared)
+        for idx, statement in enumerate(following):
+            if statement.variables & changed:
+                # nodes are modified by analysis, so the statement is parsed again from its tokens
+                declared = statement.declared
+                parser = Parser(lexer=TokenReplay(statement.tokens, diagnostics))
+                statement = Statement(parser.instruction(), statement.tokens)
+                self.analyze_statement(analyzer, statement)
+                following[idx] = statement
+                changed |= changed_declarations(declared, statement.declared)
+            else:
+                analyzer.variable_table.update(statement.declared)
+
+        self.statements[first:] = new_statements + following
+        if self.ast is None:
+            self.ast = ast.InstructionSequence()
+        self.ast.instructions = [statement.node for statement in self.statements]
+        return True
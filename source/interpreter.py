@@ -0,0 +1,334 @@
+import operator
+import sys
+
+from source import ast
+from source.ast import Type
+from source.error import Diagnostics
+from source.lexer import Token
+from source.machine import MachineCache, MachineError, MachinePipeline, TuringMachine
+from source.machine_compiler import CompiledMachine
+from source.optimizer import optimize
+from source.profiler import profile
+from source.tape import Tape
+
+
+class ProgramError(Exception):
+    """Runtime error of the program, reported on the token of the failed statement or expression"""
+
+    def __init__(self, message, token: Token):
+        super().__init__(message)
+        self.token = token
+
+
+def divide(left: int, right: int) -> int:
+    return left // right
+
+
+def modulo(left: int, right: int) -> int:
+    return left % right
+
+
+def add_tapes(left: Tape, right: Tape) -> Tape:
+    # the head stays in the left tape
+    return Tape(left.symbols() + right.symbols(), left.head_index)
+
+
+def subtract_tapes(left: Tape, right: Tape) -> Tape:
+    # the head stays in the right tape
+    return Tape(left.symbols() + right.symbols(), len(left) + right.head_index)
+
+
+# (operator, type of operands) -> function of operands, AND, OR, indexing and calls are handled by the interpreter
+binary_operations = {
+    (Token.PLUS, Type.INTEGER): operator.add,
+    (Token.MINUS, Type.INTEGER): operator.sub,
+    (Token.MULTIPLY, Type.INTEGER): operator.mul,
+    (Token.DIVIDE, Type.INTEGER): divide,
+    (Token.MODULO, Type.INTEGER): modulo,
+    (Token.PLUS, Type.TAPE): add_tapes,
+    (Token.MINUS, Type.TAPE): subtract_tapes,
+    (Token.PLUS, Type.TURING_MACHINE): operator.add,
+    (Token.LESS, Type.INTEGER): operator.lt,
+    (Token.GREATER, Type.INTEGER): operator.gt,
+    (Token.LESS_OR_EQUAL, Type.INTEGER): operator.le,
+    (Token.GREATER_OR_EQUAL, Type.INTEGER): operator.ge,
+}
+for equality_type in (Type.INTEGER, Type.SYMBOL, Type.TAPE):
+    binary_operations[Token.EQUAL, equality_type] = operator.eq
+    binary_operations[Token.NOT_EQUAL, equality_type] = operator.ne
+
+# operator of the assignment -> operator of the expression
+assignment_operators = {
+    Token.ASSIGNMENT_PLUS: Token.PLUS,
+    Token.ASSIGNMENT_MINUS: Token.MINUS,
+    Token.ASSIGNMENT_MULTIPLY: Token.MULTIPLY,
+    Token.ASSIGNMENT_DIVIDE: Token.DIVIDE,
+    Token.ASSIGNMENT_MODULO: Token.MODULO,
+}
+
+
+def format_value(value) -> str:
+    # values are printed as literals without quotes
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    return str(value)
+
+
+class Interpreter:
+    """Interpreter of analyzed programs walking the ast.
+
+    Statements and expressions are dispatched by the types of nodes through the dicts of handlers and
+    binary operations by the operator and the type of operands, both are looked up once per node.
+    Values are bool, int, str (symbols), Tape and TuringMachine or MachinePipeline. Tapes and machines
+    are changed in place by assignments, so they are copied when they are assigned to another variable.
+    Machines are optimized before they are run, machine runs take the limits and the cache of the interpreter.
+    With compile_machines the optimized machines are run by the Python code generated for them.
+    With profile_machines they are run by the profiler without the cache and the loop detection.
+    """
+
+    def __init__(self, diagnostics: Diagnostics = None, input_file=None, output_file=None,
+                 max_steps: int = None, max_tape_length: int = None, detect_loops: bool = False,
+                 machine_cache: MachineCache = None, compile_machines: bool = False, profile_machines: bool = False):
+        self.diagnostics = diagnostics if diagnostics is not None else Diagnostics()
+        self.input_file = input_file if input_file is not None else sys.stdin
+        self.output_file = output_file if output_file is not None else sys.stdout
+        self.max_steps = max_steps
+        self.max_tape_length = max_tape_length
+        self.detect_loops = detect_loops
+        self.machine_cache = machine_cache
+        self.compile_machines = compile_machines
+        self.profile_machines = profile_machines
+        self.variables = {}
+        # literal node -> machine of the literal
+        self.machine_literals = {}
+        # signature of the machine -> optimized machine, machines with the same fingerprint but other names of states
+        # are optimized separately, so the errors and the profiles name their own states
+        self.optimized_machines = {}
+        # reports of the optimized machines in the order they are optimized
+        self.optimization_reports = []
+        # signature of the run machine -> counts of its runs
+        self.machine_profiles = {}
+
+    def run(self, program: ast.InstructionSequence) -> bool:
+        # returns False when the program is stopped by a runtime error
+        try:
+            self.execute(program)
+        except ProgramError as ex:
+            self.diagnostics.error('Runtime', str(ex), ex.token.line, ex.token.column)
+            return False
+        return True
+
+    def execute(self, node):
+        self.statement_handlers[type(node)](self, node)
+
+    def evaluate(self, node):
+        return self.expression_handlers[type(node)](self, node)
+
+    # statements
+
+    def execute_instruction_sequence(self, node: ast.InstructionSequence):
+        handlers = self.statement_handlers
+        for instruction in node.instructions:
+            handlers[type(instruction)](self, instruction)
+
+    def execute_if_statement(self, node: ast.IfStatement):
+        # elif branches are if statements in the else bodies
+        if self.evaluate(node.condition):
+            self.execute(node.if_body)
+        elif node.else_body is not None:
+            self.execute(node.else_body)
+
+    def execute_while_statement(self, node: ast.WhileStatement):
+        condition = node.condition
+        body = node.body
+        evaluate = self.expression_handlers[type(condition)]
+        execute = self.statement_handlers[type(body)]
+        while evaluate(self, condition):
+            execute(self, body)
+
+    def execute_output_statement(self, node: ast.OutputStatement):
+        self.output_file.write(format_value(self.evaluate(node.value)) + '\n')
+
+    def execute_assignment_statement(self, node: ast.AssignmentStatement):
+        if node.operator == Token.COLON:
+            machine = self.variable(node.left)
+            try:
+                machine.add_instructions(node.right)
+            except MachineError as ex:
+                raise ProgramError(str(ex), node.token)
+            return
+
+        value = self.evaluate(node.right)
+        if isinstance(node.right, ast.Identifier) and isinstance(value, (Tape, TuringMachine, MachinePipeline)):
+            value = value.copy()
+        left = node.left
+        if isinstance(left, ast.Identifier):
+            if node.operator != Token.ASSIGNMENT:
+                value = self.operate(assignment_operators[node.operator], left.type,
+                                     self.variable(left), value, node.token)
+            self.variables[left.name] = value
+        elif left.unary_operator == Token.HEAD:
+            # tape^ = integer
+            tape = self.variable(left.left)
+            if node.operator != Token.ASSIGNMENT:
+                value = self.operate(assignment_operators[node.operator], Type.INTEGER,
+                                     tape.head_index, value, node.token)
+            if not 0 <= value < len(tape):
+                raise ProgramError('Head index {} is out of the tape of length {}'.format(value, len(tape)),
+                                   node.token)
+            tape.head = tape.start + value
+        else:
+            # tape[integer] = symbol, the index is relative to the head
+            tape = self.variable(left.left)
+            index = tape.head_index + self.evaluate(left.right)
+            if node.operator != Token.ASSIGNMENT:
+                raise ProgramError('Unsupported operator for symbols', node.token)
+            if not 0 <= index < len(tape):
+                raise ProgramError('Tape index {} is out of the tape'.format(index - tape.head_index), left.token)
+            tape[index] = value
+
+    # expressions
+
+    def variable(self, node: ast.Identifier):
+        try:
+            return self.variables[node.name]
+        except KeyError:
+            # variables declared in branches which are not executed
+            raise ProgramError('Variable {} is not assigned'.format(node.name), node.token)
+
+    def evaluate_literal(self, node: ast.Literal):
+        if node.type == Type.TAPE:
+            return node.value.copy()
+        if node.type == Type.TURING_MACHINE:
+            machine = self.machine_literals.get(node)
+            if machine is None:
+                machine = self.machine_literals[node] = TuringMachine.from_literal(node)
+            return machine.copy()
+        return node.value
+
+    def evaluate_input(self, node: ast.InputStatement):
+        return self.read_input(node.type, node.token)
+
+    def read_input(self, type_, token: Token):
+        line = self.input_file.readline()
+        if not line:
+            raise ProgramError('Unexpected end of input', token)
+        line = line.rstrip('\r\n')
+        if type_ == Type.BOOLEAN:
+            if line not in ('true', 'false'):
+                raise ProgramError('Invalid boolean input {!r}'.format(line), token)
+            return line == 'true'
+        if type_ == Type.INTEGER:
+            try:
+                return int(line)
+            except ValueError:
+                raise ProgramError('Invalid integer input {!r}'.format(line), token)
+        if type_ == Type.SYMBOL:
+            if len(line) != 1:
+                raise ProgramError('Invalid symbol input {!r}, symbols have length 1'.format(line), token)
+            return line
+        # tapes are read in the printable form "a|b|^c"
+        if not line:
+            raise ProgramError('Invalid tape input, tapes have at least one symbol', token)
+        return Tape.parse(line)
+
+    def evaluate_expression(self, node: ast.Expression):
+        unary_operator = node.unary_operator
+        if unary_operator is not None:
+            value = self.evaluate(node.left)
+            if unary_operator == Token.NOT:
+                return not value
+            if unary_operator == Token.MINUS:
+                return -value
+            if unary_operator == Token.HEAD:
+                return value.head_index
+            # tape[]
+            return len(value)
+
+        node_operator = node.operator
+        if node_operator == Token.AND:
+            return self.evaluate(node.left) and self.evaluate(node.right)
+        if node_operator == Token.OR:
+            return self.evaluate(node.left) or self.evaluate(node.right)
+        left = self.evaluate(node.left)
+        right = self.evaluate(node.right)
+        if node_operator == Token.LEFT_SQUARE_BRACKET:
+            # tape[integer], the index is relative to the head
+            index = left.head_index + right
+            if not 0 <= index < len(left):
+                raise ProgramError('Tape index {} is out of the tape'.format(right), node.token)
+            return left[index]
+        if node_operator == Token.LEFT_BRACKET:
+            return self.call(left, right, node.token)
+        return self.operate(node_operator, node.left.type, left, right, node.token)
+
+    def operate(self, node_operator, type_, left, right, token: Token):
+        operation = binary_operations.get((node_operator, type_))
+        if operation is None:
+            raise ProgramError('Unsupported operator {} for type {}'.format(node_operator, type_), token)
+        try:
+            return operation(left, right)
+        except ZeroDivisionError:
+            raise ProgramError('Division by zero', token)
+
+    def optimized(self, machine: TuringMachine) -> TuringMachine:
+        optimized = self.optimized_machines.get(machine.signature)
+        if optimized is None:
+            optimized, report = optimize(machine)
+            self.optimization_reports.append(report)
+            if self.compile_machines:
+                optimized = CompiledMachine(optimized)
+            self.optimized_machines[machine.signature] = optimized
+        return optimized
+
+    def call(self, machine, tape: Tape, token: Token) -> Tape:
+        # machine(tape)
+        try:
+            return self.run_machine(machine, tape)
+        except MachineError as ex:
+            raise ProgramError(str(ex), token)
+
+    def run_machine(self, machine, tape: Tape) -> Tape:
+        if isinstance(machine, MachinePipeline):
+            machine = MachinePipeline([self.optimized(part) for part in machine.machines])
+        else:
+            machine = self.optimized(machine)
+        if self.profile_machines:
+            return self.profile_machine(machine, tape)
+        if self.machine_cache is not None:
+            return self.machine_cache.run(machine, tape, self.max_steps, self.max_tape_length, self.detect_loops)
+        return machine.run(tape, self.max_steps, self.max_tape_length, self.detect_loops)
+
+    def profile_machine(self, machine, tape: Tape) -> Tape:
+        # machines of pipelines are profiled separately and share the limit of steps as in MachinePipeline.run()
+        machines = machine.machines if isinstance(machine, MachinePipeline) else [machine]
+        profiles = self.machine_profiles
+        steps = 0
+        for machine in machines:
+            if isinstance(machine, CompiledMachine):
+                machine = machine.machine
+            max_steps = self.max_steps - steps if self.max_steps is not None else None
+            tape, machine_profile = profile(machine, tape, max_steps, self.max_tape_length)
+            steps += machine_profile.steps
+            if machine.signature in profiles:
+                profiles[machine.signature].add(machine_profile)
+            else:
+                profiles[machine.signature] = machine_profile
+        return tape
+
+    statement_handlers = {
+        ast.InstructionSequence: execute_instruction_sequence,
+        ast.IfStatement: execute_if_statement,
+        ast.WhileStatement: execute_while_statement,
+        ast.OutputStatement: execute_output_statement,
+        ast.AssignmentStatement: execute_assignment_statement,
+    }
+
+    expression_handlers = {
+        ast.Expression: evaluate_expression,
+        ast.Identifier: variable,
+        ast.Literal: evaluate_literal,
+        ast.InputStatement: evaluate_input,
+    }
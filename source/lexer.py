@@ -1,6 +1,8 @@
 import re
+from array import array
+from bisect import bisect_right
 
-from source.error import generate_error, init_program_text
+from source.error import Diagnostics
 
 token_specification = [
     ('COMMENT',                 r'/#(?:.|\n)*?#/|#.*$'),
@@ -80,6 +82,8 @@ class Token:
      ASSIGNMENT, LINE_CONTINUATION, NEWLINE, INDENT, BLANK, UNDEFINED_TOKEN, END_OF_FILE, DEDENT, INDENTATION_ERROR
      ) = [token[0] for token in token_specification]
 
+    __slots__ = ('type', 'value', 'line', 'column')
+
     def __init__(self, type_, value, line, column):
         self.type = type_
         self.value = value
@@ -94,42 +98,286 @@ class Token:
             self.type, repr(self.value), self.line, self.column)
 
 
+# small integer codes of token types for compact token streams
+token_types = [token[0] for token in token_specification]
+token_codes = {type_: code for code, type_ in enumerate(token_types)}
+
+
+class CompactToken:
+    """Reference to a token of TokenStream, value and position are taken from the stream on demand"""
+    __slots__ = ('stream', 'index')
+
+    def __init__(self, stream, index):
+        self.stream = stream
+        self.index = index
+
+    @property
+    def type(self):
+        return token_types[self.stream.types[self.index]]
+
+    @property
+    def value(self):
+        return self.stream.value(self.index)
+
+    @property
+    def line(self):
+        return self.stream.line(self.index)
+
+    @property
+    def column(self):
+        return self.stream.column(self.index)
+
+    def __bool__(self):
+        return self.stream.types[self.index] != token_codes[Token.END_OF_FILE]
+
+    def __str__(self):
+        return 'Token: type={}, value={}, line={}, column={}'.format(
+            self.type, repr(self.value), self.line, self.column)
+
+
+class TokenStream:
+    """Struct of arrays of tokens: type codes and start/end offsets of values in the program text.
+
+    Lines and columns are computed from offsets only when requested. Can be used instead of the lexer by the parser.
+    """
+
+    def __init__(self, program_text: str):
+        self.text = program_text
+        self.types = array('B')
+        self.starts = array('q')
+        self.ends = array('q')
+        # values which are not slices of the program text (values of dedents)
+        self.values = {}
+        self.line_starts = None
+        self.next_index = 0
+
+    def __len__(self):
+        return len(self.types)
+
+    def append(self, type_, start, end):
+        self.types.append(token_codes[type_])
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def value(self, index):
+        if index in self.values:
+            return self.values[index]
+        return self.text[self.starts[index]:self.ends[index]]
+
+    def position(self, offset):
+        # line and column of the offset in the program text
+        if self.line_starts is None:
+            self.line_starts = array('q', [0])
+            self.line_starts.extend(mo.end() for mo in re.finditer('\n', self.text))
+        line = bisect_right(self.line_starts, offset)
+        return line, offset - self.line_starts[line - 1] + 1
+
+    def line(self, index):
+        return self.position(self.starts[index])[0]
+
+    def column(self, index):
+        return self.position(self.starts[index])[1]
+
+    def token(self, index):
+        return CompactToken(self, index)
+
+    def next_token(self):
+        token = CompactToken(self, self.next_index)
+        # end of file is returned on all subsequent calls
+        if self.next_index < len(self.types) - 1:
+            self.next_index += 1
+        return token
+
+# Bulk tokenization: keywords are matched as identifiers and looked up in the dict,
+# blanks, comments and line continuations are skipped before every token inside the regex
+keyword_codes = {pattern: token_codes[type_] for type_, pattern in token_specification
+                 if type_ in (Token.TRUE, Token.FALSE, Token.AND, Token.OR, Token.NOT,
+                              Token.IF, Token.ELIF, Token.ELSE, Token.WHILE)}
+keyword_prefixes = {keyword[:2] for keyword in keyword_codes}
+bulk_token_specification = [
+    spec for spec in token_specification
+    if spec[1] not in keyword_codes and spec[0] not in (
+        Token.COMMENT, Token.LINE_CONTINUATION, Token.INDENT, Token.BLANK,
+        Token.END_OF_FILE, Token.DEDENT, Token.INDENTATION_ERROR)
+] + [(Token.END_OF_FILE, r'\Z')]
+
+
 class Lexer:
     token_specification_string = '|'.join('(?P<{}>{})'.format(*spec) for spec in token_specification)
     rg = re.compile(token_specification_string, re.MULTILINE)
     del token_specification_string
 
-    def __init__(self, program_text: str):
-        init_program_text(program_text)
+    bulk_rg = re.compile(r'(?:[ \t]+|\\\n|/#(?:.|\n)*?#/|#.*$)*(?:{})'.format(
+        '|'.join('(?P<{}>{})'.format(*spec) for spec in bulk_token_specification)), re.MULTILINE)
+    bulk_group_codes = [None] + [token_codes[spec[0]] for spec in bulk_token_specification]
+    indent_rg = re.compile(r'[ \t]*')
+
+    def __init__(self, program_text: str, start: int = 0, end: int = None, line: int = 1,
+                 diagnostics: Diagnostics = None):
+        # only text[start:end] is lexed if given, start should be the beginning of the line number line
+        self.diagnostics = diagnostics if diagnostics is not None else Diagnostics(program_text)
         self.text = program_text
-        self.token = Token(Token.END_OF_FILE, '', 0, 0)
-        self.mo = self.rg.match(self.text)
-        self.line_num = 1
-        self.line_start = 0
+        self.text_end = len(program_text) if end is None else end
+        self.init_state(start, line)
+
+    def init_state(self, start=0, line=1):
+        self.last_type = Token.END_OF_FILE
+        self.line_start = start
+        self.mo = self.match(start)
+        self.line_num = line
         self.indent_stack = []
         self.dedent_count = 0
         self.newline_was_returned = True
+        # the last scanned token
+        self.type = None
+        self.value = None
+        self.start = 0
+        self.end = 0
+        self.line = 0
+        self.column = 0
+
+    def match(self, pos):
+        return self.rg.match(self.text, pos, self.text_end)
 
     def next_token(self):
+        self.scan()
+        return Token(self.type, self.value, self.line, self.column)
+
+    def tokenize(self) -> TokenStream:
+        # bulk tokenization of the whole program text, produces the same tokens as next_token:
+        # the first pass finds all tokens with one finditer sweep skipping blanks and comments inside the regex,
+        # the second pass inserts indents and dedents at line starts and drops repeated newlines
+        text = self.text
+        end = self.text_end
+        group_codes = self.bulk_group_codes
+        identifier_code = token_codes[Token.IDENTIFIER]
+        newline_code = token_codes[Token.NEWLINE]
+        undefined_code = token_codes[Token.UNDEFINED_TOKEN]
+        end_of_file_code = token_codes[Token.END_OF_FILE]
+        types, starts, ends = array('B'), array('q'), array('q')
+        newlines = []
+        # lexer errors are reported in order of their positions after both passes
+        errors = []
+        for mo in self.bulk_rg.finditer(text, self.line_start, end):
+            group = mo.lastindex
+            code = group_codes[group]
+            start = mo.start(group)
+            if code == identifier_code:
+                word = mo.group(group)
+                if word in keyword_codes:
+                    code = keyword_codes[word]
+                elif word[:2] in keyword_prefixes:
+                    self.split_keyword_prefix(word, start, types, starts, ends)
+                    continue
+            elif code == newline_code:
+                newlines.append(len(types))
+            elif code == undefined_code:
+                errors.append((start, "Undefined token {}".format(repr(mo.group(group)))))
+                continue
+            elif code == end_of_file_code:
+                break
+            types.append(code)
+            starts.append(start)
+            ends.append(mo.end())
+
+        stream = TokenStream(text)
+        stream.diagnostics = self.diagnostics
+        indent_code = token_codes[Token.INDENT]
+        indent_stack = []
+        newline_was_returned = True
+        line_start = self.line_start
+        previous = 0
+        newlines.append(len(types))
+        for newline in newlines:
+            # indents and dedents at the line start, blank lines are skipped
+            indent_end = self.indent_rg.match(text, line_start, end).end()
+            if indent_end == line_start:
+                # any token at the beginning of the line closes all blocks
+                if not text.startswith('\n', line_start, end):
+                    while indent_stack:
+                        stream.values[len(stream)] = indent_stack.pop()
+                        stream.append(Token.DEDENT, line_start, line_start)
+            elif not text.startswith('\n', indent_end, end):
+                value = text[line_start:indent_end]
+                if not indent_stack or value != indent_stack[-1] and value.startswith(indent_stack[-1]):
+                    indent_stack.append(value)
+                    stream.types.append(indent_code)
+                    stream.starts.append(line_start)
+                    stream.ends.append(indent_end)
+                    newline_was_returned = False
+                elif value != indent_stack[-1]:
+                    if indent_stack[-1].startswith(value) and value in indent_stack:
+                        while indent_stack[-1] != value:
+                            stream.values[len(stream)] = indent_stack.pop()
+                            stream.append(Token.DEDENT, line_start, line_start)
+                    else:
+                        errors.append((line_start, 'Indentation error'))
+
+            # tokens of the line are copied as is
+            if newline > previous:
+                stream.types.extend(types[previous:newline])
+                stream.starts.extend(starts[previous:newline])
+                stream.ends.extend(ends[previous:newline])
+                newline_was_returned = False
+            if newline == len(types):
+                break
+            if not newline_was_returned:
+                stream.types.append(newline_code)
+                stream.starts.append(starts[newline])
+                stream.ends.append(ends[newline])
+                newline_was_returned = True
+            previous = newline + 1
+            line_start = ends[newline]
+        stream.append(Token.END_OF_FILE, end, end)
+
+        for start, message in sorted(errors, key=lambda error: error[0]):
+            self.diagnostics.error('Lexer', message, *stream.position(start))
+        return stream
+
+    def split_keyword_prefix(self, word, start, types, starts, ends):
+        # word starting with a keyword is split as by the token regex: keyword, then the rest of the word
+        pos = 0
+        while pos < len(word):
+            for keyword, code in keyword_codes.items():
+                if word.startswith(keyword, pos):
+                    end = pos + len(keyword)
+                    break
+            else:
+                if word[pos] in '0123456789':
+                    code = token_codes[Token.INTEGER_LITERAL]
+                    end = pos + 1
+                    while end < len(word) and word[end] in '0123456789':
+                        end += 1
+                else:
+                    code = token_codes[Token.IDENTIFIER]
+                    end = len(word)
+            types.append(code)
+            starts.append(start + pos)
+            ends.append(start + end)
+            pos = end
+
+    def scan(self):
+        # find the next returned token and store its type, value and position
         while True:
             # handle dedents on stack
             if self.dedent_count:
                 self.dedent_count -= 1
-                self.token = Token(
-                    Token.DEDENT, self.indent_stack.pop(),
-                    self.line_num, self.mo.start() - self.line_start + 1
-                )
-                return self.token
+                self.last_type = self.type = Token.DEDENT
+                self.value = self.indent_stack.pop()
+                self.start = self.end = self.mo.start()
+                self.line = self.line_num
+                self.column = self.start - self.line_start + 1
+                return self.type
 
             type_ = self.mo.lastgroup
             value = self.mo.group(type_)
 
             # handle blank after line continuation
-            if self.token.type == Token.LINE_CONTINUATION and type_ == Token.INDENT:
+            if self.last_type == Token.LINE_CONTINUATION and type_ == Token.INDENT:
                 type_ = Token.BLANK
 
             # handle new dedents
-            if self.token.type == Token.NEWLINE and type_ not in (Token.INDENT, Token.BLANK, Token.NEWLINE):
+            if self.last_type == Token.NEWLINE and type_ not in (Token.INDENT, Token.BLANK, Token.NEWLINE):
                 if self.indent_stack:
                     self.dedent_count = len(self.indent_stack)
                     continue
@@ -154,24 +402,26 @@ class Lexer:
                         else:
                             type_ = Token.INDENTATION_ERROR
 
-            self.token = Token(getattr(Token, type_), value, self.line_num, self.mo.start() - self.line_start + 1)
+            self.last_type = type_
+            self.start = self.mo.start()
+            self.end = self.mo.end()
+            line = self.line_num
+            column = self.start - self.line_start + 1
 
             if type_ in (Token.NEWLINE, Token.LINE_CONTINUATION):
-                self.line_start = self.mo.end()
+                self.line_start = self.end
                 self.line_num += 1
             if type_ == Token.COMMENT and '\n' in value:
-                self.line_start = self.mo.start() + value.rfind('\n') + 1
+                self.line_start = self.start + value.rfind('\n') + 1
                 self.line_num += value.count('\n')
 
             if type_ == Token.UNDEFINED_TOKEN:
-                generate_error(
-                    'Lexer', "Undefined token {}".format(repr(self.token.value)),
-                    self.token.line, self.token.column)
+                self.diagnostics.error('Lexer', "Undefined token {}".format(repr(value)), line, column)
 
             if type_ == Token.INDENTATION_ERROR:
-                generate_error('Lexer', 'Indentation error', self.token.line, self.token.column)
+                self.diagnostics.error('Lexer', 'Indentation error', line, column)
 
-            self.mo = self.rg.match(self.text, self.mo.end())
+            self.mo = self.match(self.end)
 
             if type_ not in (Token.BLANK, Token.COMMENT, Token.LINE_CONTINUATION,
                              Token.UNDEFINED_TOKEN, Token.INDENTATION_ERROR):
@@ -182,4 +432,73 @@ class Lexer:
                     self.newline_was_returned = True
                 else:
                     self.newline_was_returned = False
-                return self.token
+                self.type = type_
+                self.value = value
+                self.line = line
+                self.column = column
+                return type_
+
+
+class StreamingLexer(Lexer):
+    """Lexer reading the program file by chunks, only the lines being lexed are kept in memory"""
+
+    def __init__(self, program_file: str, chunk_size: int = 1 << 16, diagnostics: Diagnostics = None):
+        self.file = open(program_file, 'r')
+        self.diagnostics = diagnostics if diagnostics is not None else Diagnostics(program_file=program_file)
+        self.chunk_size = chunk_size
+        self.text = ''
+        self.eof = False
+        self.newline_pos = -1
+        self.init_state()
+
+    def close(self):
+        # the file is closed at its end, lexing stopped before it closes the file here
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def tokenize(self) -> TokenStream:
+        # the token stream keeps the whole program text, so the file is read at once,
+        # positions in the stream are counted from the beginning of the file, so no tokens should be lexed before
+        if not self.eof:
+            self.text = self.text[self.line_start:] + self.file.read()
+            self.line_start = 0
+            self.eof = True
+            self.file.close()
+        self.text_end = len(self.text)
+        return super().tokenize()
+
+    def read_chunk(self, pos):
+        # drop already lexed lines, all positions are relative to the current line start
+        shift = self.line_start
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            self.file.close()
+        self.text = self.text[shift:] + chunk
+        self.line_start = 0
+        if self.newline_pos != -1:
+            self.newline_pos -= shift
+        return pos - shift
+
+    def match(self, pos):
+        if not self.eof:
+            # tokens (except block comments) never cross the end of line,
+            # so the buffer should contain the whole line to match a token at pos
+            if self.newline_pos < pos:
+                self.newline_pos = self.text.find('\n', pos)
+                while self.newline_pos == -1 and not self.eof:
+                    search_start = len(self.text) - pos
+                    pos = self.read_chunk(pos)
+                    self.newline_pos = self.text.find('\n', pos + search_start)
+            # block comment can span any number of lines
+            if self.text.startswith('/#', pos):
+                search_start = 2
+                while self.text.find('#/', pos + search_start) == -1 and not self.eof:
+                    search_start = max(len(self.text) - pos - 1, 2)
+                    pos = self.read_chunk(pos)
+        return self.rg.match(self.text, pos)
@@ -0,0 +1,554 @@
+import hashlib
+import sys
+from array import array
+from collections import OrderedDict
+from typing import List, Tuple
+
+from source import ast
+from source.tape import Tape
+
+# shift of the instruction -> move of the head
+shifts = {'<': -1, '>': 1, '-': 0}
+shift_names = {move: shift for shift, move in shifts.items()}
+
+# escaped characters of symbols in the printable form of machines
+symbol_escapes = {'\\': '\\\\', "'": "\\'", '\n': '\\n', '\t': '\\t'}
+
+
+def symbol_literal(symbol: str) -> str:
+    return "'{}'".format(''.join(symbol_escapes.get(char, char) for char in symbol))
+
+
+class MachineError(Exception):
+    pass
+
+
+class StepLimitError(MachineError):
+    pass
+
+
+class TapeLimitError(MachineError):
+    pass
+
+
+class InfiniteLoopError(MachineError):
+    pass
+
+
+class DenseMachine:
+    """Machine with states and symbols interned into integers.
+
+    Instructions are kept in flat arrays indexed by state * width + symbol, where the width is the number
+    of symbols plus one: the last code is shared by all symbols of the tape unknown to the machine.
+    Next states are stored as offsets of their rows (state * width) or -1 when there is no instruction
+    and the machine halts.
+
+    Sweeps are instructions keeping the state and the symbol and moving the head: the machine repeats them
+    until the head reaches a symbol the state does not sweep over in the same direction, so they are run
+    as one macro-step searching the cells for the nearest other symbol. In sweep_rows they are marked
+    by -2 - index of the sweep.
+    """
+
+    def __init__(self, machine: 'TuringMachine'):
+        self.states = [machine.initial_state]
+        self.state_codes = {machine.initial_state: 0}
+        self.symbols = [machine.blank_symbol]
+        self.symbol_codes = {machine.blank_symbol: 0}
+        for (state, symbol), (next_state, write_symbol, move) in machine.transitions.items():
+            self.state_code(state)
+            self.state_code(next_state)
+            self.symbol_code(symbol)
+            self.symbol_code(write_symbol)
+        self.initial_state = 0
+        self.blank_symbol = 0
+        self.unknown_symbol = len(self.symbols)
+        self.width = len(self.symbols) + 1
+
+        size = len(self.states) * self.width
+        self.next_rows = array('i', [-1]) * size
+        self.write_symbols = array('i', [0]) * size
+        self.moves = array('i', [0]) * size
+        for (state, symbol), (next_state, write_symbol, move) in machine.transitions.items():
+            index = self.state_codes[state] * self.width + self.symbol_codes[symbol]
+            self.next_rows[index] = self.state_codes[next_state] * self.width
+            self.write_symbols[index] = self.symbol_codes[write_symbol]
+            self.moves[index] = move
+
+        # (row of the state, move) -> codes of symbols swept over
+        swept_symbols = {}
+        for (state, symbol), (next_state, write_symbol, move) in machine.transitions.items():
+            if state == next_state and symbol == write_symbol and move != 0:
+                row = self.state_codes[state] * self.width
+                swept_symbols.setdefault((row, move), set()).add(self.symbol_codes[symbol])
+        self.sweeps = []
+        self.sweep_rows = array('i', self.next_rows)
+        # macro-steps search bytearrays, so there are no sweeps for cells of wider codes
+        if self.width <= 256:
+            for (row, move), codes in swept_symbols.items():
+                stop_codes = bytes(code for code in range(self.width) if code not in codes)
+                for code in codes:
+                    self.sweep_rows[row + code] = -2 - len(self.sweeps)
+                self.sweeps.append((row, move, stop_codes, self.blank_symbol in codes))
+
+    def state_code(self, state):
+        if state not in self.state_codes:
+            self.state_codes[state] = len(self.states)
+            self.states.append(state)
+        return self.state_codes[state]
+
+    def symbol_code(self, symbol):
+        if symbol not in self.symbol_codes:
+            self.symbol_codes[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return self.symbol_codes[symbol]
+
+    def encode(self, tape: Tape):
+        # codes of the tape translated to codes of the machine, empty tape is one blank cell
+        machine_codes = [self.symbol_codes.get(symbol, self.unknown_symbol) for symbol in tape.alphabet]
+        codes = tape.cells[tape.start:tape.end]
+        if self.width <= 256 and isinstance(codes, bytearray):
+            cells = codes.translate(bytes(machine_codes).ljust(256, b'\0'))
+        elif self.width <= 256:
+            cells = bytearray(machine_codes[code] for code in codes)
+        else:
+            cells = array('i', [machine_codes[code] for code in codes])
+        if not cells:
+            cells.append(self.blank_symbol)
+        return cells
+
+    def decode(self, cells, head: int, origin: int, tape: Tape) -> Tape:
+        # origin is the index of the first cell of the given tape in cells
+        alphabet = list(self.symbols)
+        unknown_symbol = self.unknown_symbol
+        # the machine halts on unknown symbols, so they are never overwritten and are taken from the given tape
+        if unknown_symbol in cells:
+            positions = [idx for idx, code in enumerate(cells) if code == unknown_symbol]
+            unknown_codes = {}
+            for idx in positions:
+                symbol = tape[idx - origin]
+                if symbol not in unknown_codes:
+                    unknown_codes[symbol] = len(alphabet)
+                    alphabet.append(symbol)
+            if len(alphabet) > 256 and isinstance(cells, bytearray):
+                cells = array('i', list(cells))
+            for idx in positions:
+                cells[idx] = unknown_codes[tape[idx - origin]]
+        return Tape.from_codes(alphabet, cells, head)
+
+    def run(self, head: int, cells: array, max_steps: int = None, max_tape_length: int = None,
+            detect_loops: bool = False):
+        """Run the machine on the codes of symbols in the bytearray or the array.
+
+        Returns the head index, the visited part of cells, the index of the first given cell in it
+        and the number of steps. Raises StepLimitError after max_steps steps and TapeLimitError when
+        the visited part of cells grows longer than max_tape_length.
+
+        Loops are detected as in Brent's algorithm: the configuration is saved at steps 1, 2, 4, 8...
+        and every following configuration is compared with the saved one, so a loop is found before
+        twice the number of steps to enter it plus its length. Only exact loops are found, machines
+        moving away over blank symbols forever reach the limits.
+        """
+        sweep_rows = self.sweep_rows
+        sweeps = self.sweeps
+        write_symbols = self.write_symbols
+        moves = self.moves
+        # blank symbol in the container of the cells
+        blank = cells[:1]
+        blank[0] = self.blank_symbol
+        # bounds of the visited part of the cells
+        low = 0
+        high = len(cells) - 1
+        extended = 0
+        # steps are counted by the loop over iterations, a macro-step is one iteration and the rest of its steps
+        # are skipped steps, so there is no counter to update on every step
+        iterations = 0
+        skipped = 0
+        # the limits and the loop detection are handled when the steps reach the checkpoint, at least
+        # every chunk steps to keep the numbers of iterations small and fast to compare
+        chunk = 1 << 29
+        step_limit = max_steps + 1 if max_steps is not None else sys.maxsize
+        tape_limit = max_tape_length if max_tape_length is not None else sys.maxsize
+        next_save = 1 if detect_loops else sys.maxsize
+        checkpoint = min(step_limit, next_save, chunk)
+        # saved configuration: row of the state, head, first visited cell relative to the given cells and visited cells
+        saved_row = None
+        saved_head = saved_low = saved_steps = 0
+        saved_cells = None
+        row = self.initial_state * self.width
+        while True:
+            for iterations in range(iterations + 1, checkpoint - skipped + 1):
+                # the head is moved by the previous iteration
+                if head < low:
+                    # the tape grows to the left by blocks, so moves out of it cost amortized O(1)
+                    if head < 0:
+                        extension = len(cells)
+                        cells[:0] = blank * extension
+                        head += extension
+                        high += extension
+                        extended += extension
+                    low = head
+                    if high - low >= tape_limit:
+                        raise TapeLimitError('Machine exceeds the tape length limit {} in state {}'.format(
+                            max_tape_length, self.states[row // self.width]))
+                elif head > high:
+                    if head == len(cells):
+                        cells.append(self.blank_symbol)
+                    high = head
+                    if high - low >= tape_limit:
+                        raise TapeLimitError('Machine exceeds the tape length limit {} in state {}'.format(
+                            max_tape_length, self.states[row // self.width]))
+                index = row + cells[head]
+                row = sweep_rows[index]
+                if row < 0:
+                    if row == -1:
+                        iterations -= 1
+                        break
+                    # macro-step: the head goes to the nearest cell with a symbol which is not swept over,
+                    # cells out of the tape are blank
+                    row, move, stop_codes, over_blanks = sweeps[-2 - row]
+                    if move > 0:
+                        target = len(cells)
+                        for code in stop_codes:
+                            position = cells.find(code, head + 1, target)
+                            if position != -1:
+                                target = position
+                        if over_blanks and target == len(cells):
+                            raise MachineError('Machine moves right over blank symbols endlessly')
+                    else:
+                        target = -1
+                        for code in stop_codes:
+                            position = cells.rfind(code, target + 1, head)
+                            if position != -1:
+                                target = position
+                        if over_blanks and target == -1:
+                            raise MachineError('Machine moves left over blank symbols endlessly')
+                    skipped += abs(target - head) - 1
+                    head = target
+                    if iterations + skipped >= step_limit:
+                        raise StepLimitError('Machine exceeds the step limit {} in state {}'.format(
+                            max_steps, self.states[row // self.width]))
+                    # the iterations left before the checkpoint are too many after the skipped steps
+                    if max_steps is not None:
+                        break
+                else:
+                    cells[head] = write_symbols[index]
+                    head += moves[index]
+            if row == -1:
+                break
+            steps = iterations + skipped
+            if steps >= step_limit:
+                raise StepLimitError('Machine exceeds the step limit {} in state {}'.format(
+                    max_steps, self.states[row // self.width]))
+            # the configuration is compared with the saved one on every step
+            if (row == saved_row and head - extended == saved_head and low - extended == saved_low
+                    and cells[low:high + 1] == saved_cells):
+                raise InfiniteLoopError('Machine loops: state {} repeats the configuration of step {} after {} steps'
+                                        .format(self.states[row // self.width], saved_steps, steps - saved_steps))
+            if steps >= next_save:
+                saved_row = row
+                saved_head = head - extended
+                saved_low = low - extended
+                saved_cells = cells[low:high + 1]
+                saved_steps = steps
+                next_save = steps * 2
+            checkpoint = min(step_limit, steps + 1 if detect_loops else steps + chunk)
+        steps = iterations + skipped
+        return head - low, cells[low:high + 1], extended - low, steps
+
+
+class TuringMachine:
+    """Turing machine lowered from the literal of the analyzed ast.
+
+    Instructions are kept in the dict (state, symbol) -> (next state, symbol to write, move of the head)
+    and lowered to the dense machine on the first run. The machine halts when there is no instruction
+    for the state and the symbol.
+    """
+
+    def __init__(self, initial_state: str, blank_symbol: str):
+        self.initial_state = initial_state
+        self.blank_symbol = blank_symbol
+        self.transitions = {}
+        # (state, symbol) -> (line, column) of the instruction in the program
+        self.positions = {}
+        # number of steps of the last run
+        self.steps = 0
+        self._dense = None
+        self._fingerprint = None
+        self._signature = None
+
+    @property
+    def dense(self) -> DenseMachine:
+        if self._dense is None:
+            self._dense = DenseMachine(self)
+        return self._dense
+
+    @property
+    def fingerprint(self) -> bytes:
+        """Hash of the instructions reachable from the initial state and the blank symbol.
+
+        Machines differing only by names of states or by unreachable instructions have the same fingerprint.
+        """
+        if self._fingerprint is None:
+            states, table = self.canonical_table()
+            self._fingerprint = hashlib.sha256(repr((self.blank_symbol, table)).encode()).digest()
+        return self._fingerprint
+
+    @property
+    def signature(self) -> bytes:
+        """Hash of all instructions with the names of states and the positions, the initial state and the blank symbol.
+
+        Unlike the fingerprint it tells apart machines which print or report differently.
+        """
+        if self._signature is None:
+            instructions = (self.initial_state, self.blank_symbol, list(self.transitions.items()),
+                            list(self.positions.items()))
+            self._signature = hashlib.sha256(repr(instructions).encode()).digest()
+        return self._signature
+
+    def canonical_table(self):
+        """States in the order they are reached and the reachable instructions with the states numbered in this order.
+
+        States are renumbered in the order they are reached (symbols of each state in sorted order), instructions
+        are tuples (number of the state, symbol, number of the next state, symbol to write, move).
+        """
+        symbols_of_states = {}
+        for state, symbol in self.transitions:
+            symbols_of_states.setdefault(state, []).append(symbol)
+        numbers = {self.initial_state: 0}
+        queue = [self.initial_state]
+        table = []
+        for state in queue:
+            for symbol in sorted(symbols_of_states.get(state, ())):
+                next_state, write_symbol, move = self.transitions[state, symbol]
+                if next_state not in numbers:
+                    numbers[next_state] = len(numbers)
+                    queue.append(next_state)
+                table.append((numbers[state], symbol, numbers[next_state], write_symbol, move))
+        return queue, table
+
+    @classmethod
+    def from_literal(cls, literal: ast.Literal):
+        machine = cls(literal.initial_state.name, literal.blank_symbol.value)
+        if literal.value is not None:
+            machine.add_instructions(literal.value)
+        return machine
+
+    def add_instruction(self, state: str, symbol: str, next_state: str, write_symbol: str, shift: str,
+                        position: Tuple[int, int] = None):
+        if shift not in shifts:
+            raise MachineError('Unknown shift {}'.format(shift))
+        # later instructions replace earlier ones for the same state and symbol
+        self.transitions[state, symbol] = (next_state, write_symbol, shifts[shift])
+        if position is not None:
+            self.positions[state, symbol] = position
+        else:
+            self.positions.pop((state, symbol), None)
+        self._dense = None
+        self._fingerprint = None
+        self._signature = None
+
+    def __str__(self):
+        # printable form is the literal of the machine
+        instructions = ['{} {} = {} {} {}'.format(state, symbol_literal(symbol), next_state,
+                                                  symbol_literal(write_symbol), shift_names[move])
+                        for (state, symbol), (next_state, write_symbol, move) in self.transitions.items()]
+        if not instructions:
+            return '{{{} {}}}'.format(self.initial_state, symbol_literal(self.blank_symbol))
+        return '{{{} {}: {}}}'.format(self.initial_state, symbol_literal(self.blank_symbol), '; '.join(instructions))
+
+    def copy(self) -> 'TuringMachine':
+        machine = TuringMachine(self.initial_state, self.blank_symbol)
+        machine.transitions = dict(self.transitions)
+        machine.positions = dict(self.positions)
+        machine._fingerprint = self._fingerprint
+        machine._signature = self._signature
+        return machine
+
+    def __add__(self, other):
+        if not isinstance(other, (TuringMachine, MachinePipeline)):
+            return NotImplemented
+        return compose(self, other)
+
+    def add_instructions(self, sequence: ast.TuringMachineInstructionSequence):
+        # instructions of the literal or of the statement "machine:"
+        for instruction in sequence.instructions:
+            token = instruction.left_state.token
+            self.add_instruction(instruction.left_state.name, instruction.left_symbol.value,
+                                 instruction.right_state.name, instruction.right_symbol.value, instruction.shift,
+                                 (token.line, token.column))
+
+    def run(self, tape: Tape, max_steps: int = None, max_tape_length: int = None, detect_loops: bool = False) -> Tape:
+        """Run the machine on the tape and return the new tape, the given tape is not changed.
+
+        The tape is extended by blank symbols where the head goes out of it. Runs longer than max_steps,
+        tapes longer than max_tape_length and detected loops raise subclasses of MachineError.
+        """
+        dense = self.dense
+        cells = dense.encode(tape)
+        head, cells, origin, self.steps = dense.run(min(max(tape.head_index, 0), len(cells) - 1), cells,
+                                                    max_steps, max_tape_length, detect_loops)
+        return dense.decode(cells, head, origin, tape)
+
+
+# (signature of the first machine, signature of the second one) -> fused machine
+fused_machines = OrderedDict()
+max_fused_machines = 256
+
+
+def fuse(first: TuringMachine, second: TuringMachine) -> TuringMachine:
+    """Machine running the first machine and then the second one on its result in one run.
+
+    The machines should have the same blank symbol. States of the first machine get the suffix ".1" and states
+    of the second one get ".2", identifiers have no dots, so the names never clash. Where the first machine halts,
+    the fused machine makes the step of the initial state of the second one, so it makes the same steps
+    as the two runs. Fused machines are cached by the signatures of the pair, as they keep the names of states
+    and the positions of instructions of the pair.
+    """
+    key = (first.signature, second.signature)
+    fused = fused_machines.get(key)
+    if fused is not None:
+        fused_machines.move_to_end(key)
+        return fused.copy()
+
+    fused = TuringMachine(first.initial_state + '.1', first.blank_symbol)
+    for (state, symbol), (next_state, write_symbol, move) in first.transitions.items():
+        fused.transitions[state + '.1', symbol] = (next_state + '.1', write_symbol, move)
+    for (state, symbol), (next_state, write_symbol, move) in second.transitions.items():
+        fused.transitions[state + '.2', symbol] = (next_state + '.2', write_symbol, move)
+    for (state, symbol), position in first.positions.items():
+        fused.positions[state + '.1', symbol] = position
+    for (state, symbol), position in second.positions.items():
+        fused.positions[state + '.2', symbol] = position
+    # halting configurations of the first machine continue as the initial state of the second one
+    initial_transitions = [(symbol, transition) for (state, symbol), transition in second.transitions.items()
+                           if state == second.initial_state]
+    # states in the order of the instructions, so the printable form of the fused machine does not change
+    states = dict.fromkeys([first.initial_state])
+    states.update(dict.fromkeys(next_state for next_state, write_symbol, move in first.transitions.values()))
+    for state in states:
+        for symbol, (next_state, write_symbol, move) in initial_transitions:
+            if (state, symbol) not in first.transitions:
+                fused.transitions[state + '.1', symbol] = (next_state + '.2', write_symbol, move)
+                if (second.initial_state, symbol) in second.positions:
+                    fused.positions[state + '.1', symbol] = second.positions[second.initial_state, symbol]
+
+    fused_machines[key] = fused
+    if len(fused_machines) > max_fused_machines:
+        fused_machines.popitem(last=False)
+    return fused.copy()
+
+
+class MachinePipeline:
+    """Machines run one after another on the results of the previous ones.
+
+    Machines with different blank symbols extend tapes differently and cannot be fused into one machine,
+    so they are composed into pipelines.
+    """
+
+    def __init__(self, machines: List[TuringMachine]):
+        self.machines = machines
+        # number of steps of all machines in the last run
+        self.steps = 0
+
+    def __str__(self):
+        return ' + '.join(str(machine) for machine in self.machines)
+
+    @property
+    def fingerprint(self) -> bytes:
+        return hashlib.sha256(b''.join(machine.fingerprint for machine in self.machines)).digest()
+
+    def copy(self) -> 'MachinePipeline':
+        return MachinePipeline([machine.copy() for machine in self.machines])
+
+    def __add__(self, other):
+        if not isinstance(other, (TuringMachine, MachinePipeline)):
+            return NotImplemented
+        return compose(self, other)
+
+    def add_instruction(self, state: str, symbol: str, next_state: str, write_symbol: str, shift: str,
+                        position: Tuple[int, int] = None):
+        raise MachineError('Instructions cannot be added to a composition of machines with different blank symbols')
+
+    def add_instructions(self, sequence: ast.TuringMachineInstructionSequence):
+        raise MachineError('Instructions cannot be added to a composition of machines with different blank symbols')
+
+    def run(self, tape: Tape, max_steps: int = None, max_tape_length: int = None, detect_loops: bool = False) -> Tape:
+        # the limit of steps is shared by the machines
+        self.steps = 0
+        for machine in self.machines:
+            tape = machine.run(tape, max_steps - self.steps if max_steps is not None else None, max_tape_length,
+                               detect_loops)
+            self.steps += machine.steps
+        return tape
+
+
+def compose(first, second):
+    # machine + machine in the program, adjacent machines with the same blank symbol are fused,
+    # the others are copied, so changes of the operands do not change the result
+    machines = [machine.copy() for machine in (first.machines if isinstance(first, MachinePipeline) else [first])]
+    for machine in (second.machines if isinstance(second, MachinePipeline) else [second]):
+        if machines[-1].blank_symbol == machine.blank_symbol:
+            machines[-1] = fuse(machines[-1], machine)
+        else:
+            machines.append(machine.copy())
+    if len(machines) == 1:
+        return machines[0]
+    return MachinePipeline(machines)
+
+
+class MachineCache:
+    """Results of machine runs keyed by the fingerprint of the machine, the tape and the head.
+
+    At most max_size results are kept, the least recently used one is dropped first. Tapes longer than
+    max_tape_size are run without the cache, hashing them costs more than running machines on them usually.
+    Failed runs are not cached.
+    """
+
+    def __init__(self, max_size: int = 1024, max_tape_size: int = 4096):
+        self.max_size = max_size
+        self.max_tape_size = max_tape_size
+        # key -> (result tape, number of steps)
+        self.results = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # runs of tapes longer than max_tape_size
+        self.bypasses = 0
+
+    def __str__(self):
+        return 'machine cache: {} hits, {} misses, {} bypasses, {} results'.format(
+            self.hits, self.misses, self.bypasses, len(self.results))
+
+    @staticmethod
+    def key(machine: TuringMachine, tape: Tape):
+        cells = tape.cells[tape.start:tape.end]
+        return machine.fingerprint, tuple(tape.alphabet), bytes(cells), tape.head_index
+
+    def run(self, machine: TuringMachine, tape: Tape, max_steps: int = None, max_tape_length: int = None,
+            detect_loops: bool = False) -> Tape:
+        # the same as machine.run(), cached results are copied since tapes can be changed
+        if len(tape) > self.max_tape_size:
+            self.bypasses += 1
+            return machine.run(tape, max_steps, max_tape_length, detect_loops)
+        key = self.key(machine, tape)
+        cached = self.results.get(key)
+        if cached is not None:
+            result, steps = cached
+            # results over the limits are run again to raise the errors
+            if ((max_steps is None or steps <= max_steps)
+                    and (max_tape_length is None or len(result) <= max_tape_length)):
+                self.results.move_to_end(key)
+                self.hits += 1
+                machine.steps = steps
+                return result.copy()
+        self.misses += 1
+        result = machine.run(tape, max_steps, max_tape_length, detect_loops)
+        self.results[key] = (result.copy(), machine.steps)
+        self.results.move_to_end(key)
+        if len(self.results) > self.max_size:
+            self.results.popitem(last=False)
+        return result
+
+    def clear(self):
+        self.results.clear()
+        self.hits = self.misses = self.bypasses = 0
+
@@ -0,0 +1,257 @@
+import sys
+from collections import OrderedDict
+
+from source.machine import DenseMachine, MachineError, StepLimitError, TapeLimitError, TuringMachine
+from source.tape import Tape
+
+
+def sweep_right(cells, head: int, stop_codes: bytes) -> int:
+    # index of the nearest cell right of the head with a stop code or the length of cells
+    target = len(cells)
+    for code in stop_codes:
+        position = cells.find(code, head + 1, target)
+        if position != -1:
+            target = position
+    return target
+
+
+def sweep_left(cells, head: int, stop_codes: bytes) -> int:
+    # index of the nearest cell left of the head with a stop code or -1
+    target = -1
+    for code in stop_codes:
+        position = cells.rfind(code, target + 1, head)
+        if position != -1:
+            target = position
+    return target
+
+
+# steps of other states inlined after a step of the state of the block, limited by the branches of all blocks
+max_inlined = 3
+max_branches = 4096
+
+
+class SourceWriter:
+    def __init__(self):
+        self.lines = []
+
+    def line(self, depth: int, text: str):
+        self.lines.append('    ' * depth + text)
+
+    def source(self) -> str:
+        return '\n'.join(self.lines) + '\n'
+
+
+def write_bounds(writer: SourceWriter, depth: int, move: int, next_state: int):
+    # the same extension of the cells and the same limit as in DenseMachine.run()
+    if move < 0:
+        writer.line(depth, 'if head < low:')
+        writer.line(depth + 1, 'if head < 0:')
+        writer.line(depth + 2, 'extension = len(cells)')
+        writer.line(depth + 2, 'cells[:0] = blank * extension')
+        writer.line(depth + 2, 'head += extension')
+        writer.line(depth + 2, 'high += extension')
+        writer.line(depth + 2, 'extended += extension')
+        writer.line(depth + 1, 'low = head')
+    else:
+        writer.line(depth, 'if head > high:')
+        writer.line(depth + 1, 'if head == len(cells):')
+        writer.line(depth + 2, 'cells.append(0)')
+        writer.line(depth + 1, 'high = head')
+    writer.line(depth + 1, 'if high - low >= tape_limit:')
+    writer.line(depth + 2, 'raise TapeLimitError(tape_limit_message.format(max_tape_length, states[{}]))'.format(
+        next_state))
+
+
+def branches_of(dense: DenseMachine, state: int):
+    # (codes of symbols, index of the sweep or None, index of the instruction or None) of the instructions of the state
+    row = state * dense.width
+    branches = []
+    sweep_codes = {}
+    for code in range(dense.width):
+        sweep = dense.sweep_rows[row + code]
+        if sweep <= -2:
+            sweep_codes.setdefault(-2 - sweep, []).append(code)
+        elif sweep != -1:
+            branches.append(([code], None, row + code))
+    for sweep, codes in sweep_codes.items():
+        branches.append((codes, sweep, None))
+    return branches
+
+
+def write_steps(writer: SourceWriter, depth: int, dense: DenseMachine, state: int, block_state: int, inlined: int):
+    """Branches of the instructions of the state in the loop of the block of block_state.
+
+    Instructions going to the state of the block continue its loop, instructions going to other states
+    are followed by the branches of the next state up to inlined times, then they set the next state
+    and leave the block. The state halts on the symbols without instructions.
+    """
+    writer.line(depth, 'symbol = cells[head]')
+    for number, (codes, sweep, index) in enumerate(branches_of(dense, state)):
+        writer.line(depth, '{} {}:'.format('if' if number == 0 else 'elif',
+                                           ' or '.join('symbol == {}'.format(code) for code in codes)))
+        if sweep is not None:
+            # macro-step as in DenseMachine.run()
+            sweep_row, move, stop_codes, over_blanks = dense.sweeps[sweep]
+            if move > 0:
+                writer.line(depth + 1, 'target = sweep_right(cells, head, {!r})'.format(stop_codes))
+                if over_blanks:
+                    writer.line(depth + 1, 'if target == len(cells):')
+                    writer.line(depth + 2, "raise MachineError('Machine moves right over blank symbols endlessly')")
+                writer.line(depth + 1, 'steps += target - head')
+            else:
+                writer.line(depth + 1, 'target = sweep_left(cells, head, {!r})'.format(stop_codes))
+                if over_blanks:
+                    writer.line(depth + 1, 'if target == -1:')
+                    writer.line(depth + 2, "raise MachineError('Machine moves left over blank symbols endlessly')")
+                writer.line(depth + 1, 'steps += head - target')
+            writer.line(depth + 1, 'if 0 <= step_limit < steps:')
+            writer.line(depth + 2, 'raise StepLimitError(step_limit_message.format(max_steps, states[{}]))'.format(
+                state))
+            writer.line(depth + 1, 'head = target')
+            write_bounds(writer, depth + 1, move, state)
+            next_state = state
+        else:
+            next_state = dense.next_rows[index] // dense.width
+            move = dense.moves[index]
+            writer.line(depth + 1, 'if steps == step_limit:')
+            writer.line(depth + 2, 'raise StepLimitError(step_limit_message.format(max_steps, states[{}]))'.format(
+                next_state))
+            writer.line(depth + 1, 'steps += 1')
+            if dense.write_symbols[index] != codes[0]:
+                writer.line(depth + 1, 'cells[head] = {}'.format(dense.write_symbols[index]))
+            if move:
+                writer.line(depth + 1, 'head += {}'.format(move))
+                write_bounds(writer, depth + 1, move, next_state)
+        if next_state == block_state:
+            writer.line(depth + 1, 'continue')
+        elif inlined > 0:
+            write_steps(writer, depth + 1, dense, next_state, block_state, inlined - 1)
+        else:
+            writer.line(depth + 1, 'state = {}'.format(next_state))
+            writer.line(depth + 1, 'break')
+    writer.line(depth, 'return head - low, cells[low:high + 1], extended - low, steps')
+
+
+def write_dispatch(writer: SourceWriter, depth: int, dense: DenseMachine, first: int, last: int, inlined: int):
+    # binary search of the block of the state among the states first..last
+    if first == last:
+        writer.line(depth, 'while True:')
+        write_steps(writer, depth + 1, dense, first, first, inlined)
+        return
+    middle = (first + last + 1) // 2
+    writer.line(depth, 'if state < {}:'.format(middle))
+    write_dispatch(writer, depth + 1, dense, first, middle - 1, inlined)
+    writer.line(depth, 'else:')
+    write_dispatch(writer, depth + 1, dense, middle, last, inlined)
+
+
+def generate_source(dense: DenseMachine, inlined: int = None) -> str:
+    """Python source of the function running the dense machine as DenseMachine.run() without loop detection.
+
+    Every state is a block with a branch per symbol, in which the symbol to write, the move of the head
+    and the next state are constants. Blocks are found by a binary search of the state, instructions keeping
+    the state do not leave the block and the branches of the next states are inlined into the block
+    while their number is small.
+    """
+    writer = SourceWriter()
+    writer.line(0, 'def run(head, cells, max_steps, max_tape_length, states):')
+    writer.line(1, 'step_limit = max_steps if max_steps is not None else -1')
+    writer.line(1, 'tape_limit = max_tape_length if max_tape_length is not None else maxsize')
+    writer.line(1, 'blank = cells[:1]')
+    writer.line(1, 'blank[0] = 0')
+    writer.line(1, 'low = 0')
+    writer.line(1, 'high = len(cells) - 1')
+    writer.line(1, 'extended = 0')
+    writer.line(1, 'steps = 0')
+    writer.line(1, 'state = 0')
+    if inlined is None:
+        # the branches of a block grow as the number of branches of a state to the power of inlined + 1
+        branches = max(1, max(len(branches_of(dense, state)) for state in range(len(dense.states))))
+        inlined = 0
+        while inlined < max_inlined and len(dense.states) * branches ** (inlined + 2) <= max_branches:
+            inlined += 1
+    writer.line(1, 'while True:')
+    write_dispatch(writer, 2, dense, 0, len(dense.states) - 1, inlined)
+    return writer.source()
+
+
+class CompiledCode:
+    # function generated for the canonical form of machines with the same fingerprint
+    def __init__(self, machine: TuringMachine):
+        states, table = machine.canonical_table()
+        canonical = TuringMachine('0', machine.blank_symbol)
+        for state, symbol, next_state, write_symbol, move in table:
+            canonical.transitions[str(state), symbol] = (str(next_state), write_symbol, move)
+        self.dense = canonical.dense
+        self.source = generate_source(self.dense)
+        namespace = {
+            'maxsize': sys.maxsize,
+            'sweep_left': sweep_left,
+            'sweep_right': sweep_right,
+            'MachineError': MachineError,
+            'StepLimitError': StepLimitError,
+            'TapeLimitError': TapeLimitError,
+            'step_limit_message': 'Machine exceeds the step limit {} in state {}',
+            'tape_limit_message': 'Machine exceeds the tape length limit {} in state {}',
+        }
+        exec(compile(self.source, '<machine {}>'.format(machine.fingerprint.hex()[:16]), 'exec'), namespace)
+        self.run = namespace['run']
+
+
+# fingerprint of the machine -> compiled code
+compiled_codes = OrderedDict()
+max_compiled_codes = 256
+
+
+def compiled_code(machine: TuringMachine) -> CompiledCode:
+    code = compiled_codes.get(machine.fingerprint)
+    if code is None:
+        code = compiled_codes[machine.fingerprint] = CompiledCode(machine)
+        if len(compiled_codes) > max_compiled_codes:
+            compiled_codes.popitem(last=False)
+    else:
+        compiled_codes.move_to_end(machine.fingerprint)
+    return code
+
+
+class CompiledMachine:
+    """Turing machine run by the Python code generated for it instead of the loop over the dense table.
+
+    Used in place of the machine where it runs for many steps, the code is generated and compiled once
+    for all machines with the same fingerprint. Runs with loop detection are run by the machine.
+    """
+
+    def __init__(self, machine: TuringMachine):
+        self.machine = machine
+        self.code = compiled_code(machine)
+        # names of the states of the machine in the order of the states of the code for the errors
+        states, table = machine.canonical_table()
+        self.states = [states[int(state)] for state in self.code.dense.states]
+        # number of steps of the last run
+        self.steps = 0
+
+    def __str__(self):
+        return str(self.machine)
+
+    @property
+    def fingerprint(self) -> bytes:
+        return self.machine.fingerprint
+
+    @property
+    def blank_symbol(self) -> str:
+        return self.machine.blank_symbol
+
+    def copy(self) -> 'CompiledMachine':
+        return CompiledMachine(self.machine.copy())
+
+    def run(self, tape: Tape, max_steps: int = None, max_tape_length: int = None, detect_loops: bool = False) -> Tape:
+        # the same as TuringMachine.run()
+        if detect_loops:
+            result = self.machine.run(tape, max_steps, max_tape_length, detect_loops)
+            self.steps = self.machine.steps
+            return result
+        dense = self.code.dense
+        cells = dense.encode(tape)
+        head, cells, origin, self.steps = self.code.run(min(max(tape.head_index, 0), len(cells) - 1), cells,
+                                                        max_steps, max_tape_length, self.states)
+        return dense.decode(cells, head, origin, tape)
@@ -1,23 +1,157 @@
+import argparse
+import json
 import sys
 
-from source.semantic_analyzer import SemanticAnalyzer
+from source.bytecode import CodeGenerator, CodeObject, VirtualMachine
+from source.cache import CompilationCache, default_cache_directory
+from source.compilation import compile_batch, compile_file, expand_patterns
+from source.closure_compiler import ClosureCompiler
+from source.error import Diagnostics
+from source.folding import fold
+from source.interpreter import Interpreter
+from source.machine import MachineCache
+
+# name of the backend -> class running the analyzed programs
+backends = {
+    'bytecode': VirtualMachine,
+    'closures': ClosureCompiler,
+    'interpreter': Interpreter,
+}
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Translator of the Turing machine language')
+    parser.add_argument('program_files', nargs='*',
+                        help='program file to compile, several files or glob patterns compile all of them in parallel')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='number of worker processes for several files (default: number of cores)')
+    parser.add_argument('--no-cache', action='store_true', help='compile without the compilation cache')
+    parser.add_argument('--clear-cache', action='store_true', help='remove all entries of the compilation cache')
+    parser.add_argument('--cache-dir', default=default_cache_directory, help='directory of the compilation cache')
+    parser.add_argument('-c', '--compile-only', action='store_true', help='compile the program without running it')
+    parser.add_argument('--max-steps', type=int, default=None, help='limit of steps of every machine run')
+    parser.add_argument('--max-tape-length', type=int, default=None, help='limit of tape length of every machine run')
+    parser.add_argument('--detect-loops', action='store_true', help='stop machines repeating their configuration')
+    parser.add_argument('--machine-cache', type=int, default=1024, metavar='SIZE',
+                        help='number of results of machine runs kept to be reused (default: 1024)')
+    parser.add_argument('--no-machine-cache', action='store_true', help='run machines without the cache of results')
+    parser.add_argument('--machine-cache-stats', action='store_true',
+                        help='print the counts of hits and misses of the cache of results')
+    parser.add_argument('--machine-report', action='store_true',
+                        help='print how much the optimizer shrank the tables of the machines run by the program')
+    parser.add_argument('--profile', action='store_true',
+                        help='count the hits of the instructions of the machines and print the reports of the profiles '
+                             'to the standard error, machines are run without the cache and the loop detection')
+    parser.add_argument('--profile-json', action='store_true', help='print the profiles of --profile as JSON')
+    parser.add_argument('--compile-machines', action='store_true',
+                        help='run machines by the Python code generated for their states')
+    parser.add_argument('--backend', choices=sorted(backends), default='closures',
+                        help='backend running the program: closures compiled from the ast, register code run by '
+                             'the virtual machine or the tree-walking interpreter (default: closures)')
+    parser.add_argument('--no-fold', action='store_true',
+                        help='run the program without folding constant expressions and removing dead branches')
+    parser.add_argument('--fold-report', action='store_true', help='print the counts of folded and removed nodes')
+    parser.add_argument('--emit-bytecode', metavar='CODE_FILE',
+                        help='write the register code of the program to the file, '
+                             'files with the suffix {} are run without compiling'.format(CodeObject.suffix))
+    return parser.parse_args()
 
 
 def main():
-    try:
-        program_file = sys.argv[1]
-    except IndexError:
+    args = parse_arguments()
+    cache = CompilationCache(args.cache_dir)
+    if args.clear_cache:
+        cache.clear()
+        if not args.program_files:
+            return
+    if args.no_cache:
+        cache = None
+
+    if not args.program_files:
         print('Need to specify file program name to compile')
         return
+    program_files = expand_patterns(args.program_files)
+    if len(program_files) > 1 or program_files != args.program_files:
+        results = compile_batch(program_files, args.jobs, cache.directory if cache is not None else None)
+        if not all(result.success for result in results):
+            sys.exit(1)
+        return
+
+    program_file = program_files[0]
+    if program_file.endswith(CodeObject.suffix):
+        run_code_file(program_file, args)
+        return
+    diagnostics = Diagnostics(program_file=program_file)
     try:
-        with open(program_file, 'r') as file:
-            program_text = file.read()
+        ast = compile_file(program_file, cache, diagnostics)
     except FileNotFoundError:
         print("No such file: '{}'".format(program_file))
         return
-
-    ast = SemanticAnalyzer(program_text).analyze()
+    finally:
+        print(diagnostics.render(), end='')
     # print(ast)
+    if ast is None or diagnostics.has_errors():
+        return
+    if not args.no_fold:
+        ast, report = fold(ast)
+        if args.fold_report:
+            print(report)
+    if args.emit_bytecode:
+        CodeGenerator().generate(ast).save(args.emit_bytecode)
+    if args.compile_only:
+        return
+    runtime_diagnostics = Diagnostics(program_file=program_file)
+    interpreter = backends[args.backend](runtime_diagnostics, **runtime_options(args))
+    interpreter.run(ast)
+    print(runtime_diagnostics.render(), end='', flush=True)
+    print_machine_stats(interpreter, args)
+
+
+def runtime_options(args) -> dict:
+    # keyword arguments of the backends
+    return {
+        'max_steps': args.max_steps,
+        'max_tape_length': args.max_tape_length,
+        'detect_loops': args.detect_loops,
+        'compile_machines': args.compile_machines,
+        'machine_cache': MachineCache(args.machine_cache) if not args.no_machine_cache else None,
+        'profile_machines': args.profile or args.profile_json,
+    }
+
+
+def machine_name(machine) -> str:
+    # machines are named by the initial state and the position of their first instruction
+    positions = machine.positions.values()
+    return '{}{}'.format(machine.initial_state, ' at {}:{}'.format(*min(positions)) if positions else '')
+
+
+def print_machine_stats(interpreter: Interpreter, args):
+    if args.machine_report:
+        for report in interpreter.optimization_reports:
+            print('machine {}: {}'.format(machine_name(report.machine), report))
+    if args.machine_cache_stats and interpreter.machine_cache is not None:
+        print(interpreter.machine_cache)
+    if args.profile_json:
+        print(json.dumps([profile.to_dict() for profile in interpreter.machine_profiles.values()], indent=2),
+              file=sys.stderr)
+    elif args.profile:
+        for profile in interpreter.machine_profiles.values():
+            print('machine {}:\n{}'.format(machine_name(profile.machine), profile.report()), file=sys.stderr)
+
+
+def run_code_file(code_file, args):
+    # precompiled programs have no program text, errors are shown with their positions only
+    try:
+        code = CodeObject.load(code_file)
+    except FileNotFoundError:
+        print("No such file: '{}'".format(code_file))
+        return
+    runtime_diagnostics = Diagnostics()
+    virtual_machine = VirtualMachine(runtime_diagnostics, **runtime_options(args))
+    virtual_machine.run(code)
+    print(runtime_diagnostics.render(), end='', flush=True)
+    print_machine_stats(virtual_machine, args)
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,111 @@
+from typing import Tuple
+
+from source.machine import DenseMachine, TuringMachine
+
+
+class OptimizationReport:
+    def __init__(self, machine: TuringMachine, optimized: TuringMachine, unreachable_states: int, merged_states: int):
+        self.machine = machine
+        self.optimized = optimized
+        self.states = len(states_of(machine))
+        self.optimized_states = len(states_of(optimized))
+        self.transitions = len(machine.transitions)
+        self.optimized_transitions = len(optimized.transitions)
+        self.unreachable_states = unreachable_states
+        self.merged_states = merged_states
+
+    # sizes of the tables of the dense machines, the dense machine of the given machine is built only for the report
+
+    @property
+    def table_size(self) -> int:
+        return table_size(self.machine.dense)
+
+    @property
+    def optimized_table_size(self) -> int:
+        return table_size(self.optimized.dense)
+
+    def __str__(self):
+        return 'states {} -> {} ({} unreachable, {} merged), transitions {} -> {}, table cells {} -> {}'.format(
+            self.states, self.optimized_states, self.unreachable_states, self.merged_states,
+            self.transitions, self.optimized_transitions, self.table_size, self.optimized_table_size)
+
+
+def states_of(machine: TuringMachine):
+    states = {machine.initial_state}
+    for (state, symbol), (next_state, write_symbol, move) in machine.transitions.items():
+        states.add(state)
+        states.add(next_state)
+    return states
+
+
+def table_size(dense: DenseMachine) -> int:
+    return len(dense.states) * dense.width
+
+
+def reachable_states(machine: TuringMachine):
+    # states in the order they are reached from the initial state
+    next_states = {}
+    for (state, symbol), (next_state, write_symbol, move) in machine.transitions.items():
+        next_states.setdefault(state, []).append(next_state)
+    order = [machine.initial_state]
+    seen = {machine.initial_state}
+    for state in order:
+        for next_state in next_states.get(state, ()):
+            if next_state not in seen:
+                seen.add(next_state)
+                order.append(next_state)
+    return order
+
+
+def equivalent_states(machine: TuringMachine, states):
+    """Partition of the states into blocks of equivalent states, state -> number of its block.
+
+    States are equivalent when for every symbol both halt or both write the same symbol, move the head
+    the same way and go to equivalent states, so runs from them make the same steps. Blocks are refined
+    as in Moore's algorithm: states start in one block and are split by the blocks of their next states
+    until no block is split.
+    """
+    symbols = sorted({symbol for state, symbol in machine.transitions if state in states})
+    transitions = machine.transitions
+    blocks = {state: 0 for state in states}
+    count = 1
+    while True:
+        # signature of the state: its block and for every symbol the block of the next state,
+        # the symbol to write and the move, or None when the state halts
+        signatures = {}
+        new_blocks = {}
+        for state in states:
+            signature = [blocks[state]]
+            for symbol in symbols:
+                transition = transitions.get((state, symbol))
+                if transition is None:
+                    signature.append(None)
+                else:
+                    next_state, write_symbol, move = transition
+                    signature.append((blocks[next_state], write_symbol, move))
+            new_blocks[state] = signatures.setdefault(tuple(signature), len(signatures))
+        blocks = new_blocks
+        if len(signatures) == count:
+            return blocks
+        count = len(signatures)
+
+
+def optimize(machine: TuringMachine) -> Tuple[TuringMachine, OptimizationReport]:
+    """Machine making the same steps on all tapes with the unreachable states removed and equivalent states merged.
+
+    Merged states are named after the first reached state of their block, the initial state keeps its name.
+    """
+    states = reachable_states(machine)
+    blocks = equivalent_states(machine, states)
+    names = {}
+    for state in states:
+        names.setdefault(blocks[state], state)
+
+    optimized = TuringMachine(machine.initial_state, machine.blank_symbol)
+    for (state, symbol), (next_state, write_symbol, move) in machine.transitions.items():
+        if state in blocks and names[blocks[state]] == state:
+            optimized.transitions[state, symbol] = (names[blocks[next_state]], write_symbol, move)
+            if (state, symbol) in machine.positions:
+                optimized.positions[state, symbol] = machine.positions[state, symbol]
+    report = OptimizationReport(machine, optimized, len(states_of(machine)) - len(states), len(states) - len(names))
+    return optimized, report
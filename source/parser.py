@@ -1,12 +1,35 @@
 from source import ast
 from source.ast import Type
-from source.error import generate_error
+from source.error import Diagnostics
 from source.lexer import Lexer, Token
 
+# levels of expressions from the weakest binding: OR, AND, NOT, comparison, PLUS and MINUS,
+# MULTIPLY, DIVIDE and MODULO, unary MINUS, term
+(or_level, and_level, not_level, comparison_level, additive_level,
+ multiplicative_level, unary_minus_level, term_level) = range(8)
+
+binary_operator_levels = {
+    Token.OR: or_level,
+    Token.AND: and_level,
+    Token.EQUAL: comparison_level,
+    Token.NOT_EQUAL: comparison_level,
+    Token.LESS: comparison_level,
+    Token.GREATER: comparison_level,
+    Token.LESS_OR_EQUAL: comparison_level,
+    Token.GREATER_OR_EQUAL: comparison_level,
+    Token.PLUS: additive_level,
+    Token.MINUS: additive_level,
+    Token.MULTIPLY: multiplicative_level,
+    Token.DIVIDE: multiplicative_level,
+    Token.MODULO: multiplicative_level,
+}
+
 
 class Parser:
-    def __init__(self, program_text: str):
-        self.lexer = Lexer(program_text)
+    def __init__(self, program_text: str = None, lexer: Lexer = None, diagnostics: Diagnostics = None):
+        # lexer is any source of tokens with next_token() and diagnostics
+        self.lexer = lexer if lexer is not None else Lexer(program_text, diagnostics=diagnostics)
+        self.diagnostics = self.lexer.diagnostics
         self.token = self.lexer.next_token()
 
     def parse(self):
@@ -15,7 +38,7 @@ class Parser:
     def error_expected_token_type(self, token_types):
         if not isinstance(token_types, (tuple, list)):
             token_types = (token_types,)
-        generate_error('Parser', 'expected token {}, got {}'.format(
+        self.diagnostics.error('Parser', 'expected token {}, got {}'.format(
             ' or '.join(str(token) for token in token_types), self.token.type
         ), self.token.line, self.token.column)
 
@@ -94,6 +117,7 @@ class Parser:
         self.accept(Token.COLON)
         self.accept(Token.NEWLINE)
         statement.body = self.block_of_instructions()
+        return statement
 
     def block_of_instructions(self):
         sequence = ast.InstructionSequence()
@@ -167,58 +191,56 @@ class Parser:
         return statement
 
     def expression(self, level=0):
-        operators = [
-            (Token.OR,),
-            (Token.AND,),
-            (Token.NOT,),
-            (Token.EQUAL, Token.NOT_EQUAL, Token.LESS, Token.GREATER, Token.LESS_OR_EQUAL, Token.GREATER_OR_EQUAL),
-            (Token.PLUS, Token.MINUS),
-            (Token.MULTIPLY, Token.DIVIDE, Token.MODULO),
-            (Token.MINUS,),
-            (),
-        ]
-        if level < len(operators):
-            # NOT or unary MINUS
-            if level == 2 or level == 6:
-                unary_operator = operators[level][0]
-                count = 0
-                accepted = None
-                while self.token.type == unary_operator:
-                    if accepted is None:
-                        accepted = self.accept(unary_operator)
-                    else:
-                        self.accept(unary_operator)
-                    count += 1
-                expr = self.expression(level + 1)
-                if count % 2 != 0:
-                    left = expr
-                    expr = ast.Expression()
-                    expr.token = accepted
-                    expr.left = left
-                    expr.unary_operator = unary_operator
-            else:
-                current_operators = operators[level]
-                expr = self.expression(level + 1)
-                while self.token.type in current_operators:
-                    left = expr
-                    expr = ast.Expression()
-                    expr.left = left
-                    accepted = self.accept(current_operators)
-                    expr.token = accepted
-                    expr.operator = accepted.type
-                    expr.right = self.expression(level + 1)
-                    # handle only one comparison operator, not sequence of ones
-                    if level == 3:
-                        break
-            return expr
+        """Precedence climbing over the levels of binary_operator_levels starting from the given one.
+
+        Binary operators of one level are left associative, repeated unary operators cancel each other out.
+        Only one comparison is handled, not sequence of ones, and NOT binds weaker than comparison,
+        so after both of them only operators of lower levels (AND, OR) can follow.
+        """
+        # binary operators of levels from level to max_level (not including) are handled here
+        max_level = term_level
+        if level <= not_level and self.token.type == Token.NOT:
+            expr = self.unary_expression(Token.NOT, not_level + 1)
+            max_level = comparison_level
+        elif level <= unary_minus_level and self.token.type == Token.MINUS:
+            expr = self.unary_expression(Token.MINUS, unary_minus_level + 1)
         else:
-            return self.term()
+            expr = self.term()
+
+        while True:
+            operator_level = binary_operator_levels.get(self.token.type)
+            if operator_level is None or not level <= operator_level < max_level:
+                return expr
+            left = expr
+            expr = ast.Expression()
+            expr.left = left
+            accepted = self.accept(self.token.type)
+            expr.token = accepted
+            expr.operator = accepted.type
+            expr.right = self.expression(operator_level + 1)
+            # the left operand is complete, so only operators of the same or lower levels can follow
+            max_level = operator_level if operator_level == comparison_level else operator_level + 1
+
+    def unary_expression(self, unary_operator, operand_level):
+        accepted = self.accept(unary_operator)
+        count = 1
+        while self.token.type == unary_operator:
+            self.accept(unary_operator)
+            count += 1
+        expr = self.expression(operand_level)
+        if count % 2 != 0:
+            left = expr
+            expr = ast.Expression()
+            expr.token = accepted
+            expr.left = left
+            expr.unary_operator = unary_operator
+        return expr
 
     def term(self):
         # wait for valid token
-        valid_tokens = (Token.MINUS, Token.IDENTIFIER, Token.TRUE, Token.INTEGER_LITERAL, Token.SYMBOL_LITERAL,
-                        Token.TAPE_LITERAL, Token.LEFT_BRACE, Token.INPUT_BOOLEAN, Token.INPUT_INTEGER,
-                        Token.INPUT_SYMBOL, Token.INPUT_TAPE, Token.LEFT_BRACKET)
+        valid_tokens = (Token.MINUS, Token.IDENTIFIER, Token.TRUE, Token.FALSE, Token.INTEGER_LITERAL,
+                        Token.SYMBOL_LITERAL, Token.TAPE_LITERAL, Token.LEFT_BRACE, Token.INPUT_BOOLEAN,
+                        Token.INPUT_INTEGER, Token.INPUT_SYMBOL, Token.INPUT_TAPE, Token.LEFT_BRACKET)
         if self.token.type not in valid_tokens:
             self.error_expected_token_type(valid_tokens)
             while self.token.type not in valid_tokens:
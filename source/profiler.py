@@ -0,0 +1,184 @@
+import json
+import sys
+from array import array
+from typing import Tuple
+
+from source.machine import MachineError, StepLimitError, TapeLimitError, TuringMachine, shift_names, symbol_literal
+from source.machine_compiler import sweep_left, sweep_right
+from source.tape import Tape
+
+
+class InstructionProfile:
+    def __init__(self, state: str, symbol: str, next_state: str, write_symbol: str, move: int,
+                 position: Tuple[int, int], hits: int):
+        self.state = state
+        self.symbol = symbol
+        self.next_state = next_state
+        self.write_symbol = write_symbol
+        self.move = move
+        # (line, column) of the instruction in the program or None for instructions built by the compiler
+        self.position = position
+        self.hits = hits
+
+    def __str__(self):
+        return '{} {} = {} {} {}'.format(self.state, symbol_literal(self.symbol), self.next_state,
+                                         symbol_literal(self.write_symbol), shift_names[self.move])
+
+
+class MachineProfile:
+    """Counts of the runs of the machine: steps, hits of instructions, extent of the tape and travel of the head.
+
+    The tape extent is the number of visited cells and the cells of the given tape,
+    the head travel is the number of cells the head moved over. Counts of several runs are summed
+    and the tape extent is the largest one.
+    """
+
+    def __init__(self, machine: TuringMachine, steps: int, tape_extent: int, head_travel: int, instructions):
+        self.machine = machine
+        self.runs = 1
+        self.steps = steps
+        self.tape_extent = tape_extent
+        self.head_travel = head_travel
+        # instructions sorted by hits, the most hit first
+        self.instructions = sorted(instructions, key=lambda instruction: -instruction.hits)
+
+    def add(self, other: 'MachineProfile'):
+        # counts of another run of the same machine
+        self.runs += other.runs
+        self.steps += other.steps
+        self.tape_extent = max(self.tape_extent, other.tape_extent)
+        self.head_travel += other.head_travel
+        hits = {(instruction.state, instruction.symbol): instruction.hits for instruction in other.instructions}
+        for instruction in self.instructions:
+            instruction.hits += hits[instruction.state, instruction.symbol]
+        self.instructions.sort(key=lambda instruction: -instruction.hits)
+
+    def report(self) -> str:
+        lines = ['runs {}, steps {}, tape extent {} cells, head travel {} cells'.format(
+            self.runs, self.steps, self.tape_extent, self.head_travel)]
+        lines.append('{:>12} {:>7}  {:<10} {}'.format('hits', '%', 'position', 'instruction'))
+        for instruction in self.instructions:
+            position = '{}:{}'.format(*instruction.position) if instruction.position is not None else '-'
+            lines.append('{:>12} {:>6.1f}%  {:<10} {}'.format(
+                instruction.hits, 100 * instruction.hits / self.steps if self.steps else 0.0, position, instruction))
+        return '\n'.join(lines) + '\n'
+
+    def to_dict(self) -> dict:
+        return {
+            'machine': str(self.machine),
+            'runs': self.runs,
+            'steps': self.steps,
+            'tape_extent': self.tape_extent,
+            'head_travel': self.head_travel,
+            'instructions': [{
+                'state': instruction.state,
+                'symbol': instruction.symbol,
+                'next_state': instruction.next_state,
+                'write_symbol': instruction.write_symbol,
+                'shift': shift_names[instruction.move],
+                'line': instruction.position[0] if instruction.position is not None else None,
+                'column': instruction.position[1] if instruction.position is not None else None,
+                'hits': instruction.hits,
+            } for instruction in self.instructions],
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+
+def profile(machine: TuringMachine, tape: Tape, max_steps: int = None,
+            max_tape_length: int = None) -> Tuple[Tape, MachineProfile]:
+    """Run the machine on the tape as TuringMachine.run() without loop detection and count hits of every instruction.
+
+    The counting loop is separate from the loop of DenseMachine.run(), so runs without profiling
+    are not slowed down. Sweeps are the same macro-steps with the same errors, every swept cell
+    is a hit of the instruction of its symbol.
+    """
+    dense = machine.dense
+    width = dense.width
+    next_rows = dense.next_rows
+    sweep_rows = dense.sweep_rows
+    write_symbols = dense.write_symbols
+    moves = dense.moves
+    # codes of symbols swept over by every sweep
+    sweep_codes = [[code for code in range(width) if sweep_rows[row + code] == -2 - sweep]
+                   for sweep, (row, move, stop_codes, over_blanks) in enumerate(dense.sweeps)]
+    hits = array('q', [0]) * len(next_rows)
+    cells = dense.encode(tape)
+    blank = cells[:1]
+    blank[0] = dense.blank_symbol
+    head = min(max(tape.head_index, 0), len(cells) - 1)
+    low = 0
+    high = len(cells) - 1
+    extended = 0
+    steps = 0
+    head_travel = 0
+    step_limit = max_steps if max_steps is not None else -1
+    tape_limit = max_tape_length if max_tape_length is not None else sys.maxsize
+    row = dense.initial_state * width
+    while True:
+        index = row + cells[head]
+        sweep = sweep_rows[index]
+        if sweep == -1:
+            break
+        if sweep <= -2:
+            # macro-step as in DenseMachine.run()
+            row, move, stop_codes, over_blanks = dense.sweeps[-2 - sweep]
+            if move > 0:
+                target = sweep_right(cells, head, stop_codes)
+                if over_blanks and target == len(cells):
+                    raise MachineError('Machine moves right over blank symbols endlessly')
+                swept = cells[head:target]
+            else:
+                target = sweep_left(cells, head, stop_codes)
+                if over_blanks and target == -1:
+                    raise MachineError('Machine moves left over blank symbols endlessly')
+                swept = cells[target + 1:head + 1]
+            if 0 <= step_limit < steps + len(swept):
+                raise StepLimitError('Machine exceeds the step limit {} in state {}'.format(
+                    max_steps, dense.states[row // width]))
+            for code in sweep_codes[-2 - sweep]:
+                hits[row + code] += swept.count(code)
+            steps += len(swept)
+            head_travel += len(swept)
+            head = target
+        else:
+            row = next_rows[index]
+            if steps == step_limit:
+                raise StepLimitError('Machine exceeds the step limit {} in state {}'.format(
+                    max_steps, dense.states[row // width]))
+            hits[index] += 1
+            steps += 1
+            cells[head] = write_symbols[index]
+            move = moves[index]
+            if not move:
+                continue
+            head += move
+            head_travel += 1
+        # the same extension of the cells and the same limit as in DenseMachine.run()
+        if head < low:
+            if head < 0:
+                extension = len(cells)
+                cells[:0] = blank * extension
+                head += extension
+                high += extension
+                extended += extension
+            low = head
+        elif head > high:
+            if head == len(cells):
+                cells.append(dense.blank_symbol)
+            high = head
+        else:
+            continue
+        if high - low >= tape_limit:
+            raise TapeLimitError('Machine exceeds the tape length limit {} in state {}'.format(
+                max_tape_length, dense.states[row // width]))
+    machine.steps = steps
+
+    instructions = []
+    for (state, symbol), (next_state, write_symbol, move) in machine.transitions.items():
+        index = dense.state_codes[state] * dense.width + dense.symbol_codes[symbol]
+        instructions.append(InstructionProfile(state, symbol, next_state, write_symbol, move,
+                                               machine.positions.get((state, symbol)), hits[index]))
+    result = dense.decode(cells[low:high + 1], head - low, extended - low, tape)
+    return result, MachineProfile(machine, steps, high - low + 1, head_travel, instructions)
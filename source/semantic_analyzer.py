@@ -1,316 +1,326 @@
 import re
 from typing import Union, List, Tuple
 
-from source.error import generate_error, get_lexer_errors, get_parser_errors
+from source.error import Diagnostics
 from source import ast
 from source.ast import Type
-from source.lexer import Token
+from source.lexer import Lexer, Token
 from source.parser import Parser
+from source.tape import Tape
+
+# operator -> (operand type, result type)
+unary_operator_rules = {
+    Token.NOT: (Type.BOOLEAN, Type.BOOLEAN),
+    Token.MINUS: (Type.INTEGER, Type.INTEGER),
+    # tape^
+    Token.HEAD: (Type.TAPE, Type.INTEGER),
+    # tape[]
+    Token.LEFT_SQUARE_BRACKET: (Type.TAPE, Type.INTEGER),
+}
+
+# operator -> (operands should have the same type, left operand types, right operand types, result type),
+# result type None means the type of operands
+equality_types = (Type.INTEGER, Type.SYMBOL, Type.TAPE)
+addition_types = (Type.INTEGER, Type.TAPE, Type.TURING_MACHINE)
+subtraction_types = (Type.INTEGER, Type.TAPE)
+binary_operator_rules = {
+    Token.OR: (True, (Type.BOOLEAN,), (Type.BOOLEAN,), Type.BOOLEAN),
+    Token.AND: (True, (Type.BOOLEAN,), (Type.BOOLEAN,), Type.BOOLEAN),
+    Token.EQUAL: (True, equality_types, equality_types, Type.BOOLEAN),
+    Token.NOT_EQUAL: (True, equality_types, equality_types, Type.BOOLEAN),
+    Token.LESS: (True, (Type.INTEGER,), (Type.INTEGER,), Type.BOOLEAN),
+    Token.GREATER: (True, (Type.INTEGER,), (Type.INTEGER,), Type.BOOLEAN),
+    Token.LESS_OR_EQUAL: (True, (Type.INTEGER,), (Type.INTEGER,), Type.BOOLEAN),
+    Token.GREATER_OR_EQUAL: (True, (Type.INTEGER,), (Type.INTEGER,), Type.BOOLEAN),
+    Token.PLUS: (True, addition_types, addition_types, None),
+    Token.MINUS: (True, subtraction_types, subtraction_types, None),
+    Token.MULTIPLY: (True, (Type.INTEGER,), (Type.INTEGER,), Type.INTEGER),
+    Token.DIVIDE: (True, (Type.INTEGER,), (Type.INTEGER,), Type.INTEGER),
+    Token.MODULO: (True, (Type.INTEGER,), (Type.INTEGER,), Type.INTEGER),
+    # tape[integer]
+    Token.LEFT_SQUARE_BRACKET: (False, (Type.TAPE,), (Type.INTEGER,), Type.SYMBOL),
+    # turing_machine(tape)
+    Token.LEFT_BRACKET: (False, (Type.TURING_MACHINE,), (Type.TAPE,), Type.TAPE),
+}
+
+# types of valid expressions: (operator, operand type) -> result type
+unary_operator_types = {(operator, operand_type): result_type
+                        for operator, (operand_type, result_type) in unary_operator_rules.items()}
+
+# types of valid expressions: (operator, left operand type, right operand type) -> result type
+binary_operator_types = {(operator, left_type, right_type): result or left_type
+                         for operator, (same, left_types, right_types, result) in binary_operator_rules.items()
+                         for left_type in left_types
+                         for right_type in right_types
+                         if not same or left_type == right_type}
+
+# marks the end of child nodes of an analyzed node
+finished = object()
 
 
 class SemanticAnalyzer:
 
-    def __init__(self, program_text: str):
-        # self.ast = Parser(program_text).parse()
-        try:
-            self.ast = Parser(program_text).parse()
-        except AssertionError as ex:
-            if ex.args[0] == 'End of program text':
-                pass
+    def __init__(self, program_text: str = None, lexer: Lexer = None, diagnostics: Diagnostics = None):
+        # without program text and lexer the analyzer is used for separately parsed statements
+        self.ast = None
+        if program_text is not None or lexer is not None:
+            parser = Parser(program_text, lexer, diagnostics)
+            self.diagnostics = parser.diagnostics
+            # self.ast = Parser(program_text).parse()
+            try:
+                self.ast = parser.parse()
+            except AssertionError as ex:
+                if ex.args[0] == 'End of program text':
+                    pass
+        else:
+            self.diagnostics = diagnostics if diagnostics is not None else Diagnostics()
         self.variable_table = {}
 
     def analyze(self):
-        if not get_lexer_errors() and not get_parser_errors():
+        if not self.diagnostics.lexer_errors and not self.diagnostics.parser_errors:
             self._analyze(self.ast)
             return self.ast
 
-    @staticmethod
-    def incompatible_types_error(token: Token, type1: str, type2: str):
-        generate_error('Semantic', 'Incompatible types {} and {}'.format(type1, type2), token.line, token.column)
+    def analyze_statement(self, node):
+        # analyze one statement using and updating the current variable table
+        self._analyze(node)
+
+    def incompatible_types_error(self, token: Token, type1: str, type2: str):
+        self.diagnostics.error('Semantic', 'Incompatible types {} and {}'.format(type1, type2),
+                               token.line, token.column)
 
-    @staticmethod
-    def invalid_type_error(token: Token, type_: str, expected_type: Union[str, List, Tuple]):
+    def invalid_type_error(self, token: Token, type_: str, expected_type: Union[str, List, Tuple]):
         if isinstance(expected_type, (list, tuple)):
             expected_type = ' or '.join(expected_type)
-        generate_error('Semantic', 'Invalid type, expected {}, got {}'.format(expected_type, type_),
-                       token.line, token.column)
+        self.diagnostics.error('Semantic', 'Invalid type, expected {}, got {}'.format(expected_type, type_),
+                               token.line, token.column)
+
+    def undeclared_variable_error(self, token: Token, variable_name: str):
+        self.diagnostics.error('Semantic', 'Undeclared variable {}'.format(variable_name), token.line, token.column)
 
-    @staticmethod
-    def undeclared_variable_error(token: Token, variable_name: str):
-        generate_error('Semantic', 'Undeclared variable {}'.format(variable_name), token.line, token.column)
+    def integer_literal_out_of_range_error(self, token: Token, value: int):
+        self.diagnostics.error(
+            'Semantic', 'Integer literal is out of range, should be in [-32768,32767], got {}'.format(value),
+            token.line, token.column)
 
-    @staticmethod
-    def integer_literal_out_of_range_error(token: Token, value: int):
-        generate_error('Semantic', 'Integer literal is out of range, should be in [-32768,32767], got {}'.format(value),
-                       token.line, token.column)
+    def symbol_literal_length_error(self, token: Token, length: int):
+        self.diagnostics.error('Semantic', 'Symbol literal length should be 1, got {}'.format(length),
+                               token.line, token.column)
 
-    @staticmethod
-    def symbol_literal_length_error(token: Token, length: int):
-        generate_error('Semantic', 'Symbol literal length should be 1, got {}'.format(length), token.line, token.column)
+    def tape_literal_length_error(self, token: Token):
+        self.diagnostics.error('Semantic', 'Tape literal length should greater than 0, got 0',
+                               token.line, token.column)
 
-    @staticmethod
-    def tape_literal_length_error(token: Token):
-        generate_error('Semantic', 'Tape literal length should greater than 0, got 0', token.line, token.column)
+    def tape_literal_multile_heads_error(self, token: Token, head_count: int):
+        self.diagnostics.error('Semantic', 'Number of heads should be 0 or 1, got {}'.format(head_count),
+                               token.line, token.column)
 
-    @staticmethod
-    def tape_literal_multile_heads_error(token: Token, head_count: int):
-        generate_error('Semantic', 'Number of heads should be 0 or 1, got {}'.format(head_count),
-                       token.line, token.column)
+    def conflicting_instructions_error(self, token: Token, state: str, symbol: str):
+        self.diagnostics.error(
+            'Semantic', "Conflicting instructions for state {} and symbol '{}'".format(state, symbol),
+            token.line, token.column)
 
     def _analyze(self, node):
-        # debug: check for handling all tokens:
-        # if getattr(node, 'token', 0) is None:
-        #     print('Undefined token!', node)
-        # elif getattr(node, 'token', 0) != 0:
-        #     if not isinstance(node.token, Token):
-        #         print('Bad token')
-        if isinstance(node, ast.InstructionSequence):
-            for instr in node.instructions:
-                self._analyze(instr)
-
-        elif isinstance(node, ast.IfStatement):
-            self._analyze(node.condition)
-            if node.condition.type != Type.BOOLEAN:
-                self.invalid_type_error(node.condition.token, node.condition.type, Type.BOOLEAN)
-            self._analyze(node.if_body)
-            if node.else_body is not None:
-                self._analyze(node.else_body)
-
-        elif isinstance(node, ast.WhileStatement):
-            self._analyze(node.condition)
-            if node.condition.type != Type.BOOLEAN:
-                self.invalid_type_error(node.condition.token, node.condition.type, Type.BOOLEAN)
-            self._analyze(node.body)
-
-        elif isinstance(node, ast.OutputStatement):
-            self._analyze(node.value)
-            if node.type and node.type != node.value.type:
-                self.invalid_type_error(node.value.token, node.value.type, node.type)
-            elif node.type is None:
-                node.type = node.value.type
-
-        elif isinstance(node, ast.AssignmentStatement):
-            # always analyze right side
-            self._analyze(node.right)
-            if node.operator == Token.COLON:
-                # node.left is only ast.Identifier and node.right is only
-                # ast.TuringMachineInstructionSequence according to the parser
-                identifier = node.left
-                self._analyze(identifier)
-                if identifier.type != Type.TURING_MACHINE:
-                    self.invalid_type_error(identifier.token, identifier.type, Type.TURING_MACHINE)
+        # Handlers of nodes without child nodes return None, handlers of other nodes return
+        # iterators yielding child nodes, which are analyzed before the iterator continues.
+        # Running iterators are kept on the stack instead of recursive calls.
+        stack = []
+        while True:
+            handler = self.node_handlers.get(type(node))
+            if handler is None:
+                assert False, 'Unknown AST node'
+            children = handler(self, node)
+            if children is not None:
+                stack.append(children)
+            while stack:
+                node = next(stack[-1], finished)
+                if node is not finished:
+                    break
+                stack.pop()
             else:
-                if isinstance(node.left, ast.Identifier):
-                    identifier = node.left
-                    if node.operator == Token.ASSIGNMENT and identifier.name not in self.variable_table:
-                        self.variable_table[identifier.name] = node.right.type
-                    else:
-                        self._analyze(identifier)
-                        if identifier.type != node.right.type:
-                            self.incompatible_types_error(node.token, identifier.type, node.right.type)
-                else:
-                    self._analyze(node.left)
-                    if node.left.type != node.right.type:
-                        self.incompatible_types_error(node.token, node.left.type, node.right.type)
-
-        elif isinstance(node, ast.Expression):
-            self._analyze(node.left)
-            # unary operator
-            if node.unary_operator:
-                operator = node.unary_operator
-                # not
-                if operator == Token.NOT:
-                    node.type = Type.BOOLEAN
-                    if node.left.type != Type.BOOLEAN:
-                        self.invalid_type_error(node.left.token, node.left.type, Type.BOOLEAN)
-                # -
-                elif operator == Token.MINUS:
-                    node.type = Type.INTEGER
-                    if node.left.type != Type.INTEGER:
-                        self.invalid_type_error(node.left.token, node.left.type, Type.INTEGER)
-                # ^
-                elif operator == Token.HEAD:
-                    node.type = Type.INTEGER
-                    if node.left.type != Type.TAPE:
-                        self.invalid_type_error(node.left.token, node.left.type, Type.TAPE)
-                # []
-                elif operator == Token.LEFT_SQUARE_BRACKET:
-                    node.type = Type.INTEGER
-                    if node.left.type != Type.TAPE:
-                        self.invalid_type_error(node.left.token, node.left.type, Type.TAPE)
-                # wrong state, need to fix program
-                else:
-                    assert False, 'Unhandled unary operator!'
-
-            # binary operator
-            elif node.operator:
-                self._analyze(node.right)
-                operator = node.operator
-                # or, and
-                if operator in (Token.OR, Token.AND):
-                    node.type = Type.BOOLEAN
-                    if node.left.type != node.right.type:
-                        self.incompatible_types_error(node.token, node.left.type, node.right.type)
-                    if node.left.type != Type.BOOLEAN:
-                        self.invalid_type_error(node.left.token, node.left.type, Type.BOOLEAN)
-                    if node.right.type != Type.BOOLEAN:
-                        self.invalid_type_error(node.right.token, node.right.type, Type.BOOLEAN)
-                # ==, !=
-                elif operator in (Token.EQUAL, Token.NOT_EQUAL):
-                    node.type = Type.BOOLEAN
-                    if node.left.type != node.right.type:
-                        self.incompatible_types_error(node.token, node.left.type, node.right.type)
-                    if node.left.type not in (Type.INTEGER, Type.SYMBOL, Type.TAPE):
-                        self.invalid_type_error(node.left.token, node.left.type, (Type.INTEGER, Type.SYMBOL, Type.TAPE))
-                    if node.right.type not in (Type.INTEGER, Type.SYMBOL, Type.TAPE):
-                        self.invalid_type_error(node.right.token, node.right.type, (Type.INTEGER, Type.SYMBOL, Type.TAPE))
-                # <, >, <=, >=
-                elif operator in (Token.LESS, Token.GREATER, Token.LESS_OR_EQUAL, Token.GREATER_OR_EQUAL):
-                    node.type = Type.BOOLEAN
-                    if node.left.type != node.right.type:
-                        self.incompatible_types_error(node.token, node.left.type, node.right.type)
-                    if node.left.type != Type.INTEGER:
-                        self.invalid_type_error(node.left.token, node.left.type, Type.INTEGER)
-                    if node.right.type != Type.INTEGER:
-                        self.invalid_type_error(node.right.token, node.right.type, Type.INTEGER)
-                # +
-                elif operator == Token.PLUS:
-                    node.type = node.left.type
-                    if node.left.type != node.right.type:
-                        self.incompatible_types_error(node.token, node.left.type, node.right.type)
-                    if node.left.type not in (Type.INTEGER, Type.TAPE, Type.TURING_MACHINE):
-                        self.invalid_type_error(node.left.token, node.left.type,
-                                                (Type.INTEGER, Type.TAPE, Type.TURING_MACHINE))
-                        node.type = node.right.type
-                    if node.right.type not in (Type.INTEGER, Type.TAPE, Type.TURING_MACHINE):
-                        self.invalid_type_error(node.right.token, node.right.type,
-                                                (Type.INTEGER, Type.TAPE, Type.TURING_MACHINE))
-                        if node.type == node.right.type:
-                            node.type = Type.INTEGER
-                # -
-                elif operator == Token.MINUS:
-                    node.type = node.left.type
-                    if node.left.type != node.right.type:
-                        self.incompatible_types_error(node.token, node.left.type, node.right.type)
-                    if node.left.type not in (Type.INTEGER, Type.TAPE):
-                        self.invalid_type_error(node.left.token, node.left.type, (Type.INTEGER, Type.TAPE))
-                        node.type = node.right.type
-                    if node.right.type not in (Type.INTEGER, Type.TAPE):
-                        self.invalid_type_error(node.right.token, node.right.type, (Type.INTEGER, Type.TAPE))
-                        if node.type == node.right.type:
-                            node.type = Type.INTEGER
-                # *, /, %
-                elif operator in (Token.MULTIPLY, Token.DIVIDE, Token.MODULO):
-                    node.type = Type.INTEGER
-                    if node.left.type != node.right.type:
-                        self.incompatible_types_error(node.token, node.left.type, node.right.type)
-                    if node.left.type != Type.INTEGER:
-                        self.invalid_type_error(node.left.token, node.left.type, Type.INTEGER)
-                    if node.right.type != Type.INTEGER:
-                        self.invalid_type_error(node.right.token, node.right.type, Type.INTEGER)
-                # tape[integer]
-                elif operator == Token.LEFT_SQUARE_BRACKET:
-                    node.type = Type.SYMBOL
-                    if node.left.type != Type.TAPE:
-                        self.invalid_type_error(node.left.token, node.left.type, Type.TAPE)
-                    if node.right.type != Type.INTEGER:
-                        self.invalid_type_error(node.right.token, node.right.type, Type.INTEGER)
-                # turing_machine(tape)
-                elif operator == Token.LEFT_BRACKET:
-                    node.type = Type.TAPE
-                    if node.left.type != Type.TURING_MACHINE:
-                        self.invalid_type_error(node.left.token, node.left.type, Type.TURING_MACHINE)
-                    if node.right.type != Type.TAPE:
-                        self.invalid_type_error(node.right.token, node.right.type, Type.TAPE)
-                # wrong state, need to fix program
-                else:
-                    assert False, 'Unhandled binary operator!'
+                return
 
-            # wrong state, need to fix program
-            else:
-                assert False, 'Neither unary nor binary operator exists in expression'
+    def analyze_instruction_sequence(self, node: ast.InstructionSequence):
+        yield from node.instructions
 
-        elif isinstance(node, ast.Identifier):
-            if node.name not in self.variable_table:
-                self.undeclared_variable_error(node.token, node.name)
-            else:
-                node.type = self.variable_table[node.name]
-
-        elif isinstance(node, ast.Literal):
-            if node.type == Type.BOOLEAN:
-                # todo: bad practice: tokens TRUE and FALSE defined in the lexer but definition used here
-                if node.value == 'true':
-                    node.value = True
-                elif node.value == 'false':
-                    node.value = False
-                # wrong state, need to fix program
+    def analyze_if_statement(self, node: ast.IfStatement):
+        yield node.condition
+        if node.condition.type != Type.BOOLEAN:
+            self.invalid_type_error(node.condition.token, node.condition.type, Type.BOOLEAN)
+        yield node.if_body
+        if node.else_body is not None:
+            yield node.else_body
+
+    def analyze_while_statement(self, node: ast.WhileStatement):
+        yield node.condition
+        if node.condition.type != Type.BOOLEAN:
+            self.invalid_type_error(node.condition.token, node.condition.type, Type.BOOLEAN)
+        yield node.body
+
+    def analyze_output_statement(self, node: ast.OutputStatement):
+        yield node.value
+        if node.type and node.type != node.value.type:
+            self.invalid_type_error(node.value.token, node.value.type, node.type)
+        elif node.type is None:
+            node.type = node.value.type
+
+    def analyze_assignment_statement(self, node: ast.AssignmentStatement):
+        # always analyze right side
+        yield node.right
+        if node.operator == Token.COLON:
+            # node.left is only ast.Identifier and node.right is only
+            # ast.TuringMachineInstructionSequence according to the parser
+            identifier = node.left
+            yield identifier
+            if identifier.type != Type.TURING_MACHINE:
+                self.invalid_type_error(identifier.token, identifier.type, Type.TURING_MACHINE)
+        else:
+            if isinstance(node.left, ast.Identifier):
+                identifier = node.left
+                if node.operator == Token.ASSIGNMENT and identifier.name not in self.variable_table:
+                    self.variable_table[identifier.name] = node.right.type
                 else:
-                    assert False, 'Unknown boolean type'
-            elif node.type == Type.INTEGER:
-                node.value = int(node.value)
-                # if -32768 > node.value < 32767:
-                if -2 ** 15 > node.value or node.value > 2 ** 15 - 1:
-                    self.integer_literal_out_of_range_error(node.token, node.value)
-            elif node.type == Type.SYMBOL:
-                # remove quotes
-                node.value = node.value[1:-1]
-                # replace escaped characters
-                node.value = re.sub(
-                    r"\\\\|\\n|\\t|\\'",
-                    lambda mo: {r'\\': '\\', r'\n': '\n', r'\t': '\t', r"'": "'"}[mo.group()],
-                    node.value,
-                )
-
-                if len(node.value) != 1:
-                    self.symbol_literal_length_error(node.token, len(node.value))
-            elif node.type == Type.TAPE:
-                # remove quotes
-                node.value = node.value[1:-1]
-
-                if len(node.value) == 0 or node.value == '^':
-                    self.tape_literal_length_error(node.token)
-                head_count = node.value.count('^') - node.value.count(r'\^')
-                if head_count > 1:
-                    self.tape_literal_multile_heads_error(node.token, head_count)
-
-                # todo: handle this situation: "\\\^a^"
-                # Replace escaped characters and replace \^ with ^ and ^ with \^
-                node.value = re.sub(
-                    r'\\\\|\\n|\\t|\\"|\\\^|\^"',
-                    lambda mo: {r'\\': '\\', r'\n': '\n', r'\t': '\t', r'"': '"', r'\^': r'^', r'^': r'\^'}[mo.group()],
-                    node.value,
-                )
-                # Find index of \^ and replace it with ''
-                idx = node.value.find('\^')
-                if idx == -1:
-                    idx = 0
-                node.value = node.value.replace('\^', '')
-
-                node.value = [idx, list(node.value)]
-            elif node.type == Type.TURING_MACHINE:
-                # todo: create tm intermediate representation
-                self._analyze(node.blank_symbol)
-                if node.value is not None:
-                    self._analyze(node.value)
-            # wrong state, need to fix program
+                    yield identifier
+                    if identifier.type != node.right.type:
+                        self.incompatible_types_error(node.token, identifier.type, node.right.type)
             else:
-                assert False, 'Unknown literal type'
+                yield node.left
+                if node.left.type != node.right.type:
+                    self.incompatible_types_error(node.token, node.left.type, node.right.type)
+
+    def analyze_expression(self, node: ast.Expression):
+        yield node.left
+        # valid operand types are looked up in the tables, errors are reported by the checks
+        if node.unary_operator:
+            node.type = unary_operator_types.get((node.unary_operator, node.left.type))
+            if node.type is None:
+                self.check_unary_operator(node)
+        elif node.operator:
+            yield node.right
+            node.type = binary_operator_types.get((node.operator, node.left.type, node.right.type))
+            if node.type is None:
+                self.check_binary_operator(node)
+        # wrong state, need to fix program
+        else:
+            assert False, 'Neither unary nor binary operator exists in expression'
+
+    def check_unary_operator(self, node: ast.Expression):
+        rule = unary_operator_rules.get(node.unary_operator)
+        # wrong state, need to fix program
+        if rule is None:
+            assert False, 'Unhandled unary operator!'
+        operand_type, node.type = rule
+        if node.left.type != operand_type:
+            self.invalid_type_error(node.left.token, node.left.type, operand_type)
+
+    def check_binary_operator(self, node: ast.Expression):
+        rule = binary_operator_rules.get(node.operator)
+        # wrong state, need to fix program
+        if rule is None:
+            assert False, 'Unhandled binary operator!'
+        same_types, left_types, right_types, result_type = rule
+        # without result type the result has the type of the valid operand or INTEGER if both are invalid
+        node.type = result_type or node.left.type
+        if same_types and node.left.type != node.right.type:
+            self.incompatible_types_error(node.token, node.left.type, node.right.type)
+        if node.left.type not in left_types:
+            self.invalid_type_error(node.left.token, node.left.type, left_types)
+            if result_type is None:
+                node.type = node.right.type
+        if node.right.type not in right_types:
+            self.invalid_type_error(node.right.token, node.right.type, right_types)
+            if result_type is None and node.type == node.right.type:
+                node.type = Type.INTEGER
 
-        elif isinstance(node, ast.InputStatement):
-            pass
+    def analyze_identifier(self, node: ast.Identifier):
+        if node.name not in self.variable_table:
+            self.undeclared_variable_error(node.token, node.name)
+        else:
+            node.type = self.variable_table[node.name]
 
-        elif isinstance(node, ast.TuringMachineInstructionSequence):
-            for instr in node.instructions:
-                self._analyze(instr)
-                node.states.add(instr.left_state)
-                node.states.add(instr.right_state)
-                node.symbols.add(instr.left_symbol)
-                node.symbols.add(instr.right_symbol)
+    def analyze_literal(self, node: ast.Literal):
+        if node.type == Type.BOOLEAN:
+            # todo: bad practice: tokens TRUE and FALSE defined in the lexer but definition used here
+            if node.value == 'true':
+                node.value = True
+            elif node.value == 'false':
+                node.value = False
+            # wrong state, need to fix program
+            else:
+                assert False, 'Unknown boolean type'
+        elif node.type == Type.INTEGER:
+            node.value = int(node.value)
+            # if -32768 > node.value < 32767:
+            if -2 ** 15 > node.value or node.value > 2 ** 15 - 1:
+                self.integer_literal_out_of_range_error(node.token, node.value)
+        elif node.type == Type.SYMBOL:
+            # remove quotes
+            node.value = node.value[1:-1]
+            # replace escaped characters
+            node.value = re.sub(
+                r"\\\\|\\n|\\t|\\'",
+                lambda mo: {r'\\': '\\', r'\n': '\n', r'\t': '\t', r"\'": "'"}[mo.group()],
+                node.value,
+            )
 
-        elif isinstance(node, ast.TuringMachineInstruction):
-            self._analyze(node.left_symbol)
-            self._analyze(node.right_symbol)
+            if len(node.value) != 1:
+                self.symbol_literal_length_error(node.token, len(node.value))
+        elif node.type == Type.TAPE:
+            # remove quotes
+            node.value = node.value[1:-1]
 
+            if len(node.value) == 0 or node.value == '^':
+                self.tape_literal_length_error(node.token)
+            head_count = node.value.count('^') - node.value.count(r'\^')
+            if head_count > 1:
+                self.tape_literal_multile_heads_error(node.token, head_count)
+
+            # symbols are separated by |, the first ^ which is not escaped marks the head
+            node.value = Tape.parse(node.value)
+        elif node.type == Type.TURING_MACHINE:
+            return self.analyze_turing_machine_literal(node)
         # wrong state, need to fix program
         else:
-            assert False, 'Unknown AST node'
+            assert False, 'Unknown literal type'
+
+    def analyze_turing_machine_literal(self, node: ast.Literal):
+        # todo: create tm intermediate representation
+        yield node.blank_symbol
+        if node.value is not None:
+            yield node.value
+
+    def analyze_input_statement(self, node: ast.InputStatement):
+        pass
+
+    def analyze_turing_machine_instruction_sequence(self, node: ast.TuringMachineInstructionSequence):
+        # instructions have only symbol literals as child nodes, so they are analyzed without the stack
+        # (state, symbol) -> (next state, symbol to write, shift), the machine is deterministic
+        transitions = {}
+        for instr in node.instructions:
+            self.analyze_turing_machine_instruction(instr)
+            key = (instr.left_state.name, instr.left_symbol.value)
+            transition = (instr.right_state.name, instr.right_symbol.value, instr.shift)
+            if transitions.setdefault(key, transition) != transition:
+                self.conflicting_instructions_error(instr.left_state.token, *key)
+            node.states.add(instr.left_state)
+            node.states.add(instr.right_state)
+            node.symbols.add(instr.left_symbol)
+            node.symbols.add(instr.right_symbol)
+
+    def analyze_turing_machine_instruction(self, node: ast.TuringMachineInstruction):
+        self.analyze_literal(node.left_symbol)
+        self.analyze_literal(node.right_symbol)
+
+    node_handlers = {
+        ast.InstructionSequence: analyze_instruction_sequence,
+        ast.IfStatement: analyze_if_statement,
+        ast.WhileStatement: analyze_while_statement,
+        ast.OutputStatement: analyze_output_statement,
+        ast.AssignmentStatement: analyze_assignment_statement,
+        ast.Expression: analyze_expression,
+        ast.Identifier: analyze_identifier,
+        ast.Literal: analyze_literal,
+        ast.InputStatement: analyze_input_statement,
+        ast.TuringMachineInstructionSequence: analyze_turing_machine_instruction_sequence,
+        ast.TuringMachineInstruction: analyze_turing_machine_instruction,
+    }
@@ -0,0 +1,152 @@
+import re
+from array import array
+from typing import Iterable, List
+
+# escaped characters of symbols in the printable form of tapes
+printable_escapes = {'\\': '\\\\', '|': '\\|', '^': '\\^', '\n': '\\n', '\t': '\\t'}
+# escaped characters of the printable form and of tape literals -> characters
+printable_unescapes = {r'\\': '\\', r'\|': '|', r'\^': '^', r'\n': '\n', r'\t': '\t', r'\"': '"'}
+
+
+class Tape:
+    """Tape of symbols stored as codes into the alphabet of the tape.
+
+    Codes are kept in a bytearray, or in an array of integers when the alphabet has more than 256 symbols,
+    with free space at both ends: cells[start:end] are the cells of the tape and head is the index
+    of the head in cells. The free space is doubled when the tape grows out of it,
+    so the tape grows in both directions in amortized O(1) per cell.
+    """
+
+    def __init__(self, symbols: Iterable[str] = (), head: int = 0):
+        self.alphabet: List[str] = []
+        self.codes = {}
+        self.cells = bytearray()
+        for symbol in symbols:
+            code = self.code(symbol)
+            self.cells.append(code)
+        self.start = 0
+        self.end = len(self.cells)
+        self.head = head
+
+    @classmethod
+    def parse(cls, text: str) -> 'Tape':
+        """Tape of the printable form "a|b|^c", the text of tape literals and of the input of tapes.
+
+        Symbols are separated by |, the first ^ which is not escaped marks the head at the symbol containing it.
+        """
+        symbols = []
+        chars = []
+        head = None
+        for mo in re.finditer(r'\\[\\|^nt"]|.', text, re.DOTALL):
+            char = mo.group()
+            if char == '|':
+                symbols.append(''.join(chars))
+                chars = []
+            elif char == '^' and head is None:
+                head = len(symbols)
+            else:
+                chars.append(printable_unescapes.get(char, char))
+        symbols.append(''.join(chars))
+        return cls(symbols, head or 0)
+
+    @classmethod
+    def from_codes(cls, alphabet: List[str], cells, head: int):
+        # many tapes are created from the results of machines, so the dict of codes is built only when needed
+        tape = cls.__new__(cls)
+        tape.alphabet = alphabet
+        tape.codes = None
+        if len(alphabet) <= 256:
+            # cells may be an array of integers, whose buffer would be taken by bytearray() as raw data
+            tape.cells = cells if isinstance(cells, bytearray) else bytearray(iter(cells))
+        else:
+            tape.cells = array('I', list(cells))
+        tape.start = 0
+        tape.end = len(tape.cells)
+        tape.head = head
+        return tape
+
+    def code(self, symbol: str) -> int:
+        if self.codes is None:
+            self.codes = {symbol: code for code, symbol in enumerate(self.alphabet)}
+        code = self.codes.get(symbol)
+        if code is None:
+            code = self.codes[symbol] = len(self.alphabet)
+            self.alphabet.append(symbol)
+            if code == 256:
+                # bytes are taken as raw data by the array, so the codes are copied as integers
+                self.cells = array('I', list(self.cells))
+        return code
+
+    def __len__(self):
+        return self.end - self.start
+
+    @property
+    def head_index(self) -> int:
+        return self.head - self.start
+
+    def __getitem__(self, index: int) -> str:
+        if not 0 <= index < self.end - self.start:
+            raise IndexError('tape index out of range')
+        return self.alphabet[self.cells[self.start + index]]
+
+    def __setitem__(self, index: int, symbol: str):
+        if not 0 <= index < self.end - self.start:
+            raise IndexError('tape index out of range')
+        code = self.code(symbol)
+        self.cells[self.start + index] = code
+
+    def symbols(self) -> List[str]:
+        alphabet = self.alphabet
+        return [alphabet[code] for code in self.cells[self.start:self.end]]
+
+    def move(self, shift: int, blank_symbol: str):
+        # the tape is extended by the blank symbol where the head goes out of it
+        self.head += shift
+        if self.head < self.start:
+            self.extend_left(self.start - self.head, blank_symbol)
+        elif self.head >= self.end:
+            self.extend_right(self.head - self.end + 1, blank_symbol)
+
+    def extend_left(self, count: int, symbol: str):
+        code = self.code(symbol)
+        if self.start < count:
+            free = max(count, len(self.cells))
+            self.cells[:0] = self.fill(0, free)
+            self.start += free
+            self.end += free
+            self.head += free
+        self.start -= count
+        self.cells[self.start:self.start + count] = self.fill(code, count)
+
+    def extend_right(self, count: int, symbol: str):
+        code = self.code(symbol)
+        if len(self.cells) - self.end < count:
+            free = max(count, len(self.cells))
+            self.cells.extend(self.fill(0, free))
+        self.cells[self.end:self.end + count] = self.fill(code, count)
+        self.end += count
+
+    def fill(self, code: int, count: int):
+        if isinstance(self.cells, bytearray):
+            return bytes((code,)) * count
+        return array('I', (code,)) * count
+
+    def copy(self) -> 'Tape':
+        return Tape.from_codes(list(self.alphabet), self.cells[self.start:self.end], self.head - self.start)
+
+    def __eq__(self, other):
+        if not isinstance(other, Tape):
+            return NotImplemented
+        return self.head_index == other.head_index and self.symbols() == other.symbols()
+
+    def __repr__(self):
+        return 'Tape({!r}, {})'.format(self.symbols(), self.head_index)
+
+    def __str__(self):
+        # printable form "a|b|^c", it is built only when the tape is printed
+        head_index = self.head_index
+        cells = []
+        for idx, symbol in enumerate(self.symbols()):
+            symbol = ''.join(printable_escapes.get(char, char) for char in symbol)
+            cells.append('^' + symbol if idx == head_index else symbol)
+        return '|'.join(cells)
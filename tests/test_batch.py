@@ -0,0 +1,61 @@
+import unittest
+
+from source.batch import run_batch
+from source.machine import MachineError, StepLimitError, TapeLimitError, TuringMachine
+from source.tape import Tape
+
+
+def counting_machine() -> TuringMachine:
+    # machine moving right over 1 and halting after 0, on tapes without 0 it moves over blank symbols endlessly
+    machine = TuringMachine('q0', '_')
+    machine.add_instruction('q0', '1', 'q0', '1', '>')
+    machine.add_instruction('q0', '0', 'q1', '0', '>')
+    machine.add_instruction('q0', '_', 'q2', '_', '>')
+    machine.add_instruction('q2', '_', 'q2', '_', '>')
+    return machine
+
+
+def run_one_by_one(machine: TuringMachine, tapes, max_steps=None, max_tape_length=None):
+    try:
+        return [machine.run(tape, max_steps, max_tape_length) for tape in tapes]
+    except MachineError as ex:
+        return type(ex), str(ex)
+
+
+def run_together(machine: TuringMachine, tapes, max_steps=None, max_tape_length=None):
+    try:
+        return run_batch(machine, tapes, max_steps, max_tape_length)
+    except MachineError as ex:
+        return type(ex), str(ex)
+
+
+class RunBatchTest(unittest.TestCase):
+    def test_limits(self):
+        machine = counting_machine()
+        halting = [Tape(list('1110')), Tape(list('0')), Tape(list('11110'))]
+        endless = Tape(list('11'))
+        cases = [
+            (halting, 5, None),
+            (halting, 4, None),
+            (halting, None, 4),
+            (halting + [endless], None, None),
+            (halting + [endless], 3, None),
+            (halting + [endless], None, 8),
+            ([endless] + halting, 1000, 1000),
+        ]
+        for tapes, max_steps, max_tape_length in cases:
+            with self.subTest(tapes=tapes, max_steps=max_steps, max_tape_length=max_tape_length):
+                self.assertEqual(run_together(machine, tapes, max_steps, max_tape_length),
+                                 run_one_by_one(machine, tapes, max_steps, max_tape_length))
+
+    def test_errors(self):
+        machine = counting_machine()
+        tapes = [Tape(list('10')), Tape(list('11110'))]
+        with self.assertRaises(StepLimitError):
+            run_batch(machine, tapes, max_steps=3)
+        with self.assertRaises(TapeLimitError):
+            run_batch(machine, tapes, max_tape_length=5)
+
+
+if __name__ == '__main__':
+    unittest.main()
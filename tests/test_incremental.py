@@ -0,0 +1,38 @@
+import unittest
+
+from source.incremental import IncrementalAnalyzer
+
+
+def errors(analyzer: IncrementalAnalyzer) -> list:
+    return sorted((error.line, error.column, error.message) for error in analyzer.diagnostics.errors)
+
+
+class IncrementalAnalyzerTest(unittest.TestCase):
+    # each edit is analyzed incrementally and compared with the full analysis of the new text
+    edits = [
+        # declaration with errors inserted before its use
+        ('x = 1\n<i u^\n', 'x = 1\nu = t\n<i u^\n'),
+        # declaration with errors deleted
+        ('x = 1\nu = t\n<i u^\n', 'x = 1\n<i u^\n'),
+        # declaration with errors replaced by a valid one
+        ('x = 1\nu = t\n<i u^\n', 'x = 1\nu = [a]\n<i u^\n'),
+        # valid declaration replaced by one with errors
+        ('x = 1\nu = [a]\n<i u^\n', 'x = 1\nu = t\n<i u^\n'),
+        # type of a declaration changed
+        ('x = 1\ny = x + 1\n<i y\n', 'x = true\ny = x + 1\n<i y\n'),
+        # declaration inserted
+        ('x = 1\n<i y\n', 'x = 1\ny = 2\n<i y\n'),
+        # declaration deleted
+        ('x = 1\ny = 2\n<i y\n', 'x = 1\n<i y\n'),
+    ]
+
+    def test_edits(self):
+        for old_text, new_text in self.edits:
+            with self.subTest(old_text=old_text, new_text=new_text):
+                analyzer = IncrementalAnalyzer(old_text)
+                analyzer.update(new_text)
+                self.assertEqual(errors(analyzer), errors(IncrementalAnalyzer(new_text)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import io
+import unittest
+
+from source.bytecode import VirtualMachine
+from source.closure_compiler import ClosureCompiler
+from source.error import Diagnostics
+from source.interpreter import Interpreter
+from source.semantic_analyzer import SemanticAnalyzer
+
+
+def run(backend, program: str, **options) -> list:
+    # output lines and runtime errors of the program
+    output = io.StringIO()
+    diagnostics = Diagnostics(program)
+    backend(diagnostics, output_file=output, **options).run(SemanticAnalyzer(program).analyze())
+    return output.getvalue().splitlines() + [error.message for error in diagnostics.errors]
+
+
+class MachineNamesTest(unittest.TestCase):
+    # machines with the same structure and other names of states
+    program = ("a = {q0 ' ': q0 ' ' = q1 ' ' >; q1 ' ' = q0 ' ' <}\n"
+               "b = {p0 ' ': p0 ' ' = p1 ' ' >; p1 ' ' = p0 ' ' <}\n"
+               "t = a(\"1\")\n"
+               "<< t\n"
+               "t = b(\" \")\n")
+
+    def test_errors_name_the_states_of_the_machine(self):
+        for backend in (Interpreter, ClosureCompiler, VirtualMachine):
+            for compile_machines in (False, True):
+                with self.subTest(backend=backend.__name__, compile_machines=compile_machines):
+                    self.assertEqual(run(backend, self.program, max_steps=10, compile_machines=compile_machines),
+                                     ['^1', 'Machine exceeds the step limit 10 in state p1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
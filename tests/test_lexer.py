@@ -0,0 +1,39 @@
+import os
+import unittest
+
+from source.lexer import Lexer, StreamingLexer, Token
+
+
+def tokens(lexer) -> list:
+    # (type, value, line, column) of all tokens up to the end of file
+    result = []
+    while not result or result[-1][0] != Token.END_OF_FILE:
+        token = lexer.next_token()
+        result.append((token.type, token.value, token.line, token.column))
+    return result
+
+
+class StreamingLexerTest(unittest.TestCase):
+    program_file = os.path.join(os.path.dirname(__file__), '..', 'test_files', 'test_tokens.txt')
+
+    def test_close_before_end_of_file(self):
+        with StreamingLexer(self.program_file, chunk_size=16) as lexer:
+            lexer.next_token()
+        self.assertTrue(lexer.file.closed)
+
+    def test_close_at_end_of_file(self):
+        with StreamingLexer(self.program_file, chunk_size=16) as lexer:
+            while lexer.next_token().type != Token.END_OF_FILE:
+                pass
+        self.assertTrue(lexer.file.closed)
+
+    def test_tokenize(self):
+        with open(self.program_file) as file:
+            expected = tokens(Lexer(file.read()).tokenize())
+        with StreamingLexer(self.program_file, chunk_size=16) as lexer:
+            self.assertEqual(tokens(lexer.tokenize()), expected)
+        self.assertTrue(lexer.file.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+
+from source.machine import (MachineCache, MachinePipeline, StepLimitError, TapeLimitError, TuringMachine, compose, fuse,
+                            shift_names)
+from source.tape import Tape
+
+
+def inverting_machine(state: str = 'q0') -> TuringMachine:
+    # machine inverting 0 and 1 up to the first blank symbol
+    machine = TuringMachine(state, '_')
+    machine.add_instruction(state, '0', state, '1', '>')
+    machine.add_instruction(state, '1', state, '0', '>')
+    return machine
+
+
+class MachineCacheTest(unittest.TestCase):
+    def test_hit(self):
+        cache = MachineCache()
+        machine = inverting_machine()
+        first = cache.run(machine, Tape(list('0110')))
+        # machines with the same structure share the results
+        second = cache.run(inverting_machine('p0'), Tape(list('0110')))
+        self.assertEqual(first, second)
+        self.assertEqual(second.symbols(), list('1001_'))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        # results are copied, so changes of the returned tape do not change the cache
+        second[0] = '_'
+        self.assertEqual(cache.run(machine, Tape(list('0110'))), first)
+        self.assertEqual(machine.steps, 4)
+
+    def test_eviction(self):
+        cache = MachineCache(max_size=2)
+        machine = inverting_machine()
+        for symbols in ('0', '1', '0', '00'):
+            cache.run(machine, Tape(list(symbols)))
+        # '1' is the least recently used result
+        self.assertEqual(len(cache.results), 2)
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+        cache.run(machine, Tape(list('1')))
+        self.assertEqual((cache.hits, cache.misses), (1, 4))
+        cache.run(machine, Tape(list('00')))
+        self.assertEqual((cache.hits, cache.misses), (2, 4))
+
+    def test_bypass(self):
+        cache = MachineCache(max_tape_size=4)
+        machine = inverting_machine()
+        for _ in range(2):
+            self.assertEqual(cache.run(machine, Tape(list('01010'))).symbols(), list('10101_'))
+        self.assertEqual((cache.hits, cache.misses, cache.bypasses), (0, 0, 2))
+        self.assertFalse(cache.results)
+
+    def test_limits_of_cached_results(self):
+        cache = MachineCache()
+        machine = inverting_machine()
+        cache.run(machine, Tape(list('0110')))
+        with self.assertRaises(StepLimitError):
+            cache.run(machine, Tape(list('0110')), max_steps=3)
+        with self.assertRaises(TapeLimitError):
+            cache.run(machine, Tape(list('0110')), max_tape_length=4)
+        self.assertEqual(cache.run(machine, Tape(list('0110')), max_steps=4, max_tape_length=5).symbols(),
+                         list('1001_'))
+        self.assertEqual(cache.hits, 1)
+
+
+def marking_machine(state: str, blank_symbol: str = '_') -> TuringMachine:
+    # machine writing x over the blank symbol after 0 and 1
+    machine = TuringMachine(state, blank_symbol)
+    machine.add_instruction(state, '0', state, '0', '>', (1, 1))
+    machine.add_instruction(state, '1', state, '1', '>', (1, 2))
+    machine.add_instruction(state, blank_symbol, state + 'x', 'x', '-', (1, 3))
+    return machine
+
+
+class FuseTest(unittest.TestCase):
+    def test_fuse(self):
+        fused = fuse(inverting_machine(), marking_machine('m0'))
+        self.assertEqual(str(fused), "{q0.1 '_': q0.1 '0' = q0.1 '1' >; q0.1 '1' = q0.1 '0' >; "
+                                     "m0.2 '0' = m0.2 '0' >; m0.2 '1' = m0.2 '1' >; m0.2 '_' = m0x.2 'x' -; "
+                                     "q0.1 '_' = m0x.2 'x' -}")
+        self.assertEqual(fused.positions['q0.1', '_'], (1, 3))
+        tape = Tape(list('0110'))
+        self.assertEqual(fused.run(tape).symbols(), list('1001x'))
+
+    def test_names_of_pairs_with_the_same_structure(self):
+        second = marking_machine('m0')
+        first = fuse(inverting_machine('q0'), second)
+        renamed = fuse(inverting_machine('p0'), second)
+        self.assertEqual(first.fingerprint, renamed.fingerprint)
+        self.assertEqual(first.initial_state, 'q0.1')
+        self.assertEqual(renamed.initial_state, 'p0.1')
+        self.assertEqual(str(renamed), str(first).replace('q0.1', 'p0.1'))
+
+    def test_positions_of_pairs_with_the_same_structure(self):
+        first = marking_machine('m0')
+        moved = TuringMachine('m0', '_')
+        for (state, symbol), (next_state, write_symbol, move) in first.transitions.items():
+            moved.add_instruction(state, symbol, next_state, write_symbol, shift_names[move], (5, 1))
+        self.assertEqual(fuse(inverting_machine(), first).positions['q0.1', '_'], (1, 3))
+        self.assertEqual(fuse(inverting_machine(), moved).positions['q0.1', '_'], (5, 1))
+
+    def test_compose(self):
+        # machines with different blank symbols are run one after another
+        composed = compose(inverting_machine(), marking_machine('m0', ' '))
+        self.assertIsInstance(composed, MachinePipeline)
+        # the second machine halts on the blank symbol of the first one
+        self.assertEqual(composed.run(Tape(list('01'))).symbols(), list('10_'))
+        self.assertEqual(composed.run(Tape(list('01'))).head_index, 2)
+        self.assertIsInstance(compose(inverting_machine(), marking_machine('m0')), TuringMachine)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+from source.machine import TuringMachine
+from source.optimizer import optimize
+from source.tape import Tape
+
+
+def machine_of(initial_state: str, instructions: list) -> TuringMachine:
+    machine = TuringMachine(initial_state, '_')
+    for instruction in instructions:
+        machine.add_instruction(*instruction)
+    return machine
+
+
+class OptimizerTest(unittest.TestCase):
+    def test_unreachable_states(self):
+        machine = machine_of('q0', [
+            ('q0', '0', 'q1', '1', '>'),
+            ('q1', '0', 'q0', '0', '>'),
+            ('q2', '0', 'q3', '0', '<'),
+            ('q3', '1', 'q2', '0', '-'),
+        ])
+        optimized, report = optimize(machine)
+        self.assertEqual(set(optimized.transitions), {('q0', '0'), ('q1', '0')})
+        self.assertEqual((report.states, report.optimized_states, report.unreachable_states), (4, 2, 2))
+        self.assertEqual((report.transitions, report.optimized_transitions), (4, 2))
+
+    def test_merged_states(self):
+        # q0 and q1 both move right over 0 and 1 and halt on blank, q2 writes 1 before halting
+        machine = machine_of('q0', [
+            ('q0', '0', 'q1', '0', '>'),
+            ('q0', '1', 'q1', '1', '>'),
+            ('q1', '0', 'q0', '0', '>'),
+            ('q1', '1', 'q0', '1', '>'),
+            ('q0', '_', 'q2', '_', '-'),
+            ('q1', '_', 'q2', '_', '-'),
+            ('q2', '_', 'q3', '1', '-'),
+        ])
+        optimized, report = optimize(machine)
+        self.assertEqual(optimized.transitions, {
+            ('q0', '0'): ('q0', '0', 1),
+            ('q0', '1'): ('q0', '1', 1),
+            ('q0', '_'): ('q2', '_', 0),
+            ('q2', '_'): ('q3', '1', 0),
+        })
+        self.assertEqual((report.merged_states, report.unreachable_states), (1, 0))
+        self.assertEqual((report.table_size, report.optimized_table_size), (16, 12))
+        # the optimized machine makes the same steps
+        tape = Tape(list('0110'))
+        self.assertEqual(optimized.run(tape), machine.run(tape))
+        self.assertEqual(optimized.steps, machine.steps)
+
+    def test_positions(self):
+        machine = machine_of('q0', [('q0', '0', 'q1', '1', '>')])
+        machine.add_instruction('q1', '0', 'q0', '0', '>', (2, 5))
+        optimized, report = optimize(machine)
+        self.assertEqual(optimized.positions, {('q1', '0'): (2, 5)})
+
+
+if __name__ == '__main__':
+    unittest.main()
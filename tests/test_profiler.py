@@ -0,0 +1,59 @@
+import io
+import json
+import unittest
+
+from source.interpreter import Interpreter
+from source.machine import TuringMachine
+from source.profiler import profile
+from source.semantic_analyzer import SemanticAnalyzer
+from source.tape import Tape
+
+
+def hits(machine_profile) -> dict:
+    return {(instruction.state, instruction.symbol): instruction.hits for instruction in machine_profile.instructions}
+
+
+class ProfileTest(unittest.TestCase):
+    def test_counts(self):
+        # goes right to the blank symbol, writes x and comes back to the blank symbol left of the tape
+        machine = TuringMachine('right', '_')
+        machine.add_instruction('right', '0', 'right', '1', '>', (1, 1))
+        machine.add_instruction('right', '_', 'left', 'x', '<', (1, 2))
+        machine.add_instruction('left', '1', 'left', '1', '<', (1, 3))
+        result, machine_profile = profile(machine, Tape(list('000')))
+        self.assertEqual(result, Tape(list('_111x'), 0))
+        self.assertEqual(hits(machine_profile), {('right', '0'): 3, ('right', '_'): 1, ('left', '1'): 3})
+        self.assertEqual(machine_profile.steps, 7)
+        self.assertEqual(machine.steps, 7)
+        self.assertEqual(machine_profile.tape_extent, 5)
+        self.assertEqual(machine_profile.head_travel, 7)
+        self.assertEqual(machine_profile.instructions[-1].position, (1, 2))
+
+    def test_sweeps(self):
+        # right sweeps over 0 and 1 as one macro-step, its hits are counted per symbol
+        machine = TuringMachine('right', '_')
+        machine.add_instruction('right', '0', 'right', '0', '>')
+        machine.add_instruction('right', '1', 'right', '1', '>')
+        self.assertTrue(machine.dense.sweeps)
+        result, machine_profile = profile(machine, Tape(list('01101')))
+        self.assertEqual(hits(machine_profile), {('right', '0'): 2, ('right', '1'): 3})
+        self.assertEqual((machine_profile.steps, machine_profile.tape_extent, machine_profile.head_travel), (5, 6, 5))
+
+    def test_profiles_of_programs(self):
+        program = ("m = {q0 ' ': q0 '0' = q0 '1' >; q0 '1' = q0 '0' >}\n"
+                   "t = \"^0|1\"\n"
+                   "<< m(t)\n"
+                   "<< m(t)\n")
+        analyzer = SemanticAnalyzer(program)
+        output = io.StringIO()
+        interpreter = Interpreter(output_file=output, profile_machines=True)
+        self.assertTrue(interpreter.run(analyzer.analyze()))
+        self.assertEqual(output.getvalue(), '1|0|^ \n1|0|^ \n')
+        machine_profile, = interpreter.machine_profiles.values()
+        self.assertEqual((machine_profile.runs, machine_profile.steps, machine_profile.head_travel), (2, 4, 4))
+        self.assertEqual(hits(machine_profile), {('q0', '0'): 2, ('q0', '1'): 2})
+        self.assertEqual(json.loads(machine_profile.to_json())['instructions'][0]['line'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,23 @@
+import unittest
+
+from source.semantic_analyzer import SemanticAnalyzer
+
+
+def errors(program_text: str) -> list:
+    analyzer = SemanticAnalyzer(program_text)
+    analyzer.analyze()
+    return [(error.type, error.line, error.column, error.message) for error in analyzer.diagnostics.errors]
+
+
+class SemanticAnalyzerTest(unittest.TestCase):
+    def test_conflicting_instructions(self):
+        self.assertEqual(errors("m = {q0 ' ': q0 '0' = q1 '1' >; q0 '0' = q1 '0' >}\n"), [
+            ('Semantic', 1, 33, "Conflicting instructions for state q0 and symbol '0'"),
+        ])
+
+    def test_duplicate_instructions(self):
+        self.assertEqual(errors("m = {q0 ' ': q0 '0' = q1 '1' >; q0 '0' = q1 '1' >}\n"), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from array import array
+
+from source.batch import run_batch
+from source.machine import TuringMachine
+from source.machine_compiler import CompiledMachine
+from source.tape import Tape
+
+
+def shifting_machine(symbol_count: int) -> TuringMachine:
+    # machine of symbol_count symbols with the blank symbol replacing every symbol s<i> by s<i + 1>
+    machine = TuringMachine('q0', 'b')
+    for idx in range(symbol_count - 2):
+        machine.add_instruction('q0', 's{}'.format(idx), 'q0', 's{}'.format(idx + 1), '>')
+    machine.add_instruction('q0', 's{}'.format(symbol_count - 2), 'q0', 's0', '>')
+    return machine
+
+
+class TapeTest(unittest.TestCase):
+    def test_from_codes_of_array(self):
+        alphabet = ['a', 'b', 'c']
+        tape = Tape.from_codes(alphabet, array('i', [2, 0, 1]), 1)
+        self.assertEqual(tape.symbols(), ['c', 'a', 'b'])
+        self.assertEqual(tape.head_index, 1)
+
+    def test_machines_at_256_symbols(self):
+        # machines of 256 symbols have 257 codes with the unknown symbol, their cells are arrays of integers
+        for symbol_count in (255, 256, 257):
+            machine = shifting_machine(symbol_count)
+            self.assertEqual(len(machine.dense.symbols), symbol_count)
+            tape = Tape(['s0', 's1', 's5'])
+            expected = Tape(['s1', 's2', 's6', 'b'], 3)
+            for runner in (machine, CompiledMachine(machine)):
+                with self.subTest(symbol_count=symbol_count, runner=type(runner).__name__):
+                    self.assertEqual(runner.run(tape), expected)
+            with self.subTest(symbol_count=symbol_count, runner='run_batch'):
+                self.assertEqual(run_batch(machine, [tape, tape]), [expected, expected])
+
+
+if __name__ == '__main__':
+    unittest.main()